@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+📈 Transaction API load generator
+تست بار برای جریان send/prepare → send/confirm
+
+Drives many concurrent prepare→confirm pipelines (the same requests
+test_flutter_api_calls makes) with a ramp-up profile and reports requests
+per second and p50/p95/p99 latency for each step and each stage, so the
+point where the backend saturates is visible.
+
+Usage:
+python api_load_test.py                                   # against the bundled stand-in
+python api_load_test.py --profile 10:5,50:10,100:10       # ramp 0→10→50→100 workers
+python api_load_test.py --base-url https://staging.example/api/ --profile 5:30
+"""
+
+import argparse
+import asyncio
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from api_stand_in import API_PREFIX, ApiStandIn
+from async_http import AsyncHttpClient
+from test_flutter_api_simple import build_confirm_request, build_prepare_request
+
+STEPS = ("prepare", "confirm", "pipeline")
+
+# (target workers, stage seconds): ramp linearly during the first half, hold for the second
+Stage = Tuple[int, float]
+
+
+def parse_profile(text: str) -> List[Stage]:
+    """'10:5,50:10' → [(10, 5.0), (50, 10.0)]"""
+    stages = []
+    for part in text.split(","):
+        workers, _, seconds = part.partition(":")
+        stages.append((int(workers), float(seconds or 10)))
+    return stages
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile: the smallest value with at least pct% of the samples at or below it"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+@dataclass
+class StepStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, seconds: float) -> Dict[str, float]:
+        ordered = sorted(self.latencies)
+        return {
+            "count": len(ordered),
+            "errors": self.errors,
+            "rps": len(ordered) / seconds if seconds else 0.0,
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p95_ms": percentile(ordered, 95) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+        }
+
+
+class LoadTest:
+    """Ramp workers up and down through the profile while recording per-step latency"""
+
+    def __init__(self, base_url: str, profile: List[Stage], timeout: float = 30):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.profile = profile
+        self.client = AsyncHttpClient(limit_per_host=max(w for w, _ in profile) * 2, timeout=timeout)
+        self.stage = 0
+        # stats[stage][step]
+        self.stats: Dict[int, Dict[str, StepStats]] = defaultdict(lambda: defaultdict(StepStats))
+        self.stage_seconds: Dict[int, float] = {}
+        self._target = 0
+        # Live worker per slot; a slot freed by a ramp-down is refilled on the next ramp-up
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def _record(self, step: str, started: float, ok: bool):
+        stats = self.stats[self.stage][step]
+        if ok:
+            stats.latencies.append(time.perf_counter() - started)
+        else:
+            stats.errors += 1
+
+    async def _pipeline(self):
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(f"{self.base_url}send/prepare", json=build_prepare_request())
+            transaction_id = (response.json() or {}).get("transaction_id") if response.status == 200 else None
+        except Exception:
+            transaction_id = None
+        self._record("prepare", started, transaction_id is not None)
+        if transaction_id is None:
+            self._record("pipeline", started, False)
+            return
+
+        confirm_started = time.perf_counter()
+        data, headers = build_confirm_request(transaction_id)
+        try:
+            response = await self.client.post(f"{self.base_url}send/confirm", json=data, headers=headers)
+            ok = response.status == 200
+        except Exception:
+            ok = False
+        self._record("confirm", confirm_started, ok)
+        self._record("pipeline", started, ok)
+
+    async def _worker(self, slot: int):
+        # A worker retires once the ramp target drops below its slot number
+        while slot < self._target:
+            await self._pipeline()
+
+    def _scale(self, target: int):
+        self._target = target
+        self._workers = {slot: w for slot, w in self._workers.items() if not w.done()}
+        for slot in range(target):
+            if slot not in self._workers:
+                self._workers[slot] = asyncio.ensure_future(self._worker(slot))
+
+    async def run(self, tick: float = 0.1):
+        previous = 0
+        for index, (target, seconds) in enumerate(self.profile):
+            self.stage = index
+            started = time.perf_counter()
+            while (elapsed := time.perf_counter() - started) < seconds:
+                # Ramp from the previous stage's level to this stage's target, then hold
+                self._scale(round(previous + (target - previous) * min(1.0, elapsed / (seconds / 2 or 1))))
+                await asyncio.sleep(tick)
+            self.stage_seconds[index] = time.perf_counter() - started
+            previous = target
+
+        self._target = 0
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        await self.client.close()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Totals per step across all stages"""
+        total_seconds = sum(self.stage_seconds.values())
+        merged: Dict[str, StepStats] = defaultdict(StepStats)
+        for per_step in self.stats.values():
+            for step, stats in per_step.items():
+                merged[step].latencies.extend(stats.latencies)
+                merged[step].errors += stats.errors
+        return {step: merged[step].summary(total_seconds) for step in STEPS}
+
+
+def _print_table(title: str, rows: Dict[str, Dict[str, float]]):
+    print(f"\n{title}")
+    print(f"   {'step'.ljust(10)} {'count':>7} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for step, s in rows.items():
+        print(f"   {step.ljust(10)} {s['count']:>7} {s['errors']:>7} {s['rps']:>9.1f} "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+
+
+async def run_load_test(base_url: Optional[str], profile: List[Stage], timeout: float) -> LoadTest:
+    stop = None
+    if base_url is None:
+        server = ApiStandIn().server()
+        base_url = await server.start() + API_PREFIX
+        stop = server.close
+        print(f"🧪 Using bundled stand-in at {base_url}")
+
+    test = LoadTest(base_url, profile, timeout)
+    try:
+        await test.run()
+    finally:
+        if stop:
+            await stop()
+    return test
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test send/prepare → send/confirm")
+    parser.add_argument("--base-url", help="API base URL (default: start the bundled stand-in)")
+    parser.add_argument("--profile", default="10:5,50:5,100:5",
+                        help="comma-separated WORKERS:SECONDS ramp stages (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    args = parser.parse_args()
+
+    profile = parse_profile(args.profile)
+    print("📈 Transaction API Load Test")
+    print("=" * 60)
+    print(f"   Profile: {' → '.join(f'{w} workers/{s:g}s' for w, s in profile)}")
+
+    test = asyncio.run(run_load_test(args.base_url, profile, args.timeout))
+
+    for index, (workers, _) in enumerate(profile):
+        seconds = test.stage_seconds.get(index, 0)
+        rows = {step: test.stats[index][step].summary(seconds) for step in STEPS}
+        _print_table(f"📊 Stage {index + 1}: ramp to {workers} workers", rows)
+    _print_table("📊 Overall", test.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+🧪 Local coinceeper API stand-in
+شبیه‌ساز محلی API تراکنش برای تست بار
+
+Implements send/prepare and send/confirm with the same response shapes
+test_flutter_api_simple.py expects, plus configurable per-route latency and
+the 400 "Failed to broadcast transaction via Tatum API" failure mode (the
+prepared transaction stays confirmable) and the 400 that is really a
+success ("Transaction sent successfully" with a tx_hash).
+notifications/register-device stores devices in memory.
+balance and all-currencies answer with an ETag and honour If-None-Match
+(304), so polling clients can be exercised against it.
+
+Usage: python api_stand_in.py [PORT]
+"""
+
+import asyncio
+import hashlib
+import itertools
+import random
+import sys
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from async_http import HttpServer, Request, Response, json_response
+
+API_PREFIX = "/api/"
+
+Route = Callable[[Request], Awaitable[Response]]
+
+# all-currencies catalogue (ApiCurrency shape)
+CURRENCIES = [
+    {"CurrencyID": "1", "BlockchainName": "bitcoin", "CurrencyName": "Bitcoin", "Symbol": "BTC",
+     "Icon": "https://coinceeper.com/icons/btc.png", "SmartContractAddress": "", "IsToken": False, "DecimalPlaces": 8},
+    {"CurrencyID": "2", "BlockchainName": "ethereum", "CurrencyName": "Ethereum", "Symbol": "ETH",
+     "Icon": "https://coinceeper.com/icons/eth.png", "SmartContractAddress": "", "IsToken": False, "DecimalPlaces": 18},
+    {"CurrencyID": "3", "BlockchainName": "polygon", "CurrencyName": "Polygon", "Symbol": "POL",
+     "Icon": "https://coinceeper.com/icons/pol.png", "SmartContractAddress": "", "IsToken": False, "DecimalPlaces": 18},
+    {"CurrencyID": "4", "BlockchainName": "tron", "CurrencyName": "Tron", "Symbol": "TRX",
+     "Icon": "https://coinceeper.com/icons/trx.png", "SmartContractAddress": "", "IsToken": False, "DecimalPlaces": 6},
+    {"CurrencyID": "5", "BlockchainName": "tron", "CurrencyName": "Tether", "Symbol": "USDT",
+     "Icon": "https://coinceeper.com/icons/usdt.png",
+     "SmartContractAddress": "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", "IsToken": True, "DecimalPlaces": 6},
+]
+
+
+@dataclass
+class StandInConfig:
+    """Mean latency (seconds) per route and failure rates"""
+    latency: Dict[str, float] = field(default_factory=lambda: {
+        "send/prepare": 0.02, "send/confirm": 0.05, "balance": 0.03, "all-currencies": 0.05,
+        "notifications/register-device": 0.03,
+    })
+    jitter: float = 0.25                  # ± fraction of the mean
+    broadcast_failure_rate: float = 0.0   # confirm → 400 Tatum broadcast error
+    disguised_success_rate: float = 0.0   # broadcast, but answered with a 400
+
+
+class ApiStandIn:
+    """Routes coinceeper API paths to in-memory handlers"""
+
+    def __init__(self, config: StandInConfig = None):
+        self.config = config or StandInConfig()
+        self.prepared: Dict[str, dict] = {}
+        self._hashes = itertools.count(1)
+        self.confirmed: Set[str] = set()
+        self.broadcasts = 0
+        self.duplicate_confirms = 0
+        self.currencies = list(CURRENCIES)
+        # UserID → {symbol: balance}; unknown users get a fixed demo wallet
+        self.balances: Dict[str, Dict[str, str]] = {}
+        # (UserID, WalletID, DeviceToken) → deviceId
+        self.devices: Dict[tuple, str] = {}
+        self.calls: Counter = Counter()
+        self.routes: Dict[str, Route] = {
+            "send/prepare": self.prepare,
+            "send/confirm": self.confirm,
+            "balance": self.balance,
+            "all-currencies": self.all_currencies,
+            "notifications/register-device": self.register_device,
+        }
+
+    async def _delay(self, route: str):
+        mean = self.config.latency.get(route, 0.0)
+        if mean > 0:
+            spread = mean * self.config.jitter
+            await asyncio.sleep(max(0.0, random.uniform(mean - spread, mean + spread)))
+
+    async def handle(self, request: Request) -> Response:
+        route = request.path.split("?", 1)[0]
+        if route.startswith(API_PREFIX):
+            route = route[len(API_PREFIX):]
+        handler = self.routes.get(route)
+        if handler is None:
+            return json_response(404, {"success": False, "message": f"Unknown route: {route}"})
+        self.calls[route] += 1
+        await self._delay(route)
+        return await handler(request)
+
+    async def prepare(self, request: Request) -> Response:
+        data = request.json() or {}
+        missing = [k for k in ("UserID", "blockchain", "sender_address", "recipient_address", "amount") if not data.get(k)]
+        if missing:
+            return json_response(400, {"success": False, "message": f"Missing fields: {', '.join(missing)}"})
+        transaction_id = str(uuid.uuid4())
+        self.prepared[transaction_id] = data
+        return json_response(200, {"success": True, "transaction_id": transaction_id})
+
+    async def confirm(self, request: Request) -> Response:
+        data = request.json() or {}
+        transaction_id = data.get("transaction_id")
+        if transaction_id in self.confirmed:
+            self.duplicate_confirms += 1
+            return json_response(400, {"success": False, "message": "Transaction already broadcast"})
+        if transaction_id not in self.prepared:
+            return json_response(400, {"success": False, "message": "Transaction not found"})
+        if random.random() < self.config.broadcast_failure_rate:
+            return json_response(400, {"success": False, "message": "Failed to broadcast transaction via Tatum API"})
+        del self.prepared[transaction_id]
+        self.confirmed.add(transaction_id)
+        self.broadcasts += 1
+        tx_hash = f"0x{next(self._hashes):064x}"
+        if random.random() < self.config.disguised_success_rate:
+            return json_response(400, {"success": False, "message": "Transaction sent successfully", "tx_hash": tx_hash})
+        return json_response(200, {"success": True, "message": "Transaction sent successfully", "tx_hash": tx_hash})
+
+    async def balance(self, request: Request) -> Response:
+        data = request.json() or {}
+        user_id = data.get("UserID")
+        if not user_id:
+            return json_response(400, {"success": False, "message": "UserID is required"})
+        wallet = self.balances.get(user_id) or {"BTC": "0.00150000", "ETH": "0.25000000", "USDT": "120.000000"}
+        wanted = set(data.get("CurrencyName") or wallet)
+        chains = data.get("Blockchain") or {}
+        by_symbol = {c["Symbol"]: c for c in self.currencies}
+        balances = [
+            {"balance": amount, "blockchain": chains.get(symbol) or by_symbol.get(symbol, {}).get("BlockchainName", ""),
+             "is_token": by_symbol.get(symbol, {}).get("IsToken", False), "symbol": symbol,
+             "currency_name": by_symbol.get(symbol, {}).get("CurrencyName", symbol)}
+            for symbol, amount in wallet.items() if symbol in wanted
+        ]
+        return _etagged(request, {"success": True, "Balances": balances, "UserID": user_id})
+
+    async def all_currencies(self, request: Request) -> Response:
+        return _etagged(request, {"success": True, "currencies": self.currencies})
+
+    async def register_device(self, request: Request) -> Response:
+        data = request.json() or {}
+        missing = [k for k in ("UserID", "WalletID", "DeviceToken", "DeviceName") if not data.get(k)]
+        if missing:
+            return json_response(400, {"success": False, "message": f"Missing fields: {', '.join(missing)}"})
+        key = (data["UserID"], data["WalletID"], data["DeviceToken"])
+        device_id = self.devices.setdefault(key, str(uuid.uuid4()))
+        return json_response(200, {"success": True, "message": "Device registered successfully", "deviceId": device_id})
+
+    def server(self, host: str = "127.0.0.1", port: int = 0) -> HttpServer:
+        return HttpServer(self.handle, host, port)
+
+
+def _etagged(request: Request, obj: Any) -> Response:
+    """200 with a content ETag, or 304 when the client already holds this version"""
+    response = json_response(200, obj)
+    etag = '"' + hashlib.sha1(response.body).hexdigest()[:16] + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(304, {"etag": etag})
+    response.headers["etag"] = etag
+    return response
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    server = ApiStandIn().server(port=port)
+
+    async def serve():
+        base_url = await server.start()
+        print(f"🧪 API stand-in listening on {base_url}{API_PREFIX}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+
+if __name__ == "__main__":
+    main()
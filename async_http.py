@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+🌐 Minimal asyncio HTTP/1.1 client & server
+کلاینت و سرور HTTP سبک مبتنی بر asyncio (فقط کتابخانه استاندارد)
+
+Just enough HTTP/1.1 for load generation and local stand-in servers:
+keep-alive connection pooling with a per-host limit, Content-Length and
+chunked bodies, and per-request timings (connect, tls, wait, read) on the
+client side; a keep-alive request loop with a pluggable async handler on
+the server side.
+
+    async with AsyncHttpClient(limit_per_host=100) as client:
+        response = await client.post("http://127.0.0.1:8080/api/send/prepare", json={...})
+        response.json(), response.timings
+
+    server = HttpServer(handler)          # async def handler(request) -> Response
+    base_url, stop = server.run_in_thread()
+"""
+
+import asyncio
+import ssl
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import fast_json
+
+_REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+    401: "Unauthorized", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error",
+    502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    """Malformed HTTP on the wire"""
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    def json(self) -> Any:
+        return fast_json.loads(self.body) if self.body else None
+
+
+@dataclass
+class Response:
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+    # Client side only: seconds spent in each stage of the request
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def json(self) -> Any:
+        return fast_json.loads(self.body) if self.body else None
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+def json_response(status: int, obj: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    out = {"content-type": "application/json"}
+    out.update(headers or {})
+    return Response(status, out, fast_json.dumps(obj))
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Tuple[str, Dict[str, str]]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+    length = int(headers.get("content-length", 0))
+    return await reader.readexactly(length) if length else b""
+
+
+def _serialize(start_line: str, headers: Dict[str, str], body: bytes) -> bytes:
+    lines = [start_line]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+# ---------------------------------------------------------------- client
+
+class _Connection:
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncHttpClient:
+    """Keep-alive HTTP/1.1 client with a bounded connection pool per host"""
+
+    def __init__(self, limit_per_host: int = 100, timeout: float = 30,
+                 default_headers: Optional[Dict[str, str]] = None):
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.default_headers = dict(default_headers or {})
+        self._idle: Dict[Tuple[str, str, int], Deque[_Connection]] = defaultdict(deque)
+        self._slots: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+        self._ssl = ssl.create_default_context()
+
+    async def _connect(self, scheme: str, host: str, port: int, timings: Dict[str, float]) -> _Connection:
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port)
+        connected = time.perf_counter()
+        timings["connect"] = connected - started
+        if scheme == "https":
+            await writer.start_tls(self._ssl, server_hostname=host)
+            timings["tls"] = time.perf_counter() - connected
+        return _Connection(reader, writer)
+
+    async def request(self, method: str, url: str, json: Any = None, data: Optional[bytes] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        host = parts.hostname
+        port = parts.port or (443 if scheme == "https" else 80)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        key = (scheme, host, port)
+
+        if json is not None:
+            data = fast_json.dumps(json)
+        body = data or b""
+        out_headers = {"host": parts.netloc, "content-length": str(len(body))}
+        if json is not None:
+            out_headers["content-type"] = "application/json"
+        out_headers.update(self.default_headers)
+        out_headers.update({k.lower(): v for k, v in (headers or {}).items()})
+        raw = _serialize(f"{method} {target} HTTP/1.1", out_headers, body)
+
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = asyncio.Semaphore(self.limit_per_host)
+
+        async with slot:
+            return await asyncio.wait_for(self._exchange(key, raw), self.timeout)
+
+    async def _exchange(self, key: Tuple[str, str, int], raw: bytes) -> Response:
+        timings: Dict[str, float] = {}
+        idle = self._idle[key]
+        reused = bool(idle)
+        conn = idle.pop() if idle else await self._connect(*key, timings)
+        try:
+            sent = time.perf_counter()
+            conn.writer.write(raw)
+            await conn.writer.drain()
+            status_line, headers = await _read_headers(conn.reader)
+            first_byte = time.perf_counter()
+            body = await _read_body(conn.reader, headers)
+            done = time.perf_counter()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            conn.close()
+            if reused:
+                # The server closed an idle keep-alive socket; retry once on a fresh one
+                return await self._exchange_fresh(key, raw)
+            raise
+        except BaseException:
+            conn.close()
+            raise
+
+        timings["wait"] = first_byte - sent
+        timings["read"] = done - first_byte
+        if headers.get("connection", "").lower() == "close":
+            conn.close()
+        else:
+            idle.append(conn)
+
+        try:
+            status = int(status_line.split(" ", 2)[1])
+        except (IndexError, ValueError):
+            raise HttpError(f"Bad status line: {status_line!r}") from None
+        return Response(status, headers, body, timings)
+
+    async def _exchange_fresh(self, key: Tuple[str, str, int], raw: bytes) -> Response:
+        idle = self._idle[key]
+        while idle:
+            idle.pop().close()
+        return await self._exchange(key, raw)
+
+    async def get(self, url: str, **kwargs) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self):
+        closing = []
+        for idle in self._idle.values():
+            while idle:
+                conn = idle.pop()
+                conn.close()
+                closing.append(conn.writer.wait_closed())
+        await asyncio.gather(*closing, return_exceptions=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# ---------------------------------------------------------------- server
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HttpServer:
+    """Keep-alive HTTP/1.1 server dispatching every request to one async handler"""
+
+    def __init__(self, handler: Handler, host: str = "127.0.0.1", port: int = 0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.base_url
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Keep-alive handlers may still be parked waiting for the next request
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request_line, headers = await _read_headers(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                method, path, _ = request_line.split(" ", 2)
+                body = await _read_body(reader, headers)
+
+                try:
+                    response = await self.handler(Request(method, path, headers, body))
+                except Exception as e:
+                    response = json_response(500, {"error": f"{type(e).__name__}: {e}"})
+
+                out_headers = dict(response.headers)
+                out_headers["content-length"] = str(len(response.body))
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if not keep_alive:
+                    out_headers["connection"] = "close"
+                reason = _REASONS.get(response.status, "Unknown")
+                writer.write(_serialize(f"HTTP/1.1 {response.status} {reason}", out_headers, response.body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    def run_in_thread(self) -> Tuple[str, Callable[[], None]]:
+        """Serve from a background event loop; returns (base_url, stop)"""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        ready.wait()
+
+        def stop():
+            asyncio.run_coroutine_threadsafe(self.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+
+        return self.base_url, stop
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+💰 Caching balance client
+کلاینت موجودی و لیست ارزها با کش، اعتبارسنجی ETag و ادغام درخواست‌های هم‌زمان
+
+Replicates the app's POST balance and GET all-currencies calls for
+monitoring jobs, without hammering the backend:
+
+  * responses are cached per endpoint for a TTL (DEFAULT_TTL)
+  * once stale, the cached ETag is sent as If-None-Match and a 304 just
+    extends the entry instead of re-downloading the body
+  * concurrent identical requests share one in-flight call
+
+    client = BalanceClient()
+    balances = client.get_balance(USER_ID, ["BTC", "ETH"], {"BTC": "bitcoin"})
+    currencies = client.all_currencies()
+    print(client.stats)
+
+Usage: python balance_client.py [--base-url URL] [--jobs N] [--polls N] [--interval S] [--ttl S]
+       (without --base-url, polls the bundled API stand-in)
+"""
+
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import requests
+
+import fast_json
+import fcm_transport
+from latency_metrics import METRICS
+from test_flutter_api_simple import BASE_URL, HEADERS, USER_ID
+
+# Seconds a response is served from cache before it is revalidated
+DEFAULT_TTL = {"balance": 15.0, "all-currencies": 300.0}
+
+CacheKey = Tuple[str, str, bytes]
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    etag: Optional[str]
+    expires: float
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0           # served from a fresh cache entry
+    revalidated: int = 0    # stale entry confirmed by a 304
+    fetched: int = 0        # full response downloaded
+    coalesced: int = 0      # waited on an identical in-flight call
+
+    @property
+    def backend_calls(self) -> int:
+        return self.revalidated + self.fetched
+
+
+class _Call:
+    """One in-flight request that identical callers wait on"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def build_balance_request(user_id: str = USER_ID, currency_names: Iterable[str] = (),
+                          blockchain: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """balance body, same shape as the app's BalanceRequest"""
+    return {
+        "UserID": user_id,
+        "CurrencyName": list(currency_names),
+        # Sorted so the same mapping always hits the same cache entry
+        "Blockchain": dict(sorted((blockchain or {}).items())),
+    }
+
+
+class BalanceClient:
+    """Thread-safe balance / all-currencies client with TTL + ETag caching"""
+
+    def __init__(self, base_url: str = BASE_URL, ttl: Optional[Dict[str, float]] = None,
+                 headers: Optional[Dict[str, str]] = None, session: Optional[requests.Session] = None,
+                 timeout: float = 30, max_entries: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.base_url = base_url
+        self.ttl = dict(DEFAULT_TTL if ttl is None else ttl)
+        self.headers = dict(HEADERS if headers is None else headers)
+        self.session = session or fcm_transport.get_session()
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.clock = clock
+        self.stats = CacheStats()
+        self._cache: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[CacheKey, _Call] = {}
+        self._lock = threading.Lock()
+
+    def get_balance(self, user_id: str, currency_names: Iterable[str] = (),
+                    blockchain: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """POST balance; the response is cached per distinct request body"""
+        body = build_balance_request(user_id, currency_names, blockchain)
+        return self.request("POST", "balance", body)
+
+    def all_currencies(self) -> Dict[str, Any]:
+        """GET all-currencies"""
+        return self.request("GET", "all-currencies")
+
+    def invalidate(self, endpoint: Optional[str] = None):
+        """Drop cached responses for `endpoint` (all endpoints if None), e.g. after a send"""
+        with self._lock:
+            for key in [k for k in self._cache if endpoint is None or k[1] == endpoint]:
+                del self._cache[key]
+
+    def request(self, method: str, endpoint: str, body: Any = None) -> Any:
+        """Cached, coalesced call to `endpoint` (relative to base_url)"""
+        data = fast_json.dumps(body) if body is not None else b""
+        key = (method, endpoint, data)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and self.clock() < entry.expires:
+                self._cache.move_to_end(key)
+                self.stats.hits += 1
+                return entry.value
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.stats.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        fresh = None
+        try:
+            fresh = self._fetch(method, endpoint, data, entry)
+            call.value = fresh.value
+            return fresh.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # Stored before the in-flight slot is released, so no caller slips between the two
+                if fresh is not None and fresh.expires > self.clock():
+                    self._store(key, fresh)
+                del self._inflight[key]
+            call.done.set()
+
+    def _store(self, key: CacheKey, entry: CacheEntry):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _fetch(self, method: str, endpoint: str, data: bytes, stale: Optional[CacheEntry]) -> CacheEntry:
+        headers = dict(self.headers)
+        if stale is not None and stale.etag:
+            headers["If-None-Match"] = stale.etag
+        ttl = self.ttl.get(endpoint, 0.0)
+
+        with METRICS.trace(endpoint) as trace:
+            response = fcm_transport.session_request(self.session, method, self.base_url + endpoint,
+                                                     data=data or None, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and stale is not None:
+                with self._lock:
+                    self.stats.revalidated += 1
+                return CacheEntry(stale.value, response.headers.get("ETag", stale.etag), self.clock() + ttl)
+            response.raise_for_status()
+            with trace.stage("parse"):
+                value = fast_json.response_json(response)
+
+        with self._lock:
+            self.stats.fetched += 1
+        if isinstance(value, dict) and value.get("success") is False:
+            ttl = 0.0  # never serve a failure from cache
+        return CacheEntry(value, response.headers.get("ETag"), self.clock() + ttl)
+
+
+def _poll_uncached(base_url: str, endpoint: str, body: Any = None) -> Any:
+    """What the scripts do today: a plain request every time"""
+    method = "POST" if body is not None else "GET"
+    response = fcm_transport.session_request(fcm_transport.get_session(), method, base_url + endpoint,
+                                             json=body, headers=HEADERS, timeout=30)
+    response.raise_for_status()
+    return fast_json.response_json(response)
+
+
+def _run_jobs(jobs: int, polls: int, interval: float, poll_balance, poll_currencies) -> Tuple[float, float]:
+    """Each job polls balance then all-currencies `polls` times; returns (seconds, mean poll ms)"""
+    latencies = []
+
+    def job():
+        for _ in range(polls):
+            started = time.perf_counter()
+            poll_balance()
+            poll_currencies()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(interval)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(jobs) as pool:
+        for future in [pool.submit(job) for _ in range(jobs)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    return elapsed, sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance polling with TTL/ETag caching and request coalescing")
+    parser.add_argument("--base-url", help="API base URL (default: start the bundled stand-in)")
+    parser.add_argument("--jobs", type=int, default=16, help="concurrent monitoring jobs")
+    parser.add_argument("--polls", type=int, default=20, help="polls per job")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between a job's polls")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL["balance"], help="balance TTL in seconds")
+    args = parser.parse_args()
+
+    print("💰 Balance Client")
+    print("=" * 50)
+
+    stop = None
+    base_url = args.base_url
+    if base_url is None:
+        from api_stand_in import API_PREFIX, ApiStandIn
+
+        base_url, stop = ApiStandIn().server().run_in_thread()
+        base_url += API_PREFIX
+        print(f"🧪 Using bundled stand-in at {base_url}")
+
+    body = build_balance_request(USER_ID, ["BTC", "ETH", "USDT"], {"BTC": "bitcoin", "ETH": "ethereum"})
+    total = args.jobs * args.polls * 2
+    try:
+        print(f"\n▶️  Uncached: {args.jobs} jobs × {args.polls} polls")
+        elapsed, mean_ms = _run_jobs(args.jobs, args.polls, args.interval,
+                                     lambda: _poll_uncached(base_url, "balance", body),
+                                     lambda: _poll_uncached(base_url, "all-currencies"))
+        print(f"   {total} calls → {total} backend requests in {elapsed:.2f}s, {mean_ms:.1f} ms per poll")
+
+        client = BalanceClient(base_url, ttl={**DEFAULT_TTL, "balance": args.ttl})
+        print(f"\n▶️  BalanceClient (balance TTL {args.ttl:g}s)")
+        elapsed, mean_ms = _run_jobs(args.jobs, args.polls, args.interval,
+                                     lambda: client.get_balance(USER_ID, ["BTC", "ETH", "USDT"],
+                                                                {"BTC": "bitcoin", "ETH": "ethereum"}),
+                                     client.all_currencies)
+        stats = client.stats
+        print(f"   {total} calls → {stats.backend_calls} backend requests in {elapsed:.2f}s, {mean_ms:.1f} ms per poll")
+        print(f"   cache hits: {stats.hits}  coalesced: {stats.coalesced}  "
+              f"304 revalidated: {stats.revalidated}  full fetches: {stats.fetched}")
+        print(f"   🚀 {total / max(1, stats.backend_calls):.0f}x fewer backend requests")
+    finally:
+        if stop is not None:
+            stop()
+    METRICS.print_summary()
+
+
+if __name__ == "__main__":
+    main()
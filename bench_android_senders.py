@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+⏱️ Android sender benchmark
+مقایسه ارسال با curl، ارسال درون‌پردازه‌ای و حالت دسته‌ای
+
+Compares the three sending paths of test_notification_android.py against a
+local FCM emulator:
+  1. curl subprocess per notification
+  2. in-process send per notification (pooled keep-alive connection)
+  3. multiplexed batch (registration_ids, one request per 1000 tokens)
+
+Usage: python bench_android_senders.py [COUNT]
+"""
+
+import contextlib
+import io
+import sys
+import time
+
+import fcm_transport
+from fcm_emulator import LEGACY_PATH, FcmEmulator
+from test_notification_android import (
+    send_notification_batch,
+    send_test_notification,
+    send_test_notification_curl,
+)
+
+SERVER_KEY = "local-benchmark-key"
+
+
+def _timed(label, count, func):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sent = func()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0.0
+    print(f"   {label.ljust(22)} : {sent}/{count} ok in {elapsed:.3f}s → {rate:.1f} msg/s")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    tokens = [f"bench-token-{i:06d}" for i in range(count)]
+
+    print("⏱️ Android Sender Benchmark")
+    print("=" * 50)
+
+    base_url, stop = FcmEmulator().run_in_thread()
+    url = base_url + LEGACY_PATH
+    try:
+        curl_time = _timed("curl subprocess", count, lambda: sum(
+            send_test_notification_curl(token, SERVER_KEY, fcm_url=url) for token in tokens))
+        inproc_time = _timed("in-process", count, lambda: sum(
+            send_test_notification(token, SERVER_KEY, fcm_url=url) for token in tokens))
+        batch_time = _timed("multiplexed batch", count, lambda: sum(
+            r.success for r in send_notification_batch(tokens, SERVER_KEY, fcm_url=url)))
+    finally:
+        stop()
+        fcm_transport.close_all()
+
+    print()
+    print(f"🚀 in-process speedup over curl : {curl_time / inproc_time:.1f}x")
+    print(f"🚀 batch speedup over curl      : {curl_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
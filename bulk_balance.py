@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+📚 Bulk wallet balance fetch
+دریافت هم‌زمان موجودی هزاران کیف پول با محدودیت تعداد درخواست در جریان
+
+Takes (UserID, blockchain, address) tuples and streams one WalletBalance
+per tuple as responses arrive, keeping at most `concurrency` calls in
+flight over the shared pooled session. The balance endpoint answers per
+UserID, so calls go through a BalanceClient: tuples of the same user share
+one in-flight request (and its cached response) and each tuple gets the
+Balances rows for its blockchain.
+
+    fetcher = BulkBalanceFetcher(concurrency=32)
+    for wallet in fetcher.iter_fetch(read_wallets()):
+        print(wallet.user_id, wallet.blockchain, wallet.balances)
+
+Usage: python bulk_balance.py [COUNT] [CONCURRENCY] [BASE_URL]
+       (without BASE_URL, benchmarks against the bundled API stand-in)
+"""
+
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import fast_json
+import fcm_transport
+from balance_client import BalanceClient, build_balance_request
+from fcm_dispatch import iter_windowed
+from test_flutter_api_simple import BASE_URL, HEADERS
+
+# (UserID, blockchain, address)
+WalletRef = Tuple[str, str, str]
+
+
+@dataclass
+class WalletBalance:
+    """Balances of one (UserID, blockchain, address) tuple"""
+    index: int
+    user_id: str
+    blockchain: str
+    address: str
+    success: bool
+    balances: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+def balances_for(response: Any, blockchain: str) -> List[Dict[str, Any]]:
+    """Rows of a balance response on `blockchain` (the API capitalises names inconsistently)"""
+    wanted = blockchain.lower()
+    rows = (response.get("Balances") or []) if isinstance(response, dict) else []
+    return [row for row in rows if str(row.get("blockchain") or row.get("Blockchain") or "").lower() == wanted]
+
+
+class BulkBalanceFetcher:
+    """Bounded-concurrency balance lookups over the shared pooled transport"""
+
+    def __init__(self, base_url: str = BASE_URL, concurrency: int = 32, client: Optional[BalanceClient] = None):
+        self.concurrency = concurrency
+        # One pooled connection per worker so every request reuses a warm socket
+        self.client = client or BalanceClient(base_url, session=fcm_transport.get_session(pool_maxsize=concurrency))
+
+    def fetch_one(self, index: int, wallet: WalletRef) -> WalletBalance:
+        """Look up a single wallet and never raise"""
+        user_id, blockchain, address = wallet
+        started = time.perf_counter()
+        try:
+            response = self.client.get_balance(user_id)
+            if isinstance(response, dict) and response.get("success") is False:
+                result = WalletBalance(index, user_id, blockchain, address, False,
+                                       error=response.get("message") or "Unknown error")
+            else:
+                result = WalletBalance(index, user_id, blockchain, address, True, balances_for(response, blockchain))
+        except Exception as e:
+            result = WalletBalance(index, user_id, blockchain, address, False, error=f"{type(e).__name__}: {e}")
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def iter_fetch(self, wallets: Iterable[WalletRef]) -> Iterator[WalletBalance]:
+        """Yield results in completion order, never holding more than `concurrency` pending lookups"""
+        return iter_windowed(wallets, self.fetch_one, self.concurrency)
+
+    def fetch(self, wallets: Iterable[WalletRef]) -> List[WalletBalance]:
+        """Look up every wallet and return results in input order"""
+        return sorted(self.iter_fetch(wallets), key=lambda r: r.index)
+
+
+def fetch_direct(base_url: str, index: int, wallet: WalletRef) -> WalletBalance:
+    """One uncached, unshared balance request for one wallet"""
+    user_id, blockchain, address = wallet
+    started = time.perf_counter()
+    response = fcm_transport.post(f"{base_url}balance", json=build_balance_request(user_id),
+                                  headers=HEADERS, timeout=30)
+    body = fast_json.response_json(response)
+    return WalletBalance(index, user_id, blockchain, address, response.status_code == 200,
+                         balances_for(body, blockchain), elapsed=time.perf_counter() - started)
+
+
+def fetch_sequential(base_url: str, wallets: Iterable[WalletRef]) -> List[WalletBalance]:
+    """What one script invocation per wallet does: a blocking request each, in turn"""
+    return [fetch_direct(base_url, index, wallet) for index, wallet in enumerate(wallets)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    base_url = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print("📚 Bulk Balance Fetch Benchmark")
+    print("=" * 50)
+
+    stop = None
+    if base_url is None:
+        from api_stand_in import API_PREFIX, ApiStandIn
+
+        base_url, stop = ApiStandIn().server().run_in_thread()
+        base_url += API_PREFIX
+        print(f"🧪 Using bundled stand-in at {base_url}")
+
+    # Two wallets (bitcoin + ethereum) per user, like a typical multi-chain account
+    wallets = [
+        (f"bench-user-{i // 2:06d}", ("bitcoin", "ethereum")[i % 2], f"bench-address-{i:06d}")
+        for i in range(count)
+    ]
+    try:
+        started = time.perf_counter()
+        sequential = fetch_sequential(base_url, wallets)
+        sequential_seconds = time.perf_counter() - started
+        print(f"\n▶️  Sequential single requests: {len(sequential)} wallets in {sequential_seconds:.2f}s "
+              f"→ {len(sequential) / sequential_seconds:.1f} wallets/s")
+
+        # Same one-request-per-wallet calls, only run concurrently: no cache, no per-user sharing
+        fcm_transport.configure(pool_maxsize=concurrency)
+        started = time.perf_counter()
+        ok = sum(r.success for r in iter_windowed(wallets, lambda i, w: fetch_direct(base_url, i, w), concurrency))
+        concurrent_seconds = time.perf_counter() - started
+        print(f"▶️  Concurrent single requests (concurrency {concurrency}): {ok}/{count} wallets in "
+              f"{concurrent_seconds:.2f}s → {count / concurrent_seconds:.1f} wallets/s")
+
+        fetcher = BulkBalanceFetcher(base_url, concurrency=concurrency)
+        started = time.perf_counter()
+        first = None
+        ok = 0
+        for result in fetcher.iter_fetch(wallets):
+            first = first or time.perf_counter() - started
+            ok += result.success
+        bulk_seconds = time.perf_counter() - started
+        print(f"▶️  Bulk (concurrency {concurrency}): {ok}/{count} wallets in {bulk_seconds:.2f}s "
+              f"→ {count / bulk_seconds:.1f} wallets/s, first result after {first * 1000:.0f} ms")
+        print(f"   backend requests: {fetcher.client.stats.backend_calls} "
+              f"(coalesced {fetcher.client.stats.coalesced}, cache hits {fetcher.client.stats.hits})")
+        print(f"\n🚀 Speedup over sequential")
+        print(f"   concurrency alone             : {sequential_seconds / concurrent_seconds:.1f}x")
+        print(f"   + per-user request sharing    : {concurrent_seconds / bulk_seconds:.1f}x more")
+        print(f"   bulk fetcher total            : {sequential_seconds / bulk_seconds:.1f}x")
+    finally:
+        if stop is not None:
+            stop()
+        fcm_transport.close_all()
+
+
+if __name__ == "__main__":
+    main()
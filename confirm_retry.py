@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+🔁 send/confirm response classifier & retry engine
+دسته‌بندی پاسخ‌های send/confirm و تلاش مجدد فقط برای خطاهای گذرا
+
+classify_confirm() sorts every confirm response into one of three kinds:
+
+  * success   — 200, or a 400 that is really a success ("Transaction sent
+                successfully" or a tx_hash in the body)
+  * retryable — rejected before anything was broadcast: "Failed to broadcast
+                transaction via Tatum API", 429, 503 with Retry-After, or a
+                connection that was refused before sending
+  * fatal     — anything else, including timeouts, 500, 502 and 504 (the
+                broadcast may have gone out, so resending could broadcast twice)
+
+ConfirmRetrier retries only the retryable kind, with RetryPolicy backoff
+(Retry-After aware), so disguised successes are never re-sent.
+
+    retrier = ConfirmRetrier()
+    outcome = retrier.run(lambda: classify_response(post_confirm()))
+    if outcome.success:
+        print(outcome.tx_hash, outcome.attempts)
+
+Usage: python confirm_retry.py [COUNT] [BROADCAST_FAILURE_RATE]
+       (compares naive retry-any-400 with the classifier against the API stand-in)
+"""
+
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Optional
+
+from fcm_ratelimit import RetryPolicy
+
+SUCCESS, RETRYABLE, FATAL = "success", "retryable", "fatal"
+
+# Message of a 400 confirm response whose transaction was in fact broadcast
+CONFIRM_SUCCESS_MESSAGE = "Transaction sent successfully"
+
+# Messages of transient backend failures worth another confirm
+RETRYABLE_MESSAGES = ("Failed to broadcast transaction via Tatum API",)
+
+# Unlike FCM sends, a confirm may have broadcast before a 500/502/504 came back, so only
+# rejections are retried: 429 always, 503 only when the server says when to come back
+CONFIRM_RETRYABLE_STATUS = frozenset({429})
+CONFIRM_RETRY_AFTER_STATUS = frozenset({503})
+
+
+@dataclass(frozen=True)
+class ConfirmOutcome:
+    kind: str
+    status_code: Optional[int] = None
+    tx_hash: Optional[str] = None
+    message: Optional[str] = None
+    retry_after: Optional[str] = None
+    attempts: int = 1
+
+    @property
+    def success(self) -> bool:
+        return self.kind == SUCCESS
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind == RETRYABLE
+
+
+def classify_confirm(status_code: int, body: Any, retry_after: Optional[str] = None) -> ConfirmOutcome:
+    """Classify a send/confirm response from its status and parsed JSON body"""
+    body = body if isinstance(body, dict) else {}
+    tx_hash = body.get("tx_hash") or body.get("transaction_hash")
+    message = body.get("message") or ""
+    if status_code == 200 or (status_code == 400 and (message == CONFIRM_SUCCESS_MESSAGE or tx_hash)):
+        kind = SUCCESS
+    elif (status_code in CONFIRM_RETRYABLE_STATUS or (status_code in CONFIRM_RETRY_AFTER_STATUS and retry_after)
+          or any(m in message for m in RETRYABLE_MESSAGES)):
+        kind = RETRYABLE
+    else:
+        kind = FATAL
+    return ConfirmOutcome(kind, status_code, tx_hash, message or None, retry_after)
+
+
+def classify_exception(error: BaseException) -> ConfirmOutcome:
+    """Classify a confirm that never got a response"""
+    # Refused means nothing reached the backend; anything later may have been broadcast
+    kind = RETRYABLE if isinstance(error, ConnectionRefusedError) else FATAL
+    return ConfirmOutcome(kind, message=f"{type(error).__name__}: {error}")
+
+
+def classify_response(response: Any) -> ConfirmOutcome:
+    """classify_confirm() for a requests.Response or async_http.Response"""
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    return classify_confirm(status, body, response.headers.get("Retry-After") or response.headers.get("retry-after"))
+
+
+class ConfirmRetrier:
+    """Runs a confirm attempt until it is not retryable or retries run out"""
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, sleep: Callable[[float], None] = time.sleep):
+        self.policy = policy or RetryPolicy(max_retries=3, base=0.5, cap=8.0)
+        self.sleep = sleep
+
+    def _next_delay(self, outcome: ConfirmOutcome, attempt: int) -> Optional[float]:
+        if not outcome.retryable or attempt >= self.policy.max_retries:
+            return None
+        if not self.policy.within_limit(outcome.retry_after):
+            return None
+        return self.policy.delay(attempt, outcome.retry_after)
+
+    def run(self, attempt_once: Callable[[], ConfirmOutcome]) -> ConfirmOutcome:
+        attempt = 0
+        while True:
+            try:
+                outcome = attempt_once()
+            except Exception as e:
+                outcome = classify_exception(e)
+            delay = self._next_delay(outcome, attempt)
+            if delay is None:
+                return replace(outcome, attempts=attempt + 1)
+            self.sleep(delay)
+            attempt += 1
+
+    async def run_async(self, attempt_once: Callable[[], Awaitable[ConfirmOutcome]]) -> ConfirmOutcome:
+        attempt = 0
+        while True:
+            try:
+                outcome = await attempt_once()
+            except Exception as e:
+                outcome = classify_exception(e)
+            delay = self._next_delay(outcome, attempt)
+            if delay is None:
+                return replace(outcome, attempts=attempt + 1)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def classify_any_400_retryable(status_code: int, body: Any, retry_after: Optional[str] = None) -> ConfirmOutcome:
+    """The naive rule the classifier replaces: every non-200 is worth another try"""
+    body = body if isinstance(body, dict) else {}
+    return ConfirmOutcome(SUCCESS if status_code == 200 else RETRYABLE, status_code,
+                          body.get("tx_hash"), body.get("message"), retry_after)
+
+
+async def _compare(count: int, failure_rate: float):
+    from api_stand_in import API_PREFIX, ApiStandIn, StandInConfig
+    from payout_pipeline import Payout, PayoutPipeline
+
+    policy = RetryPolicy(max_retries=3, base=0.05, cap=0.5)
+    for label, classify in (("naive (retry any non-200)", classify_any_400_retryable),
+                            ("classifier", classify_confirm)):
+        stand_in = ApiStandIn(StandInConfig(broadcast_failure_rate=failure_rate, disguised_success_rate=0.2))
+        server = stand_in.server()
+        base_url = await server.start() + API_PREFIX
+        try:
+            pipeline = PayoutPipeline(base_url, retrier=ConfirmRetrier(policy), classify=classify)
+            payouts = [Payout(f"0x{i:040x}", f"0x{i + 1:040x}", "0.01000000") for i in range(count)]
+            started = time.perf_counter()
+            results = [r async for r in pipeline.iter_submit(payouts)]
+            elapsed = time.perf_counter() - started
+        finally:
+            await server.close()
+        landed = stand_in.broadcasts
+        confirms = stand_in.calls["send/confirm"]
+        print(f"\n▶️  {label}")
+        print(f"   payouts reported ok : {sum(r.success for r in results)}/{count}  (actually broadcast: {landed})")
+        print(f"   confirm round trips : {confirms}  ({confirms / count:.2f} per payout) in {elapsed:.2f}s")
+        print(f"   duplicate confirms  : {stand_in.duplicate_confirms}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    failure_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    print("🔁 Confirm Retry Comparison")
+    print("=" * 50)
+    print(f"   {count} payouts, {failure_rate:.0%} Tatum broadcast failures, 20% disguised 400 successes")
+    asyncio.run(_compare(count, failure_rate))
+
+
+if __name__ == "__main__":
+    main()
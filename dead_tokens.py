@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+🪦 Dead-token store
+ذخیره توکن‌های نامعتبر FCM و حذف آن‌ها از ارسال‌های بعدی
+
+Tokens FCM reports as NotRegistered / InvalidRegistration (UNREGISTERED in
+HTTP v1, UnregisteredError in the Admin SDK) are recorded in SQLite and
+filtered out of every later batch. Lookups go through an in-memory Bloom
+filter first, so the common case (a live token) never touches the database.
+
+export() writes the prune list for the notifications/register-device
+backend (DeviceToken, error, first/last seen), optionally only the tokens
+not exported before.
+
+Usage: python dead_tokens.py DEAD_TOKENS_DB [PRUNE_FILE]   (.csv, else JSONL)
+"""
+
+import csv
+import json
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from notification_dedup import BloomFilter
+
+# Per-result errors that mean the token will never work again
+DEAD_ERRORS = frozenset({"NotRegistered", "InvalidRegistration", "UNREGISTERED", "UnregisteredError"})
+
+# SendResult.error for messages skipped because the token is known dead
+DEAD_TOKEN_ERROR = "DeadToken"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_tokens (
+    token       TEXT PRIMARY KEY,
+    error       TEXT NOT NULL,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 1,
+    exported    REAL
+) WITHOUT ROWID;
+"""
+
+
+def is_dead_error(error: Optional[str]) -> bool:
+    return error in DEAD_ERRORS
+
+
+class DeadTokenStore:
+    """SQLite-backed set of dead tokens with a Bloom filter in front"""
+
+    def __init__(self, path: str, batch_size: int = 500, error_rate: float = 0.001):
+        self.path = path
+        self.batch_size = batch_size
+        self.error_rate = error_rate
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._rebuild_bloom()
+
+    def _rebuild_bloom(self, minimum: int = 0):
+        count = self._db.execute("SELECT COUNT(*) FROM dead_tokens").fetchone()[0]
+        # Room to double before the next rebuild
+        self._bloom_capacity = max(1024, 2 * max(count, minimum))
+        self._bloom = BloomFilter(self._bloom_capacity, self.error_rate)
+        for (token,) in self._db.execute("SELECT token FROM dead_tokens"):
+            self._bloom.add(token.encode())
+
+    def add(self, token: str, error: str = "NotRegistered"):
+        """Record a dead token (buffered; committed every `batch_size` adds)"""
+        with self._lock:
+            self._pending[token] = (error, time.time())
+            self._bloom.add(token.encode())
+            if self._bloom.count >= self._bloom_capacity:
+                # Full: grow before the false-positive rate climbs
+                self._flush_locked()
+                self._rebuild_bloom(self._bloom.count)
+            elif len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def record(self, token: str, error: Optional[str]) -> bool:
+        """Add `token` if `error` marks it dead; returns whether it did"""
+        if is_dead_error(error):
+            self.add(token, error)
+            return True
+        return False
+
+    def record_results(self, results: Iterable[Any]) -> int:
+        """Collect dead tokens from SendResults (or anything with .token/.error)"""
+        added = 0
+        for result in results:
+            added += self.record(result.token, result.error)
+        return added
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._db.execute("BEGIN")
+        self._db.executemany(
+            "INSERT INTO dead_tokens (token, error, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (token) DO UPDATE SET error = excluded.error, last_seen = excluded.last_seen, hits = hits + 1",
+            [(token, error, seen, seen) for token, (error, seen) in self._pending.items()],
+        )
+        self._db.execute("COMMIT")
+        self._pending.clear()
+
+    def __contains__(self, token: str) -> bool:
+        if token.encode() not in self._bloom:
+            return False
+        with self._lock:
+            if token in self._pending:
+                return True
+            return self._db.execute("SELECT 1 FROM dead_tokens WHERE token = ?", (token,)).fetchone() is not None
+
+    def filter_tokens(self, tokens: Iterable[str]) -> Iterator[str]:
+        """Yield only tokens not known to be dead"""
+        for token in tokens:
+            if token in self:
+                self.skipped += 1
+            else:
+                yield token
+
+    def filter(self, messages: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+        """Yield only (token, payload) pairs whose token is not known to be dead"""
+        for token, payload in messages:
+            if token in self:
+                self.skipped += 1
+            else:
+                yield token, payload
+
+    def discard(self, token: str):
+        """Forget a token (e.g. the device re-registered it)"""
+        with self._lock:
+            self._pending.pop(token, None)
+            self._db.execute("DELETE FROM dead_tokens WHERE token = ?", (token,))
+
+    def export(self, path: str, only_new: bool = True) -> int:
+        """
+        Write the prune list for notifications/register-device: CSV for .csv,
+        JSONL otherwise. With only_new, tokens exported before are skipped and
+        this export is remembered. Returns the number of tokens written.
+        """
+        where = " WHERE exported IS NULL" if only_new else ""
+        columns = ("DeviceToken", "error", "first_seen", "last_seen", "hits")
+        written = 0
+        # Held throughout so nothing added mid-export is marked exported without being written
+        with self._lock, open(path, "w", newline="") as f:
+            self._flush_locked()
+            rows = self._db.execute(
+                "SELECT token, error, first_seen, last_seen, hits FROM dead_tokens" + where + " ORDER BY first_seen"
+            )
+            writer = csv.writer(f) if str(path).endswith(".csv") else None
+            if writer:
+                writer.writerow(columns)
+            for row in rows:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(dict(zip(columns, row))) + "\n")
+                written += 1
+            if only_new and written:
+                self._db.execute("UPDATE dead_tokens SET exported = ? WHERE exported IS NULL", (time.time(),))
+        return written
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        counts = dict(self._db.execute("SELECT error, COUNT(*) FROM dead_tokens GROUP BY error").fetchall())
+        not_exported = self._db.execute("SELECT COUNT(*) FROM dead_tokens WHERE exported IS NULL").fetchone()[0]
+        return {"total": sum(counts.values()), "not_exported": not_exported, **counts}
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._db.execute("SELECT COUNT(*) FROM dead_tokens").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("❌ Usage: python dead_tokens.py DEAD_TOKENS_DB [PRUNE_FILE]")
+        sys.exit(1)
+
+    with DeadTokenStore(sys.argv[1]) as store:
+        print(f"🪦 Dead-token store: {sys.argv[1]}")
+        for name, count in store.stats().items():
+            print(f"   {name.ljust(20)} : {count}")
+        if len(sys.argv) > 2:
+            written = store.export(sys.argv[2])
+            print(f"\n💾 {written} new tokens written to {sys.argv[2]} for register-device pruning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+📲 Bulk device registration
+ثبت گروهی دستگاه‌ها در notifications/register-device با رد کردن توکن‌های بدون تغییر
+
+Re-registers devices in waves (e.g. after an app update) the way the app
+does, one POST notifications/register-device per device, but with N
+requests in flight over pooled keep-alive connections. A local SQLite
+cache remembers a hash of the last body registered for every
+(UserID, WalletID, DeviceName, DeviceType) and skips devices whose token
+has not changed since.
+
+    with RegistrationCache() as cache:          # registered_devices.db next to this script
+        registrar = BulkRegistrar(concurrency=32, cache=cache)
+        for result in registrar.iter_register(registrations):
+            ...
+
+Usage: python device_registration.py [COUNT] [CONCURRENCY] [BASE_URL]
+       (without BASE_URL, benchmarks against the bundled API stand-in)
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import fast_json
+import fcm_transport
+from fcm_dispatch import iter_windowed
+from fcm_ratelimit import Attempt, RetryPolicy
+from test_flutter_api_simple import BASE_URL, HEADERS
+
+REGISTRATIONS_DB = Path(__file__).parent / "registered_devices.db"
+
+# RegistrationResult.error for devices skipped because nothing changed
+UNCHANGED = "Unchanged"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS registrations (
+    device         TEXT PRIMARY KEY,
+    digest         BLOB NOT NULL,
+    registered_at  REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass(frozen=True)
+class Registration:
+    user_id: str
+    wallet_id: str
+    device_token: str
+    device_name: str
+    device_type: str = "android"
+
+    def to_request(self) -> Dict[str, str]:
+        """register-device body, same shape as the app's RegisterDeviceRequest"""
+        return {
+            "UserID": self.user_id,
+            "WalletID": self.wallet_id,
+            "DeviceToken": self.device_token,
+            "DeviceName": self.device_name,
+            "DeviceType": self.device_type,
+        }
+
+    @property
+    def device(self) -> str:
+        return "\x1f".join((self.user_id, self.wallet_id, self.device_name, self.device_type))
+
+
+def _digest(body: bytes) -> bytes:
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+@dataclass
+class RegistrationResult:
+    index: int
+    registration: Registration
+    success: bool
+    device_id: Optional[str] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    elapsed: float = 0.0
+
+    @property
+    def skipped(self) -> bool:
+        return self.error == UNCHANGED
+
+
+class RegistrationCache:
+    """SQLite record of the last body successfully registered per device"""
+
+    def __init__(self, path: str = str(REGISTRATIONS_DB), batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[bytes, float]] = {}
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def is_current(self, device: str, digest: bytes) -> bool:
+        """Whether `digest` is what was last registered for `device`"""
+        with self._lock:
+            pending = self._pending.get(device)
+            if pending is not None:
+                return pending[0] == digest
+            row = self._db.execute("SELECT digest FROM registrations WHERE device = ?", (device,)).fetchone()
+        return row is not None and row[0] == digest
+
+    def mark(self, device: str, digest: bytes):
+        """Remember a successful registration (buffered; committed every `batch_size`)"""
+        with self._lock:
+            self._pending[device] = (digest, time.time())
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def forget(self, device: str):
+        with self._lock:
+            self._pending.pop(device, None)
+            self._db.execute("DELETE FROM registrations WHERE device = ?", (device,))
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._db.execute("BEGIN")
+        self._db.executemany(
+            "INSERT INTO registrations (device, digest, registered_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (device) DO UPDATE SET digest = excluded.digest, registered_at = excluded.registered_at",
+            [(device, digest, seen) for device, (digest, seen) in self._pending.items()],
+        )
+        self._db.execute("COMMIT")
+        self._pending.clear()
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._db.execute("SELECT COUNT(*) FROM registrations").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BulkRegistrar:
+    """Bounded-concurrency register-device client over the shared pooled transport"""
+
+    def __init__(self, base_url: str = BASE_URL, concurrency: int = 32, cache: Optional[RegistrationCache] = None,
+                 retry_policy: Optional[RetryPolicy] = None, timeout: float = 30):
+        self.url = f"{base_url}notifications/register-device"
+        self.concurrency = concurrency
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=3, base=0.5, cap=8.0)
+        self.timeout = timeout
+        # One pooled connection per worker so every request reuses a warm socket
+        self.session = fcm_transport.get_session(pool_maxsize=concurrency)
+
+    def register_one(self, index: int, registration: Registration, body: Optional[bytes] = None) -> RegistrationResult:
+        """Register a single device, retrying 429/5xx, and never raise"""
+        body = body or fast_json.dumps(registration.to_request())
+        started = time.perf_counter()
+
+        def attempt_once(attempt: int) -> Attempt:
+            try:
+                response = fcm_transport.session_post(self.session, self.url, data=body, headers=HEADERS,
+                                                      timeout=self.timeout)
+            except Exception as e:
+                return Attempt(RegistrationResult(index, registration, False, error=f"{type(e).__name__}: {e}"))
+            result = _parse_response(index, registration, response)
+            return Attempt(result, result.status_code, retry_after=response.headers.get("Retry-After"),
+                           done=result.success)
+
+        result = self.retry_policy.run(attempt_once)
+
+        if result.success and self.cache is not None:
+            self.cache.mark(registration.device, _digest(body))
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def iter_register(self, registrations: Iterable[Registration]) -> Iterator[RegistrationResult]:
+        """Yield results in completion order, never holding more than `concurrency` pending calls"""
+        bodies = ((registration, fast_json.dumps(registration.to_request())) for registration in registrations)
+        yield from iter_windowed(bodies, lambda index, item: self.register_one(index, *item), self.concurrency,
+                                 shortcut=self._unchanged)
+        if self.cache is not None:
+            self.cache.flush()
+
+    def _unchanged(self, index: int, item: Tuple[Registration, bytes]) -> Optional[RegistrationResult]:
+        registration, body = item
+        if self.cache is not None and self.cache.is_current(registration.device, _digest(body)):
+            # Registered with exactly this token before: nothing to tell the backend
+            return RegistrationResult(index, registration, True, error=UNCHANGED)
+        return None
+
+    def register(self, registrations: Iterable[Registration]) -> List[RegistrationResult]:
+        """Register every device and return results in input order"""
+        return sorted(self.iter_register(registrations), key=lambda r: r.index)
+
+
+def _parse_response(index: int, registration: Registration, response: Any) -> RegistrationResult:
+    try:
+        body = fast_json.response_json(response)
+    except ValueError:
+        body = None
+    body = body if isinstance(body, dict) else {}
+    if response.status_code == 200 and body.get("success", True):
+        return RegistrationResult(index, registration, True, device_id=body.get("deviceId"),
+                                  status_code=response.status_code)
+    message = body.get("message") or f"HTTP {response.status_code}"
+    return RegistrationResult(index, registration, False, error=message, status_code=response.status_code)
+
+
+def _wave(count: int, rotated: float, generation: int) -> Iterator[Registration]:
+    """`count` devices; a `rotated` fraction got a new FCM token in this `generation`"""
+    step = int(1 / rotated) if rotated else 0
+    for i in range(count):
+        token_generation = generation if step and i % step == 0 else 0
+        yield Registration(f"user-{i:07d}", f"wallet-{i:07d}", f"fcm-token-{i:07d}-g{token_generation}",
+                           "Pixel 8", "android")
+
+
+def _run(label: str, registrar: BulkRegistrar, registrations: Iterable[Registration]):
+    started = time.perf_counter()
+    results = list(registrar.iter_register(registrations))
+    elapsed = time.perf_counter() - started
+    sent = [r for r in results if not r.skipped]
+    ok = sum(r.success for r in sent)
+    print(f"   {label.ljust(30)} : {len(results)} devices, {ok}/{len(sent)} registered, "
+          f"{len(results) - len(sent)} skipped in {elapsed:.2f}s → {len(results) / elapsed:,.0f} devices/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    base_url = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print("📲 Bulk Device Registration Benchmark")
+    print("=" * 50)
+
+    stop = None
+    if base_url is None:
+        from api_stand_in import API_PREFIX, ApiStandIn
+
+        base_url, stop = ApiStandIn().server().run_in_thread()
+        base_url += API_PREFIX
+        print(f"🧪 Using bundled stand-in at {base_url}")
+
+    cache_dir = tempfile.mkdtemp(prefix="registrations-")
+    try:
+        sequential_count = max(1, count // 10)
+        _run(f"one at a time ({sequential_count})", BulkRegistrar(base_url, concurrency=1),
+             _wave(sequential_count, 0, 0))
+        with RegistrationCache(os.path.join(cache_dir, "registered_devices.db")) as cache:
+            registrar = BulkRegistrar(base_url, concurrency=concurrency, cache=cache)
+            _run(f"bulk, first wave (x{concurrency})", registrar, _wave(count, 0, 0))
+            _run("bulk, re-register, 5% rotated", registrar, _wave(count, 0.05, 1))
+            _run("bulk, re-register, unchanged", registrar, _wave(count, 0.05, 1))
+    finally:
+        if stop is not None:
+            stop()
+        fcm_transport.close_all()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+⚡ Pluggable JSON serializer
+لایه سریال‌سازی JSON با orjson/ujson و بازگشت به کتابخانه استاندارد
+
+dumps() returns UTF-8 bytes and loads() accepts bytes, so a payload goes
+from dict to wire (and a response from wire to dict) without an
+intermediate str copy. The fastest installed backend wins:
+
+    orjson → ujson → json (stdlib)
+
+Set FAST_JSON_BACKEND=orjson|ujson|json to force one (e.g. to compare).
+
+    from fast_json import dumps, loads
+    response = session.post(url, data=dumps(payload), headers=headers)
+    result = loads(response.content)
+
+Usage: python fast_json.py [COUNT]   (micro-benchmark on real payload shapes)
+"""
+
+import json
+import os
+import sys
+import timeit
+from typing import Any, Callable, Dict, Tuple, Union
+
+Dumps = Callable[[Any], bytes]
+Loads = Callable[[Union[bytes, str]], Any]
+
+
+def _stdlib() -> Tuple[Dumps, Loads]:
+    # Default-argument json.dumps reuses a cached C encoder; any keyword builds a new JSONEncoder per call.
+    # loads() of bytes pays for encoding detection, so decode UTF-8 first as requests does.
+    json_dumps, json_loads = json.dumps, json.loads
+
+    def loads_(data: Union[bytes, str]) -> Any:
+        return json_loads(data.decode("utf-8") if isinstance(data, (bytes, bytearray)) else data)
+
+    return (lambda obj: json_dumps(obj).encode()), loads_
+
+
+def _orjson() -> Tuple[Dumps, Loads]:
+    import orjson
+    return orjson.dumps, orjson.loads
+
+
+def _ujson() -> Tuple[Dumps, Loads]:
+    import ujson
+    ujson_dumps = ujson.dumps
+    return (lambda obj: ujson_dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")), ujson.loads
+
+
+BACKENDS: Dict[str, Callable[[], Tuple[Dumps, Loads]]] = {
+    "orjson": _orjson,
+    "ujson": _ujson,
+    "json": _stdlib,
+}
+
+
+def available_backends() -> Dict[str, Tuple[Dumps, Loads]]:
+    """Every backend that imports here, fastest first"""
+    found = {}
+    for name, load in BACKENDS.items():
+        try:
+            found[name] = load()
+        except ImportError:
+            continue
+    return found
+
+
+def _select() -> Tuple[str, Dumps, Loads]:
+    forced = os.environ.get("FAST_JSON_BACKEND")
+    if forced:
+        if forced not in BACKENDS:
+            raise ValueError(f"Unknown FAST_JSON_BACKEND '{forced}' (choose from {', '.join(BACKENDS)})")
+        return (forced, *BACKENDS[forced]())
+    name, (dumps_, loads_) = next(iter(available_backends().items()))
+    return name, dumps_, loads_
+
+
+BACKEND, dumps, loads = _select()
+
+
+def response_json(response) -> Any:
+    """Parse a requests.Response body straight from bytes (skips requests' text decoding)"""
+    return loads(response.content)
+
+
+def main():
+    from notification_templates import TEMPLATES
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    token = "euYtawyFT86uVvt5L7shsS:APA91bHoic-emX8mYJNj4-l5MDz6DEA1v0IPdf0x5ri0EWlwvL6SZBnulgzCcd3pSrsOIUOC"
+    payload = TEMPLATES.render_dict(
+        "receive_android", token=token, title="💰 Received: 0.001 BTC", body="From 1A1zP1...eP2sh",
+        transaction_id="tx_123456789", amount="0.001", currency="BTC",
+        from_address="1A1zP1eP2RdK7WbKAXYqPBZ8CQUXBaXr4k", to_address="bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh",
+        wallet_id="c2569417-736b-4352-860f-5f063948b6b1", user_id="2a272775-17e9-4739-a756-67da1090dbcb",
+        timestamp="2025-01-01T12:00:00",
+    )
+    single = json.dumps({"multicast_id": 1, "success": 1, "failure": 0, "canonical_ids": 0,
+                         "results": [{"message_id": "0:1700000000000000%2f0"}]}).encode()
+    multicast = json.dumps({"multicast_id": 1, "success": 1000, "failure": 0, "canonical_ids": 0,
+                            "results": [{"message_id": f"0:{i}"} for i in range(1000)]}).encode()
+
+    cases = {
+        "encode payload": (lambda d, l: lambda: d(payload),
+                           lambda: json.dumps(payload).encode("utf-8")),
+        "decode response": (lambda d, l: lambda: l(single),
+                            lambda: json.loads(single.decode("utf-8"))),
+        "decode 1000-id batch": (lambda d, l: lambda: l(multicast),
+                                 lambda: json.loads(multicast.decode("utf-8"))),
+    }
+
+    print("⚡ JSON serializer benchmark")
+    print("=" * 60)
+    print(f"   active backend: {BACKEND}")
+    print(f"   baseline = stdlib json with str round trip (what requests does today)")
+    for case, (make, baseline) in cases.items():
+        runs = count if "batch" not in case else max(1, count // 100)
+        base = min(timeit.repeat(baseline, number=runs, repeat=3)) / runs
+        print(f"\n   {case}")
+        print(f"      {'baseline'.ljust(10)} : {base * 1e6:8.2f} µs/message")
+        for name, (dumps_, loads_) in available_backends().items():
+            took = min(timeit.repeat(make(dumps_, loads_), number=runs, repeat=3)) / runs
+            print(f"      {name.ljust(10)} : {took * 1e6:8.2f} µs/message  ({base / took:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+⚡ FCM Batch Dispatcher
+ارسال همزمان نوتیفیکیشن‌ها با تعداد محدودی درخواست در جریان
+
+Keeps N requests in flight over pooled keep-alive connections and returns
+one result per (token, payload) pair.
+
+Usage: python fcm_dispatch.py [COUNT] [CONCURRENCY]
+       (benchmarks the dispatcher against the local FCM emulator in its own process)
+"""
+
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+import fast_json
+import fcm_transport
+from dead_tokens import DEAD_TOKEN_ERROR, DeadTokenStore
+from fcm_ratelimit import DEVICE_ERRORS, Attempt, RateLimiter, RetryPolicy
+from latency_metrics import METRICS, LatencyRecorder, Trace
+from notification_dedup import DUPLICATE_ERROR, DedupIndex
+
+FCM_URL = "https://fcm.googleapis.com/fcm/send"
+
+# Sender label for the dispatcher's latency histograms
+LATENCY_SENDER = "fcm_batch"
+
+# (token, payload) where payload is a dict or pre-rendered JSON bytes
+Message = Tuple[str, Union[Dict[str, Any], bytes]]
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def iter_windowed(items: Iterable[T], work: Callable[[int, T], R], concurrency: int,
+                  shortcut: Optional[Callable[[int, T], Optional[R]]] = None) -> Iterator[R]:
+    """
+    Run work(index, item) on a thread pool and yield results in completion
+    order, never holding more than `concurrency` pending calls. The next item
+    is read from `items` only once a call has room, so a generator is never
+    more than `concurrency` items ahead. shortcut(index, item) may return a
+    result to yield straight away instead of submitting the item.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        for index, item in enumerate(items):
+            if shortcut is not None:
+                result = shortcut(index, item)
+                if result is not None:
+                    yield result
+                    continue
+            pending.add(executor.submit(work, index, item))
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+@dataclass
+class SendResult:
+    """Outcome of a single FCM send"""
+    index: int
+    token: str
+    success: bool
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    elapsed: float = 0.0
+
+
+def parse_fcm_response(index: int, token: str, status_code: int, body: Any, text: str = "") -> SendResult:
+    """Turn a legacy /fcm/send response into a SendResult"""
+    if status_code != 200:
+        return SendResult(index, token, False, error=f"HTTP {status_code}: {text}", status_code=status_code)
+
+    first = (body.get('results') or [{}])[0] if isinstance(body, dict) else {}
+    if isinstance(body, dict) and body.get('success', 0) > 0:
+        return SendResult(index, token, True, message_id=first.get('message_id', 'N/A'), status_code=status_code)
+    return SendResult(index, token, False, error=first.get('error', 'Unknown error'), status_code=status_code)
+
+
+class BatchDispatcher:
+    """Bounded-concurrency FCM sender over the shared pooled transport"""
+
+    def __init__(self, server_key: str, concurrency: int = 64,
+                 fcm_url: str = FCM_URL, timeout: float = 30,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 dedup: Optional[DedupIndex] = None,
+                 dead_tokens: Optional[DeadTokenStore] = None,
+                 metrics: Optional[LatencyRecorder] = None):
+        self.fcm_url = fcm_url
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.dedup = dedup
+        self.dead_tokens = dead_tokens
+        self.metrics = metrics or METRICS
+        self.headers = {
+            "Authorization": f"key={server_key}",
+            "Content-Type": "application/json"
+        }
+        # One pooled connection per worker so every request reuses a warm socket
+        self.session = fcm_transport.get_session(pool_maxsize=concurrency)
+
+    def send_one(self, index: int, token: str, payload: Union[Dict[str, Any], bytes]) -> SendResult:
+        """Send a single message, retrying quota/5xx responses, and never raise"""
+        with self.metrics.trace(LATENCY_SENDER) as trace:
+            return self._send_one(index, token, payload, trace)
+
+    def _send_one(self, index: int, token: str, payload: Union[Dict[str, Any], bytes], trace: Trace) -> SendResult:
+        started = time.perf_counter()
+        body_kwarg = {"data": payload} if isinstance(payload, bytes) else {"json": payload}
+
+        def attempt_once(attempt: int) -> Attempt:
+            retry_after = None
+            try:
+                if self.rate_limiter:
+                    self.rate_limiter.acquire(token if attempt == 0 else None)
+                response = fcm_transport.session_post(self.session, self.fcm_url, headers=self.headers,
+                                                      timeout=self.timeout, **body_kwarg)
+                with trace.stage("parse"):
+                    try:
+                        body = fast_json.response_json(response)
+                    except ValueError:
+                        body = None
+                result = parse_fcm_response(index, token, response.status_code, body, response.text)
+                retry_after = response.headers.get("Retry-After")
+            except Exception as e:
+                result = SendResult(index, token, False, error=f"{type(e).__name__}: {e}")
+            error = None if result.status_code != 200 else result.error
+            return Attempt(result, result.status_code, error, retry_after, done=result.success)
+
+        def pause(delay: float, outcome: Attempt):
+            if self.rate_limiter:
+                self.rate_limiter.pause(delay, token=token if outcome.error in DEVICE_ERRORS else None)
+            else:
+                time.sleep(delay)
+
+        result = self.retry_policy.run(attempt_once, pause)
+
+        if not result.success and self.dedup is not None:
+            self.dedup.discard(token, payload)
+        if not result.success and self.dead_tokens is not None:
+            self.dead_tokens.record(token, result.error)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def iter_dispatch(self, messages: Iterable[Message]) -> Iterator[SendResult]:
+        """Yield results in completion order, never holding more than `concurrency` pending sends"""
+        return iter_windowed(messages, lambda index, message: self.send_one(index, *message), self.concurrency,
+                             shortcut=self._skip)
+
+    def _skip(self, index: int, message: Message) -> Optional[SendResult]:
+        token, payload = message
+        if self.dead_tokens is not None and token in self.dead_tokens:
+            # FCM already reported this token as unregistered/invalid
+            self.dead_tokens.skipped += 1
+            return SendResult(index, token, False, error=DEAD_TOKEN_ERROR)
+        if self.dedup is not None and not self.dedup.is_new(token, payload):
+            # Already sent within the dedup window: report it without touching the network
+            return SendResult(index, token, False, error=DUPLICATE_ERROR)
+        return None
+
+    def dispatch(self, messages: Iterable[Message]) -> List[SendResult]:
+        """Send every message and return results in input order"""
+        return sorted(self.iter_dispatch(messages), key=lambda r: r.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # The session belongs to fcm_transport and stays warm for the next batch
+        pass
+
+
+def summarize(results: List[SendResult], elapsed: float) -> Dict[str, Any]:
+    """Aggregate counts and throughput for a batch"""
+    sent = sum(1 for r in results if r.success)
+    return {
+        "total": len(results),
+        "success": sent,
+        "failure": len(results) - sent,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(len(results) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    print("⚡ FCM Batch Dispatcher Benchmark")
+    print("=" * 50)
+
+    from fcm_emulator import LEGACY_PATH, FcmEmulator
+
+    # An in-thread emulator would share the GIL and roughly halve what the dispatcher can show
+    base_url, stop = FcmEmulator().run_in_process()
+    url = base_url + LEGACY_PATH
+    messages = (
+        (f"token-{i}", {"to": f"token-{i}", "data": {"type": "test", "seq": str(i)}})
+        for i in range(count)
+    )
+
+    with BatchDispatcher("local-key", concurrency=concurrency, fcm_url=url) as dispatcher:
+        started = time.perf_counter()
+        results = dispatcher.dispatch(messages)
+        stats = summarize(results, time.perf_counter() - started)
+
+    stop()
+    fcm_transport.close_all()
+    print(f"📤 Sent {stats['total']} messages with concurrency {concurrency}")
+    print(f"   ✅ Success: {stats['success']}  ❌ Failure: {stats['failure']}")
+    print(f"   ⏱️  {stats['seconds']}s → {stats['messages_per_second']} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+🧪 Local FCM emulator
+شبیه‌ساز محلی FCM برای بنچمارک بدون اینترنت
+
+asyncio server that speaks both FCM HTTP APIs with the response shapes the
+senders in this repo parse:
+
+  POST /fcm/send                               legacy (to / registration_ids / /topics/...)
+  POST /v1/projects/{project}/messages:send    HTTP v1
+  POST /iid/v1:batchAdd, /iid/v1:batchRemove   Instance ID topic (un)subscription
+
+Latency is drawn from a configurable distribution per request, errors are
+injected per message at configurable rates, and project/device quotas answer
+429 + Retry-After (legacy devices get DeviceMessageRateExceeded), so every
+throughput feature can be benchmarked reproducibly on one machine.
+
+Tokens starting with "dead-" behave as unregistered and tokens starting with
+"invalid-" as malformed. Topic messages fan out to the tokens subscribed
+through the IID endpoints; error_rates["TopicsMessageRateExceeded"] fails
+a share of them.
+
+    emulator = FcmEmulator(EmulatorConfig(latency=LatencyDistribution("lognormal", 0.02, 0.5)))
+    base_url, stop = emulator.run_in_thread()
+    fcm_url = base_url + LEGACY_PATH
+
+run_in_thread() shares the GIL with the code under test; for peak numbers
+use run_in_process() (~5-6k req/s on one core).
+
+Usage:
+python fcm_emulator.py --port 8081
+python fcm_emulator.py --latency lognormal:0.02:0.5 --error Unavailable=0.01 --quota 600
+"""
+
+import argparse
+import asyncio
+import itertools
+import math
+import multiprocessing as mp
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from async_http import HttpServer, Request, Response, json_response
+from fcm_ratelimit import TokenBucket
+
+LEGACY_PATH = "/fcm/send"
+V1_PATH = re.compile(r"^/v1/projects/([^/]+)/messages:send$")
+IID_BATCH_ADD_PATH = "/iid/v1:batchAdd"
+IID_BATCH_REMOVE_PATH = "/iid/v1:batchRemove"
+TOPIC_PREFIX = "/topics/"
+
+# Instance ID accepts at most this many tokens per batchAdd / batchRemove
+IID_BATCH_LIMIT = 1000
+
+# error_rates entries that apply to topic messages, not to single tokens
+TOPIC_ERRORS = frozenset({"TopicsMessageRateExceeded"})
+
+DEAD_TOKEN_PREFIX = "dead-"
+INVALID_TOKEN_PREFIX = "invalid-"
+
+# Legacy per-message error → (HTTP status, v1 status, v1 errorCode)
+V1_ERRORS: Dict[str, Tuple[int, str, str]] = {
+    "NotRegistered": (404, "NOT_FOUND", "UNREGISTERED"),
+    "InvalidRegistration": (400, "INVALID_ARGUMENT", "INVALID_ARGUMENT"),
+    "MismatchSenderId": (403, "PERMISSION_DENIED", "SENDER_ID_MISMATCH"),
+    "MessageTooBig": (400, "INVALID_ARGUMENT", "INVALID_ARGUMENT"),
+    "DeviceMessageRateExceeded": (429, "RESOURCE_EXHAUSTED", "QUOTA_EXCEEDED"),
+    "Unavailable": (503, "UNAVAILABLE", "UNAVAILABLE"),
+    "InternalServerError": (500, "INTERNAL", "INTERNAL"),
+}
+
+
+@dataclass
+class LatencyDistribution:
+    """
+    Per-request server delay in seconds.
+    kind: constant | uniform (mean ± spread) | normal (σ = spread) |
+          lognormal (median = mean, σ of log = spread) | exponential (mean)
+    """
+    kind: str = "constant"
+    mean: float = 0.0
+    spread: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.kind == "uniform":
+            value = rng.uniform(self.mean - self.spread, self.mean + self.spread)
+        elif self.kind == "normal":
+            value = rng.gauss(self.mean, self.spread)
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(self.mean), self.spread)
+        elif self.kind == "exponential":
+            value = rng.expovariate(1 / self.mean)
+        else:
+            value = self.mean
+        return max(0.0, value)
+
+    @classmethod
+    def parse(cls, text: str) -> "LatencyDistribution":
+        """'lognormal:0.02:0.5' → LatencyDistribution('lognormal', 0.02, 0.5); '0.01' → constant"""
+        parts = text.split(":")
+        if len(parts) == 1:
+            return cls("constant", float(parts[0]))
+        return cls(parts[0], float(parts[1]), float(parts[2]) if len(parts) > 2 else 0.0)
+
+
+@dataclass
+class EmulatorConfig:
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    # Legacy error name → probability per message (e.g. {"Unavailable": 0.01})
+    error_rates: Dict[str, float] = field(default_factory=dict)
+    # Probability of failing a whole request with 503 before looking at it
+    server_error_rate: float = 0.0
+    # Project quota in messages/s (0 = unlimited) and its burst
+    project_rate: float = 0.0
+    project_burst: float = 0.0
+    # Per-device quota in messages/s (0 = unlimited)
+    device_rate: float = 0.0
+    device_burst: float = 1.0
+    retry_after: int = 1
+    require_auth: bool = True
+    seed: Optional[int] = None
+
+
+@dataclass
+class EmulatorStats:
+    requests: int = 0
+    messages: int = 0
+    delivered: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    throttled: int = 0
+    topic_messages: int = 0
+
+    def count_error(self, error: str):
+        self.errors[error] = self.errors.get(error, 0) + 1
+
+
+Route = Callable[[Request], Awaitable[Response]]
+
+
+class FcmEmulator:
+    """In-memory FCM backend behind an async_http.HttpServer"""
+
+    def __init__(self, config: Optional[EmulatorConfig] = None):
+        self.config = config or EmulatorConfig()
+        self.stats = EmulatorStats()
+        self.rng = random.Random(self.config.seed)
+        self._message_ids = itertools.count(1)
+        self._multicast_ids = itertools.count(1)
+        self._project_bucket: Optional[TokenBucket] = None
+        if self.config.project_rate > 0:
+            burst = self.config.project_burst or self.config.project_rate
+            self._project_bucket = TokenBucket(self.config.project_rate, burst)
+        self._device_buckets: Dict[str, TokenBucket] = {}
+        # Topic name → subscribed tokens
+        self.topics: Dict[str, Set[str]] = {}
+        # Extra exact-path routes can be registered here
+        self.routes: Dict[str, Route] = {
+            LEGACY_PATH: self.legacy_send,
+            IID_BATCH_ADD_PATH: self.iid_batch_add,
+            IID_BATCH_REMOVE_PATH: self.iid_batch_remove,
+        }
+
+    # ------------------------------------------------------------ helpers
+
+    def _project_throttled(self, messages: int) -> bool:
+        bucket = self._project_bucket
+        # A multicast larger than the burst would never fit; charge it a full burst instead
+        return bucket is not None and bucket.try_acquire(min(messages, bucket.burst)) > 0
+
+    def _device_throttled(self, token: str) -> bool:
+        if self.config.device_rate <= 0:
+            return False
+        bucket = self._device_buckets.get(token)
+        if bucket is None:
+            bucket = self._device_buckets[token] = TokenBucket(self.config.device_rate, self.config.device_burst)
+        return bucket.try_acquire() > 0
+
+    def _message_error(self, token: str) -> Optional[str]:
+        """Outcome for one message: None for delivered, else a legacy error name"""
+        if not token or token.startswith(INVALID_TOKEN_PREFIX):
+            return "InvalidRegistration"
+        if token.startswith(DEAD_TOKEN_PREFIX):
+            return "NotRegistered"
+        if self._device_throttled(token):
+            return "DeviceMessageRateExceeded"
+        roll = self.rng.random()
+        for error, rate in self.config.error_rates.items():
+            if error in TOPIC_ERRORS:
+                continue
+            if roll < rate:
+                return error
+            roll -= rate
+        return None
+
+    def _record(self, error: Optional[str]):
+        self.stats.messages += 1
+        if error is None:
+            self.stats.delivered += 1
+        else:
+            self.stats.count_error(error)
+
+    def _throttled(self, body: dict) -> Response:
+        self.stats.throttled += 1
+        return json_response(429, body, {"retry-after": str(self.config.retry_after)})
+
+    # ------------------------------------------------------------ routing
+
+    async def handle(self, request: Request) -> Response:
+        self.stats.requests += 1
+        path = request.path.split("?", 1)[0]
+        await asyncio.sleep(self.config.latency.sample(self.rng))
+
+        if self.config.server_error_rate and self.rng.random() < self.config.server_error_rate:
+            self.stats.count_error("HTTP 503")
+            return json_response(503, {"error": "Service Unavailable"}, {"retry-after": str(self.config.retry_after)})
+
+        route = self.routes.get(path)
+        if route is not None:
+            return await route(request)
+        match = V1_PATH.match(path)
+        if match:
+            return await self.v1_send(request, match.group(1))
+        return json_response(404, {"error": f"Unknown path: {path}"})
+
+    async def legacy_send(self, request: Request) -> Response:
+        if self.config.require_auth and not request.headers.get("authorization", "").startswith("key="):
+            return Response(401, {"content-type": "text/html"}, b"<HTML><BODY>Unauthorized</BODY></HTML>")
+        try:
+            message = request.json() or {}
+        except ValueError:
+            return Response(400, {"content-type": "text/plain"}, b"JSON_PARSING_ERROR")
+
+        to = message.get("to") or ""
+        if to.startswith(TOPIC_PREFIX):
+            return self._topic_send(to[len(TOPIC_PREFIX):])
+
+        tokens: List[str] = message.get("registration_ids") or [to]
+        if self._project_throttled(len(tokens)):
+            return self._throttled({"error": "QuotaExceeded"})
+
+        results = []
+        for token in tokens:
+            error = self._message_error(token)
+            self._record(error)
+            results.append({"error": error} if error else {"message_id": f"0:{next(self._message_ids)}"})
+        success = sum(1 for r in results if "message_id" in r)
+        return json_response(200, {
+            "multicast_id": next(self._multicast_ids),
+            "success": success,
+            "failure": len(results) - success,
+            "canonical_ids": 0,
+            "results": results,
+        })
+
+    def _topic_send(self, topic: str) -> Response:
+        # One request, one quota unit; FCM fans it out to every subscriber
+        if self._project_throttled(1):
+            return self._throttled({"error": "QuotaExceeded"})
+        self.stats.topic_messages += 1
+        if self.rng.random() < self.config.error_rates.get("TopicsMessageRateExceeded", 0.0):
+            self.stats.count_error("TopicsMessageRateExceeded")
+            return json_response(200, {"error": "TopicsMessageRateExceeded"})
+        for _ in self.topics.get(topic, ()):
+            self._record(None)
+        return json_response(200, {"message_id": next(self._message_ids)})
+
+    async def iid_batch_add(self, request: Request) -> Response:
+        return self._iid_batch(request, subscribe=True)
+
+    async def iid_batch_remove(self, request: Request) -> Response:
+        return self._iid_batch(request, subscribe=False)
+
+    def _iid_batch(self, request: Request, subscribe: bool) -> Response:
+        if self.config.require_auth and not request.headers.get("authorization", "").startswith("key="):
+            return json_response(401, {"error": "Unauthorized"})
+        try:
+            body = request.json() or {}
+        except ValueError:
+            return json_response(400, {"error": "InvalidJson"})
+        to = body.get("to") or ""
+        tokens = body.get("registration_tokens") or []
+        if not to.startswith(TOPIC_PREFIX) or not tokens:
+            return json_response(400, {"error": "InvalidParameters"})
+        if len(tokens) > IID_BATCH_LIMIT:
+            return json_response(400, {"error": "TooManyTokens"})
+
+        members = self.topics.setdefault(to[len(TOPIC_PREFIX):], set())
+        results = []
+        for token in tokens:
+            if token.startswith(DEAD_TOKEN_PREFIX):
+                results.append({"error": "NOT_FOUND"})
+            elif not token or token.startswith(INVALID_TOKEN_PREFIX):
+                results.append({"error": "INVALID_ARGUMENT"})
+            else:
+                (members.add if subscribe else members.discard)(token)
+                results.append({})
+        return json_response(200, {"results": results})
+
+    async def v1_send(self, request: Request, project: str) -> Response:
+        if self.config.require_auth and not request.headers.get("authorization", "").startswith("Bearer "):
+            return _v1_error(401, "UNAUTHENTICATED", "THIRD_PARTY_AUTH_ERROR",
+                             "Request is missing required authentication credential.")
+        try:
+            message = (request.json() or {}).get("message") or {}
+        except ValueError:
+            return _v1_error(400, "INVALID_ARGUMENT", "INVALID_ARGUMENT", "Invalid JSON payload received.")
+        token = message.get("token")
+        if not token and not message.get("topic") and not message.get("condition"):
+            return _v1_error(400, "INVALID_ARGUMENT", "INVALID_ARGUMENT", "Recipient of the message is not set.")
+
+        if self._project_throttled(1):
+            self.stats.throttled += 1
+            response = _v1_error(429, "RESOURCE_EXHAUSTED", "QUOTA_EXCEEDED", "Quota exceeded for quota metric.")
+            response.headers["retry-after"] = str(self.config.retry_after)
+            return response
+
+        error = self._message_error(token) if token else None
+        self._record(error)
+        if error is None:
+            return json_response(200, {"name": f"projects/{project}/messages/{next(self._message_ids)}"})
+        status, grpc_status, code = V1_ERRORS.get(error, (500, "INTERNAL", "INTERNAL"))
+        response = _v1_error(status, grpc_status, code, error)
+        if status in (429, 503):
+            response.headers["retry-after"] = str(self.config.retry_after)
+        return response
+
+    # ------------------------------------------------------------ serving
+
+    def server(self, host: str = "127.0.0.1", port: int = 0) -> HttpServer:
+        return HttpServer(self.handle, host, port)
+
+    def run_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, Callable[[], None]]:
+        """Serve from a background thread; returns (base_url, stop)"""
+        return self.server(host, port).run_in_thread()
+
+    def run_in_process(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, Callable[[], None]]:
+        """Serve from a child process so it does not compete with the senders for the GIL; returns (base_url, stop)
+
+        The child gets a copy of this emulator: its stats and topics are not visible here.
+        """
+        ready: "mp.Queue" = mp.Queue()
+        process = mp.Process(target=_serve_in_process, args=(self.config, host, port, ready), daemon=True)
+        process.start()
+        base_url = ready.get(timeout=10)
+
+        def stop():
+            process.terminate()
+            process.join()
+
+        return base_url, stop
+
+
+def _serve_in_process(config: EmulatorConfig, host: str, port: int, ready: "mp.Queue"):
+    base_url, _stop = FcmEmulator(config).run_in_thread(host, port)
+    ready.put(base_url)
+    while True:
+        time.sleep(3600)
+
+
+def _v1_error(status: int, grpc_status: str, error_code: str, message: str) -> Response:
+    return json_response(status, {"error": {
+        "code": status,
+        "message": message,
+        "status": grpc_status,
+        "details": [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": error_code}],
+    }})
+
+
+def v1_url(base_url: str, project: str = "coinceeper-f2eaf") -> str:
+    return f"{base_url}/v1/projects/{project}/messages:send"
+
+
+def _parse_error_rates(values: List[str]) -> Dict[str, float]:
+    rates = {}
+    for value in values:
+        name, _, rate = value.partition("=")
+        rates[name] = float(rate)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local FCM emulator (legacy + HTTP v1)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default="0", help="KIND:MEAN[:SPREAD] or MEAN seconds (default: no delay)")
+    parser.add_argument("--error", action="append", default=[], metavar="NAME=RATE",
+                        help="per-message error rate, e.g. Unavailable=0.01 (repeatable)")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--quota", type=float, default=0.0, help="project quota in messages/s (0 = unlimited)")
+    parser.add_argument("--device-quota", type=float, default=0.0, help="per-device quota in messages/s")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    args = parser.parse_args()
+
+    emulator = FcmEmulator(EmulatorConfig(
+        latency=LatencyDistribution.parse(args.latency),
+        error_rates=_parse_error_rates(args.error),
+        server_error_rate=args.server_error_rate,
+        project_rate=args.quota,
+        device_rate=args.device_quota,
+        seed=args.seed,
+    ))
+    server = emulator.server(args.host, args.port)
+
+    async def serve():
+        base_url = await server.start()
+        print(f"🧪 FCM emulator listening on {base_url}")
+        print(f"   legacy : {base_url}{LEGACY_PATH}")
+        print(f"   v1     : {v1_url(base_url, '{project}')}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        stats = emulator.stats
+        print(f"\n👋 Stopped after {stats.requests} requests, {stats.messages} messages "
+              f"({stats.delivered} delivered, {stats.throttled} throttled, errors: {stats.errors or 'none'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+🚦 FCM rate limiting & backoff
+محدودکننده نرخ ارسال و backoff تطبیقی برای FCM
+
+Token buckets per project and per device keep senders at the highest rate
+FCM allows; RetryPolicy turns 429/5xx responses into Retry-After aware
+exponential backoff with full jitter instead of dropped messages. A
+Retry-After longer than max_retry_after ends the retries rather than
+parking the sender.
+
+    limiter = RateLimiter(project_rate=500, device_rate=0.5)
+    policy = RetryPolicy(max_retries=4)
+
+    limiter.acquire(token)
+    ...
+    if policy.should_retry(attempt, response.status_code, retry_after=response.headers.get("Retry-After")):
+        delay = policy.delay(attempt, response.headers.get("Retry-After"))
+        limiter.pause(delay)
+
+    # or let the policy drive the loop
+    def attempt_once(attempt):
+        response = post()
+        return Attempt(response, response.status_code, retry_after=response.headers.get("Retry-After"),
+                       done=response.ok)
+    response = policy.run(attempt_once)
+"""
+
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+# HTTP statuses FCM documents as transient
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Per-message errors in a 200 legacy response that are worth retrying
+RETRYABLE_ERRORS = frozenset({"Unavailable", "InternalServerError", "DeviceMessageRateExceeded"})
+
+# Errors that throttle a single device rather than the whole project
+DEVICE_ERRORS = frozenset({"DeviceMessageRateExceeded"})
+
+DEFAULT_PROJECT = "default"
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst` (rate 0 = unlimited)"""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; otherwise return the seconds to wait (0.0 means taken)"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.rate <= 0:
+                return 0.0
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """Block until tokens are available (or timeout expires)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (e.g. after a quota response)"""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = now
+
+
+@dataclass(frozen=True)
+class RateConfig:
+    rate: float
+    burst: float = 1
+
+
+class RateLimiter:
+    """Project-wide and per-device token buckets, created on demand"""
+
+    def __init__(self, project_rate: float = 500, project_burst: float = 100,
+                 device_rate: float = 0.5, device_burst: float = 1,
+                 projects: Optional[Dict[str, RateConfig]] = None,
+                 max_devices: int = 100_000):
+        self.default_project = RateConfig(project_rate, project_burst)
+        self.device_config = RateConfig(device_rate, device_burst)
+        self.project_configs = dict(projects or {})
+        self.max_devices = max_devices
+        self._projects: Dict[str, TokenBucket] = {}
+        self._devices: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def project_bucket(self, project: str = DEFAULT_PROJECT) -> TokenBucket:
+        with self._lock:
+            bucket = self._projects.get(project)
+            if bucket is None:
+                config = self.project_configs.get(project, self.default_project)
+                bucket = self._projects[project] = TokenBucket(config.rate, config.burst)
+            return bucket
+
+    def device_bucket(self, token: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._devices.get(token)
+            if bucket is None:
+                bucket = self._devices[token] = TokenBucket(self.device_config.rate, self.device_config.burst)
+                # Idle devices are refilled to burst anyway, so the oldest can be dropped
+                if len(self._devices) > self.max_devices:
+                    self._devices.popitem(last=False)
+            else:
+                self._devices.move_to_end(token)
+            return bucket
+
+    def acquire(self, token: Optional[str] = None, project: str = DEFAULT_PROJECT):
+        """Wait for a per-device slot first, then a project-wide one"""
+        if token is not None and self.device_config.rate > 0:
+            self.device_bucket(token).acquire()
+        self.project_bucket(project).acquire()
+
+    def pause(self, seconds: float, project: str = DEFAULT_PROJECT, token: Optional[str] = None):
+        """Back off after FCM signals throttling: one device if `token` is given, else the whole project"""
+        if token is not None:
+            self.device_bucket(token).pause(seconds)
+        else:
+            self.project_bucket(project).pause(seconds)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds; accepts delta-seconds or an HTTP date ("inf"/"nan" are ignored)"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class Attempt:
+    """What one try of a retried call produced"""
+    result: Any
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    retry_after: Optional[str] = None
+    # Final (success, or a failure not worth retrying): stop without asking the policy
+    done: bool = False
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, never shorter than Retry-After"""
+    max_retries: int = 4
+    base: float = 1.0
+    cap: float = 64.0
+    # Longest Retry-After worth waiting for; a longer hint ends the retries instead of parking a worker
+    max_retry_after: float = 300.0
+
+    def should_retry(self, attempt: int, status_code: Optional[int] = None, error: Optional[str] = None,
+                     retry_after: Optional[str] = None) -> bool:
+        if attempt >= self.max_retries or not self.within_limit(retry_after):
+            return False
+        return status_code in RETRYABLE_STATUS or error in RETRYABLE_ERRORS
+
+    def within_limit(self, retry_after: Optional[str]) -> bool:
+        """False when the server asks for a longer wait than max_retry_after"""
+        server_hint = parse_retry_after(retry_after)
+        return server_hint is None or server_hint <= self.max_retry_after
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        backoff = random.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+        server_hint = parse_retry_after(retry_after)
+        if server_hint is not None:
+            # Honour the server, plus a little jitter so retries don't synchronize
+            return min(server_hint, self.max_retry_after) + random.uniform(0, self.base)
+        return backoff
+
+    def run(self, attempt_once: Callable[[int], Attempt],
+            wait: Optional[Callable[[float, Attempt], None]] = None) -> Any:
+        """
+        Call attempt_once(attempt) until it is done or should_retry() says stop,
+        waiting delay() in between (time.sleep unless `wait` is given); returns
+        the last result.
+        """
+        attempt = 0
+        while True:
+            outcome = attempt_once(attempt)
+            if outcome.done or not self.should_retry(attempt, outcome.status_code, outcome.error,
+                                                     outcome.retry_after):
+                return outcome.result
+            delay = self.delay(attempt, outcome.retry_after)
+            if wait is None:
+                time.sleep(delay)
+            else:
+                wait(delay, outcome)
+            attempt += 1
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+🔌 Shared FCM Transport
+لایه اتصال مشترک برای همه ارسال‌کننده‌های FCM
+
+A process-wide pooled requests.Session so TCP+TLS handshakes are paid once
+per connection instead of once per notification. Proxy and CA bundle
+environment variables are read when the session is created.
+
+    from fcm_transport import configure, get, get_session, post
+
+    configure(pool_maxsize=64)            # optional, before first use
+    response = post(FCM_URL, json=payload, headers=headers)
+
+Inside a latency_metrics trace, post() and get() also report serialize, connect,
+tls and response time for the request.
+"""
+
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import fast_json
+import latency_metrics
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """Connection pool settings"""
+    pool_connections: int = 10     # number of distinct hosts kept pooled
+    pool_maxsize: int = 32         # open connections per host
+    pool_block: bool = True        # wait for a free connection instead of opening extras
+    keep_alive: bool = True        # reuse connections and enable TCP keep-alive probes
+    timeout: float = 30
+    max_retries: int = 0
+
+
+class _TimedConnectMixin:
+    """Reports TCP connect time to the active latency trace"""
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._tcp_seconds = time.perf_counter() - started
+            latency_metrics.add_stage("connect", self._tcp_seconds)
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    """Also reports the TLS handshake (connect() minus the TCP part)"""
+
+    def connect(self):
+        self._tcp_seconds = 0.0
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            latency_metrics.add_stage("tls", time.perf_counter() - started - self._tcp_seconds)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that applies TCP keep-alive to every pooled socket and times new connections"""
+
+    def __init__(self, config: TransportConfig):
+        self.transport_config = config
+        super().__init__(
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+            max_retries=config.max_retries,
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.transport_config.keep_alive:
+            kwargs["socket_options"] = _keep_alive_socket_options()
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def _keep_alive_socket_options():
+    options = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    # Linux-only knobs; other platforms keep OS defaults
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 15), ("TCP_KEEPCNT", 4)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+_default_config = TransportConfig()
+_sessions: Dict[TransportConfig, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Pooled sockets belong to the parent; a forked child must open its own
+    global _lock
+    _lock = threading.Lock()
+    _sessions.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def configure(**overrides) -> TransportConfig:
+    """Change the default pool settings used by get_session() and post()"""
+    global _default_config
+    with _lock:
+        _default_config = replace(_default_config, **overrides)
+        return _default_config
+
+
+def get_session(**overrides) -> requests.Session:
+    """Return the shared session for the default config (plus any overrides)"""
+    config = replace(_default_config, **overrides) if overrides else _default_config
+    session = _sessions.get(config)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(config)
+        if session is None:
+            session = requests.Session()
+            adapter = PooledAdapter(config)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if not config.keep_alive:
+                session.headers["Connection"] = "close"
+            _read_environment_once(session)
+            _sessions[config] = session
+        return session
+
+
+def _read_environment_once(session: requests.Session):
+    # With trust_env, every request re-scans os.environ for proxy, no_proxy and CA bundle settings,
+    # which was ~40% of a send's CPU. Without a proxy there is nothing per-URL to decide, so read the
+    # CA bundle now and skip the scans; with a proxy keep requests' per-request no_proxy handling.
+    if requests.utils.getproxies():
+        return
+    session.trust_env = False
+    session.verify = os.environ.get("REQUESTS_CA_BUNDLE") or os.environ.get("CURL_CA_BUNDLE") or True
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    """requests.post() over the shared pooled session"""
+    kwargs.setdefault("timeout", _default_config.timeout)
+    return session_post(get_session(), url, **kwargs)
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    """requests.get() over the shared pooled session"""
+    kwargs.setdefault("timeout", _default_config.timeout)
+    return session_request(get_session(), "GET", url, **kwargs)
+
+
+def session_post(session: requests.Session, url: str, **kwargs: Any) -> requests.Response:
+    """session.post() through session_request()"""
+    return session_request(session, "POST", url, **kwargs)
+
+
+def session_request(session: requests.Session, method: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    session.request() with json= encoded by fast_json straight to bytes,
+    reporting serialize/response time to the active latency trace if any
+    """
+    trace = latency_metrics.current_trace()
+    if trace is None:
+        if kwargs.get("json") is not None:
+            _encode_json(kwargs)
+        return session.request(method, url, **kwargs)
+    return _traced_request(trace, session, method, url, kwargs)
+
+
+def _encode_json(kwargs: Dict[str, Any]):
+    kwargs["data"] = fast_json.dumps(kwargs.pop("json"))
+    headers = dict(kwargs.get("headers") or {})
+    if not any(name.lower() == "content-type" for name in headers):
+        headers["Content-Type"] = "application/json"
+    kwargs["headers"] = headers
+
+
+def _traced_request(trace: latency_metrics.Trace, session: requests.Session, method: str, url: str,
+                    kwargs: Dict[str, Any]) -> requests.Response:
+    if kwargs.get("json") is not None:
+        with trace.stage("serialize"):
+            _encode_json(kwargs)
+
+    handshake_before = trace.stages.get("connect", 0.0) + trace.stages.get("tls", 0.0)
+    started = time.perf_counter()
+    try:
+        return session.request(method, url, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - started
+        handshake = trace.stages.get("connect", 0.0) + trace.stages.get("tls", 0.0) - handshake_before
+        # Whatever the new-connection hooks did not claim is request write + server time + body read
+        trace.add("response", max(0.0, elapsed - handshake))
+
+
+def close_all():
+    """Close every pooled session (mainly for tests and benchmarks)"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
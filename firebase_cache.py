@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+🗝️ Firebase credential & app cache
+کش سراسری برای Service Account و اپ Firebase
+
+Parses the service-account JSON once and initializes the firebase_admin app
+once, so long-running senders pay no per-message auth cost. OAuth access
+tokens need no cache of their own: the app's google-auth credential keeps
+its token and refreshes it only when it is about to expire, so reusing the
+app reuses the token. Every sender here goes through firebase_admin.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+# Same name firebase_admin uses for its default app
+DEFAULT_APP_NAME = "[DEFAULT]"
+
+PathLike = Union[str, Path]
+
+_lock = threading.RLock()
+_service_accounts: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_credentials: Dict[str, Any] = {}
+# App name → (service-account path it was initialized from, app)
+_apps: Dict[str, Tuple[str, Any]] = {}
+
+
+def _key(path: PathLike) -> str:
+    return str(Path(path).resolve())
+
+
+def load_service_account(path: PathLike) -> Dict[str, Any]:
+    """Parsed service-account JSON, re-read only when the file changes"""
+    key = _key(path)
+    mtime = Path(key).stat().st_mtime
+    with _lock:
+        cached = _service_accounts.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(key, 'r') as f:
+            data = json.load(f)
+        _service_accounts[key] = (mtime, data)
+        return data
+
+
+def get_credential(path: PathLike):
+    """Cached firebase_admin Certificate built from the memoized service account"""
+    from firebase_admin import credentials
+
+    key = _key(path)
+    with _lock:
+        cred = _credentials.get(key)
+        if cred is None:
+            cred = credentials.Certificate(load_service_account(key))
+            _credentials[key] = cred
+        return cred
+
+
+def get_app(path: PathLike, name: str = DEFAULT_APP_NAME):
+    """
+    Initialize the firebase_admin app once per process and reuse it afterwards.
+    Raises ValueError if `name` was already initialized from another service account.
+    """
+    import firebase_admin
+
+    key = _key(path)
+    with _lock:
+        cached = _apps.get(name)
+        if cached is not None:
+            if cached[0] != key:
+                raise ValueError(f"Firebase app '{name}' was initialized from {cached[0]}, not {key}")
+            return cached[1]
+        try:
+            app = firebase_admin.get_app(name)
+        except ValueError:
+            app = firebase_admin.initialize_app(get_credential(key), name=name)
+        _apps[name] = (key, app)
+        return app
+
+
+def clear():
+    """Forget every cached service account, credential and app"""
+    with _lock:
+        _service_accounts.clear()
+        _credentials.clear()
+        _apps.clear()
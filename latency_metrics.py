@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+⏱️ Per-stage latency instrumentation
+اندازه‌گیری تأخیر هر مرحله از ارسال نوتیفیکیشن و فراخوانی API
+
+Every send is split into stages (build, serialize, connect, tls, response,
+parse) and each stage lands in an HDR-style histogram: log-linear buckets
+with a fixed relative error, so recording is O(1), memory stays small and
+p99/p999 are accurate across microseconds to minutes.
+
+    from latency_metrics import METRICS
+
+    with METRICS.time("fcm_legacy", "build"):
+        payload = TEMPLATES.render(...)
+    with METRICS.trace("fcm_legacy") as trace:   # fcm_transport.post adds connect/tls/response
+        response = fcm_transport.post(url, data=payload)
+        with trace.stage("parse"):
+            result = response.json()
+
+    METRICS.print_summary()
+    METRICS.write("latency.json")                # or latency.prom for Prometheus text
+
+Usage: python latency_metrics.py EXPORT.json [--prometheus]
+"""
+
+import json
+import math
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+STAGES = ("build", "serialize", "connect", "tls", "response", "parse")
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+PROMETHEUS_METRIC = "laxce_stage_latency_seconds"
+
+
+class Histogram:
+    """
+    HDR-style histogram of durations, stored as integer microseconds.
+    Values below 2 * 10**digits are exact; above that every bucket spans at
+    most 1 / 10**digits of its value (2 digits → under 1% error).
+    """
+
+    def __init__(self, significant_digits: int = 2):
+        self.significant_digits = significant_digits
+        self._sub_bits = (2 * 10 ** significant_digits - 1).bit_length()
+        self._sub_count = 1 << self._sub_bits
+        self._half = self._sub_count >> 1
+        self.counts: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self._sub_bits
+        return shift * self._half + (value >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < self._sub_count:
+            return index
+        shift = index // self._half - 1
+        return ((index - shift * self._half + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1_000_000))
+        self.counts[self._index(value)] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "Histogram"):
+        if other.significant_digits != self.significant_digits:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] += count
+        if other.count:
+            self.min = other.min if self.count == 0 else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, pct: float) -> float:
+        """Value in seconds at or below which `pct` percent of samples fall"""
+        if self.count == 0:
+            return 0.0
+        # Nearest rank: the smallest sample with at least pct% of samples at or below it
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._highest_equivalent(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count / 1_000_000 if self.count else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum_seconds": self.total / 1_000_000,
+            "min_seconds": self.min / 1_000_000,
+            "max_seconds": self.max / 1_000_000,
+            "mean_seconds": self.mean,
+            "percentiles": {str(q * 100).rstrip("0").rstrip("."): self.percentile(q * 100) for q in QUANTILES},
+            "significant_digits": self.significant_digits,
+            # [bucket upper bound in µs, count] — enough to rebuild the histogram
+            "buckets": [[self._highest_equivalent(i), self.counts[i]] for i in sorted(self.counts)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Histogram":
+        histogram = cls(data.get("significant_digits", 2))
+        for value, count in data.get("buckets", []):
+            histogram.counts[histogram._index(value)] += count
+        histogram.count = data.get("count", 0)
+        histogram.total = round(data.get("sum_seconds", 0) * 1_000_000)
+        histogram.min = round(data.get("min_seconds", 0) * 1_000_000)
+        histogram.max = round(data.get("max_seconds", 0) * 1_000_000)
+        return histogram
+
+
+class Trace:
+    """Stage durations for one logical send; retries accumulate into the same stage"""
+
+    __slots__ = ("sender", "stages")
+
+    def __init__(self, sender: str):
+        self.sender = sender
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+
+_local = threading.local()
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace open on this thread, if any"""
+    return getattr(_local, "trace", None)
+
+
+def add_stage(stage: str, seconds: float):
+    """Add time to the trace open on this thread; a no-op outside a trace"""
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+class LatencyRecorder:
+    """Thread-safe set of histograms keyed by (sender, stage)"""
+
+    def __init__(self, significant_digits: int = 2):
+        self.significant_digits = significant_digits
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, sender: str, stage: str) -> Histogram:
+        histogram = self._histograms.get((sender, stage))
+        if histogram is None:
+            histogram = self._histograms[(sender, stage)] = Histogram(self.significant_digits)
+        return histogram
+
+    def record(self, sender: str, stage: str, seconds: float):
+        with self._lock:
+            self._histogram(sender, stage).record(seconds)
+
+    @contextmanager
+    def time(self, sender: str, stage: str) -> Iterator[None]:
+        """Record the duration of the enclosed block as one sample"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(sender, stage, time.perf_counter() - started)
+
+    @contextmanager
+    def trace(self, sender: str) -> Iterator[Trace]:
+        """
+        Collect stages for one send on this thread and record them on exit.
+        Nested calls join the outer trace, so helpers can open one unconditionally.
+        """
+        outer = current_trace()
+        if outer is not None:
+            yield outer
+            return
+        trace = _local.trace = Trace(sender)
+        try:
+            yield trace
+        finally:
+            _local.trace = None
+            with self._lock:
+                for stage, seconds in trace.stages.items():
+                    self._histogram(sender, stage).record(seconds)
+
+    def histograms(self) -> Dict[Tuple[str, str], Histogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def merge(self, other: "LatencyRecorder"):
+        """Fold another recorder's samples into this one (e.g. per-process shards)"""
+        for key, histogram in other.histograms().items():
+            with self._lock:
+                self._histogram(*key).merge(histogram)
+
+    def _ordered(self):
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return sorted(self.histograms().items(), key=lambda kv: (kv[0][0], order.get(kv[0][1], len(order)), kv[0][1]))
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict]]:
+        out: Dict[str, Dict[str, Dict]] = {}
+        for (sender, stage), histogram in self._ordered():
+            out.setdefault(sender, {})[stage] = histogram.to_dict()
+        return out
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, metric: str = PROMETHEUS_METRIC) -> str:
+        """Prometheus text exposition format, one summary per (sender, stage)"""
+        lines = [
+            f"# HELP {metric} Time spent in each stage of a notification or API call",
+            f"# TYPE {metric} summary",
+        ]
+        for (sender, stage), histogram in self._ordered():
+            labels = f'sender="{_escape_label(sender)}",stage="{_escape_label(stage)}"'
+            for q in QUANTILES:
+                lines.append(f'{metric}{{{labels},quantile="{q}"}} {histogram.percentile(q * 100):.6f}')
+            lines.append(f"{metric}_sum{{{labels}}} {histogram.total / 1_000_000:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Export to `path`: Prometheus text for .prom/.txt, JSON otherwise"""
+        text = self.to_prometheus() if str(path).endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+    def print_summary(self):
+        rows = self._ordered()
+        if not rows:
+            return
+        print("\n⏱️  Latency by stage (ms)")
+        print(f"   {'sender'.ljust(16)} {'stage'.ljust(10)} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+        for (sender, stage), h in rows:
+            print(f"   {sender.ljust(16)} {stage.ljust(10)} {h.count:>6} {h.percentile(50) * 1000:>9.2f} "
+                  f"{h.percentile(90) * 1000:>9.2f} {h.percentile(99) * 1000:>9.2f} {h.max / 1000:>9.2f}")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Dict]]) -> "LatencyRecorder":
+        recorder = cls()
+        for sender, stages in data.items():
+            for stage, histogram in stages.items():
+                recorder._histograms[(sender, stage)] = Histogram.from_dict(histogram)
+        return recorder
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide recorder shared by the senders and fcm_transport
+METRICS = LatencyRecorder()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("❌ Usage: python latency_metrics.py EXPORT.json [--prometheus]")
+        sys.exit(1)
+
+    with open(sys.argv[1]) as f:
+        recorder = LatencyRecorder.from_dict(json.load(f))
+    if "--prometheus" in sys.argv[2:]:
+        sys.stdout.write(recorder.to_prometheus())
+    else:
+        recorder.print_summary()
+
+
+if __name__ == "__main__":
+    main()
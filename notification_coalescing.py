@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+📦 Per-device receive coalescing
+ادغام نوتیفیکیشن‌های دریافت پشت‌سرهم یک کیف پول در یک پیام خلاصه
+
+A busy block can credit one wallet several times, and each credit used to
+be its own `receive` message. ReceiveCoalescer opens a window per
+(device token, wallet_id) on the first receive. Later receives for the
+same device and wallet join it, and when the window closes they go out
+as one receive_summary message, e.g. "3 incoming transfers" with
+"0.004 BTC total". Every transaction's own receive data is kept in
+data.transactions. A window that closes with a single receive is sent as
+the normal receive payload, so quiet wallets see no change.
+
+A window closes `window` seconds after its first receive, or early once it
+holds `max_events` transfers or one more transfer would push the rendered
+summary past FCM's 4096-byte payload limit.
+
+    with tester.coalesced_receives(window=5.0) as receives:
+        for event in incoming:                  # ReceiveEvent per credited transfer
+            receives.submit(event)
+
+Usage: python notification_coalescing.py [WALLETS] [WINDOW_SECONDS]   (replays simulated busy blocks)
+"""
+
+import heapq
+import itertools
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fast_json
+from notification_templates import TEMPLATES
+
+# FCM rejects larger payloads with MessageTooBig
+FCM_MAX_PAYLOAD_BYTES = 4096
+
+CoalesceKey = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class ReceiveEvent:
+    token: str
+    wallet_id: str
+    transaction_id: str
+    amount: str
+    currency: str
+    from_address: str
+    to_address: str
+
+    def data(self) -> Dict[str, str]:
+        """The per-transaction fields of a receive payload"""
+        fields = asdict(self)
+        del fields["token"], fields["wallet_id"]
+        return fields
+
+
+def format_totals(events: List[ReceiveEvent]) -> str:
+    """Exact per-currency sums in first-seen order: '0.004 BTC + 25 USDT'"""
+    totals: Dict[str, Decimal] = {}
+    for event in events:
+        try:
+            amount = Decimal(event.amount)
+        except InvalidOperation:
+            continue
+        totals[event.currency] = totals.get(event.currency, Decimal(0)) + amount
+    return " + ".join(f"{format(total.normalize(), 'f')} {currency}" for currency, total in totals.items())
+
+
+def render_receives(events: List[ReceiveEvent]) -> bytes:
+    """One payload for a closed window: the plain receive for one event, else a summary"""
+    first = events[0]
+    if len(events) == 1:
+        return TEMPLATES.render("receive", token=first.token, wallet_id=first.wallet_id, **first.data())
+    return TEMPLATES.render(
+        "receive_summary",
+        token=first.token,
+        wallet_id=first.wallet_id,
+        count=str(len(events)),
+        total=format_totals(events),
+        transaction_ids=",".join(e.transaction_id for e in events),
+        transactions=fast_json.dumps([e.data() for e in events]).decode("utf-8"),
+    )
+
+
+@dataclass
+class CoalescingStats:
+    events: int = 0
+    notifications: int = 0
+    summaries: int = 0
+    delay_total: float = 0.0
+    delay_max: float = 0.0
+
+    @property
+    def saved(self) -> int:
+        """FCM calls avoided compared with one message per receive"""
+        return self.events - self.notifications
+
+    @property
+    def mean_delay(self) -> float:
+        return self.delay_total / self.events if self.events else 0.0
+
+
+class _Window:
+    __slots__ = ("key", "seq", "deadline", "events", "arrived", "payload")
+
+    def __init__(self, key: CoalesceKey, seq: int, deadline: float):
+        self.key = key
+        self.seq = seq
+        self.deadline = deadline
+        self.events: List[ReceiveEvent] = []
+        self.arrived: List[float] = []
+        # Rendered payload of `events`, kept so closing does not render again
+        self.payload = b""
+
+
+class ReceiveCoalescer:
+    """Open windows keyed by (token, wallet_id), closed on deadline or when full"""
+
+    def __init__(self, window: float = 5.0, max_events: int = 20, max_bytes: int = FCM_MAX_PAYLOAD_BYTES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = CoalescingStats()
+        self._open: Dict[CoalesceKey, _Window] = {}
+        # (deadline, seq, key); entries of windows that closed early are skipped when popped
+        self._deadlines: List[Tuple[float, int, CoalesceKey]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, event: ReceiveEvent, now: Optional[float] = None) -> List[Tuple[str, bytes]]:
+        """Queue one receive; returns the (token, payload) messages that are ready to send"""
+        now = self.clock() if now is None else now
+        key = (event.token, event.wallet_id)
+        ready = []
+        with self._lock:
+            self.stats.events += 1
+            window = self._open.get(key)
+            payload = None
+            if window is not None:
+                # Measure what FCM will see: the escaped transaction list plus the rest of the payload
+                payload = render_receives(window.events + [event])
+                if len(payload) > self.max_bytes:
+                    ready.append(self._close(window, now))
+                    window = payload = None
+            if window is None:
+                window = self._open[key] = _Window(key, next(self._seq), now + self.window)
+                heapq.heappush(self._deadlines, (window.deadline, window.seq, key))
+            window.events.append(event)
+            window.arrived.append(now)
+            window.payload = payload if payload is not None else render_receives(window.events)
+            if len(window.events) >= self.max_events:
+                ready.append(self._close(window, now))
+            ready.extend(self._due(now))
+        return ready
+
+    def poll(self, now: Optional[float] = None) -> List[Tuple[str, bytes]]:
+        """Messages for every window whose deadline has passed"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            return self._due(now)
+
+    def flush(self, now: Optional[float] = None) -> List[Tuple[str, bytes]]:
+        """Close every open window now (shutdown)"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            ready = [self._close(window, now) for window in list(self._open.values())]
+            self._deadlines.clear()
+            return ready
+
+    def next_deadline(self) -> Optional[float]:
+        with self._lock:
+            while self._deadlines and not self._is_live(self._deadlines[0]):
+                heapq.heappop(self._deadlines)
+            return self._deadlines[0][0] if self._deadlines else None
+
+    def _is_live(self, entry: Tuple[float, int, CoalesceKey]) -> bool:
+        window = self._open.get(entry[2])
+        return window is not None and window.seq == entry[1]
+
+    def _due(self, now: float) -> List[Tuple[str, bytes]]:
+        ready = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            entry = heapq.heappop(self._deadlines)
+            if self._is_live(entry):
+                ready.append(self._close(self._open[entry[2]], now))
+        return ready
+
+    def _close(self, window: _Window, now: float) -> Tuple[str, bytes]:
+        del self._open[window.key]
+        stats = self.stats
+        stats.notifications += 1
+        stats.summaries += len(window.events) > 1
+        for arrived in window.arrived:
+            stats.delay_total += now - arrived
+            stats.delay_max = max(stats.delay_max, now - arrived)
+        return window.key[0], window.payload
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(w.events) for w in self._open.values())
+
+
+class CoalescingSender:
+    """Closes windows on time in a background thread and hands each message to `send`"""
+
+    def __init__(self, send: Callable[[str, bytes], Any], coalescer: Optional[ReceiveCoalescer] = None):
+        self.send = send
+        self.coalescer = coalescer if coalescer is not None else ReceiveCoalescer()
+        self._wake = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="receive-coalescer", daemon=True)
+        self._thread.start()
+
+    def submit(self, event: ReceiveEvent):
+        ready = self.coalescer.add(event)
+        with self._wake:
+            # A new window may close before the one the timer thread is waiting for
+            self._wake.notify()
+        self._send_all(ready)
+
+    def _send_all(self, messages: List[Tuple[str, bytes]]):
+        for token, payload in messages:
+            self.send(token, payload)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                if self._closed:
+                    return
+                deadline = self.coalescer.next_deadline()
+                timeout = None if deadline is None else max(0.0, deadline - self.coalescer.clock())
+                self._wake.wait(timeout)
+                if self._closed:
+                    return
+            self._send_all(self.coalescer.poll())
+
+    def close(self):
+        """Stop the timer thread and send whatever is still open"""
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+        self._send_all(self.coalescer.flush())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _busy_blocks(wallets: int, minutes: float, rng: random.Random) -> List[Tuple[float, ReceiveEvent]]:
+    """Timed receives: every wallet gets a few bursts of 1-8 transfers a couple of seconds apart"""
+    events = []
+    tx_ids = itertools.count()
+    for w in range(wallets):
+        token, wallet_id = f"fcm-token-{w:06d}", f"wallet-{w:06d}"
+        for _ in range(rng.randint(1, 4)):
+            at = rng.uniform(0, minutes * 60)
+            for _ in range(min(8, int(rng.expovariate(0.45)) + 1)):
+                at += rng.expovariate(1.0)
+                currency = "BTC" if rng.random() < 0.8 else "USDT"
+                amount = f"{rng.randint(1, 5000) / 1e5:.5f}" if currency == "BTC" else str(rng.randint(5, 500))
+                events.append((at, ReceiveEvent(token, wallet_id, f"tx_{next(tx_ids):08d}", amount, currency,
+                                                "1A1zP1eP2RdK7WbKAXYqPBZ8CQUXBaXr4k",
+                                                "bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh")))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def main():
+    wallets = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    window = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    print("📦 Receive Coalescing Replay")
+    print("=" * 50)
+    events = _busy_blocks(wallets, 10, random.Random(11))
+    coalescer = ReceiveCoalescer(window=window)
+    payloads = []
+    for at, event in events + [(float("inf"), None)]:
+        # What the CoalescingSender timer does in real time: close windows at their deadline
+        deadline = coalescer.next_deadline()
+        while deadline is not None and deadline <= at:
+            payloads += [payload for _, payload in coalescer.poll(now=deadline)]
+            deadline = coalescer.next_deadline()
+        if event is not None:
+            payloads += [payload for _, payload in coalescer.add(event, now=at)]
+    largest = max(len(payload) for payload in payloads)
+    sample = next((payload for payload in payloads if b"incoming transfers" in payload), None)
+
+    stats = coalescer.stats
+    print(f"   {wallets:,} wallets, {stats.events:,} receives over 10 minutes, {window:.0f}s window")
+    print(f"   one message per receive : {stats.events:,} FCM calls")
+    print(f"   coalesced               : {stats.notifications:,} FCM calls ({stats.summaries:,} summaries)")
+    print(f"   🚀 {stats.saved:,} calls saved ({stats.saved / stats.events:.0%}), "
+          f"added delay mean {stats.mean_delay:.1f}s / max {stats.delay_max:.1f}s, largest payload {largest:,} B")
+    if sample is not None:
+        notification = fast_json.loads(sample)["notification"]
+        print(f"   e.g. \"{notification['title']}\" — {notification['body']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+🧹 Notification de-duplication
+جلوگیری از ارسال تکراری یک رویداد به یک دستگاه
+
+Drops repeat (transaction_id, token, type) events before they reach the
+network. The exact index is an insertion-ordered dict with a TTL and a hard
+entry cap, so every check is O(1) and memory stays bounded. For windows too
+large to hold exactly, a rotating Bloom filter remembers keys evicted from
+the exact index (at the cost of a small, configurable false-positive rate).
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+DedupKey = Tuple[str, str, str]
+
+DUPLICATE_ERROR = "Duplicate"
+
+_TRANSACTION_ID = re.compile(rb'"(?:transaction_id|transactionId)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_TYPE = re.compile(rb'"type"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _json_string(raw: bytes) -> str:
+    # The captured group is still JSON-escaped; unescape it so it matches the dict path's key
+    return json.loads(b'"' + raw + b'"') if b"\\" in raw else raw.decode()
+
+
+def key_from_payload(token: str, payload: Union[Dict[str, Any], bytes]) -> Optional[DedupKey]:
+    """(transaction_id, token, type) for payloads that carry a transaction id, else None"""
+    if isinstance(payload, bytes):
+        # Pre-rendered bodies: pull the two fields out without a full JSON parse
+        tx = _TRANSACTION_ID.search(payload)
+        if not tx:
+            return None
+        kind = _TYPE.search(payload)
+        return _json_string(tx.group(1)), token, _json_string(kind.group(1)) if kind else ""
+
+    data = payload.get("data") or {}
+    tx_id = data.get("transaction_id") or data.get("transactionId")
+    if not tx_id:
+        return None
+    return str(tx_id), token, str(data.get("type", ""))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over a bytearray"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.size = bits
+        self.hashes = max(1, round(bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((bits + 7) // 8)
+
+    def _positions(self, item: bytes) -> Iterator[int]:
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        # Kirsch–Mitzenmacher: k positions from two hashes
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: bytes):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RotatingBloomFilter:
+    """Two Bloom generations; the older one is dropped every `window` seconds"""
+
+    def __init__(self, capacity: int, window: float, error_rate: float = 0.001,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.window = window
+        self.error_rate = error_rate
+        self.clock = clock
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated = clock()
+
+    def _maybe_rotate(self):
+        now = self.clock()
+        if now - self._rotated >= self.window or self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated = now
+
+    def add(self, item: bytes):
+        self._maybe_rotate()
+        self._current.add(item)
+
+    def __contains__(self, item: bytes) -> bool:
+        return item in self._current or item in self._previous
+
+
+class DedupIndex:
+    """TTL + bounded-size index of recently sent events"""
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1_000_000,
+                 bloom: Optional[RotatingBloomFilter] = None, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bloom = bloom
+        self.clock = clock
+        self.duplicates = 0
+        self._entries: "OrderedDict[DedupKey, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bloom_key(key: DedupKey) -> bytes:
+        return "\x1f".join(key).encode()
+
+    def _evict(self, now: float):
+        # Entries are kept in insertion order with a constant TTL, so expired ones are at the front
+        entries = self._entries
+        while entries:
+            key, expires = next(iter(entries.items()))
+            if expires > now and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+            if self.bloom is not None and expires > now:
+                # Evicted for space, not age: keep remembering it approximately
+                self.bloom.add(self._bloom_key(key))
+
+    def check_and_add(self, key: DedupKey) -> bool:
+        """True if `key` is new (and records it); False if it is a duplicate"""
+        now = self.clock()
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is not None and expires > now:
+                self.duplicates += 1
+                return False
+            if self.bloom is not None and expires is None and self._bloom_key(key) in self.bloom:
+                self.duplicates += 1
+                return False
+            self._entries.pop(key, None)
+            self._entries[key] = now + self.ttl
+            self._evict(now)
+            return True
+
+    def is_new(self, token: str, payload: Union[Dict[str, Any], bytes]) -> bool:
+        """Check a (token, payload) pair; payloads without a transaction id always pass"""
+        key = key_from_payload(token, payload)
+        return key is None or self.check_and_add(key)
+
+    def discard(self, token: str, payload: Union[Dict[str, Any], bytes]):
+        """Forget a pair whose send failed, so a later retry is not mistaken for a duplicate"""
+        key = key_from_payload(token, payload)
+        if key is not None:
+            with self._lock:
+                self._entries.pop(key, None)
+
+    def filter(self, messages: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+        """Yield only the (token, payload) pairs not seen within the TTL"""
+        for token, payload in messages:
+            if self.is_new(token, payload):
+                yield token, payload
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def main():
+    index = DedupIndex(ttl=60, max_entries=100_000)
+    payload = json.dumps({"data": {"type": "receive", "transaction_id": "test_receive_123"}}).encode()
+    count = 500_000
+
+    started = time.perf_counter()
+    for i in range(count):
+        index.is_new(f"token-{i % 1000}", payload)
+    elapsed = time.perf_counter() - started
+
+    print("🧹 Dedup index benchmark")
+    print(f"   {count} checks in {elapsed:.3f}s → {count / elapsed:,.0f} checks/s")
+    print(f"   duplicates dropped: {index.duplicates}")
+
+
+if __name__ == "__main__":
+    main()
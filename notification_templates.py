@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+🧩 Notification payload templates
+قالب‌های از پیش کامپایل‌شده برای انواع نوتیفیکیشن
+
+Each notification type is serialized to JSON once, at import time, with
+"{field}" placeholders left in its string values. Rendering a message only
+escapes the variable fields and joins them with the precompiled chunks, so
+no dict is built and json.dumps is never called per message.
+
+    from notification_templates import TEMPLATES
+
+    body = TEMPLATES.render("receive", token=token, amount="0.001", ...)   # bytes
+    body = TEMPLATES.render("receive", row)                                # values from a dict
+    payload = TEMPLATES.render_dict("receive", token=token, ...)           # dict
+
+Usage: python notification_templates.py [COUNT]   (micro-benchmark)
+"""
+
+import json
+import operator
+import re
+import sys
+import timeit
+from json.encoder import encode_basestring
+from typing import Any, Dict, Optional, Tuple
+
+import fast_json
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class CompiledTemplate:
+    """A payload shape pre-serialized into one format string with field slots"""
+
+    def __init__(self, name: str, shape: Dict[str, Any]):
+        self.name = name
+        self.shape = shape
+        # ASCII literals keep the rendered str compact and the final encode() cheap
+        text = json.dumps(shape, separators=(",", ":"))
+        parts = _PLACEHOLDER.split(text)
+        # parts alternates literal, field, literal, field, ..., literal;
+        # the literals become one %-format string filled from a single itemgetter tuple
+        literals = [p.replace("%", "%%") for p in parts[0::2]]
+        slots = parts[1::2]
+        self._format = literals[0] + "".join("%s" + literal for literal in literals[1:])
+        self.fields = tuple(dict.fromkeys(slots))
+        getter = operator.itemgetter(*slots) if slots else (lambda values: ())
+        # itemgetter returns a bare value (not a tuple) when there is a single slot
+        self._values = getter if len(slots) != 1 else (lambda values: (getter(values),))
+
+    def render_text(self, values: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        if kwargs:
+            values = {**values, **kwargs} if values else kwargs
+        try:
+            row = self._values(values)
+        except KeyError:
+            self._raise_missing(values)
+
+        try:
+            # Fast path: plain string values that need no JSON escaping
+            joined = "".join(row)
+            if '"' not in joined and "\\" not in joined and joined.isprintable():
+                return self._format % row
+        except TypeError:
+            pass
+
+        # Values land inside JSON strings, so escape them without the outer quotes
+        return self._format % tuple(encode_basestring(v if type(v) is str else str(v))[1:-1] for v in row)
+
+    def _raise_missing(self, values: Dict[str, Any]):
+        missing = [f for f in self.fields if f not in values]
+        raise KeyError(f"Template '{self.name}' is missing fields: {', '.join(missing)}") from None
+
+    def render(self, values: Optional[Dict[str, Any]] = None, **kwargs: Any) -> bytes:
+        """Render straight to the UTF-8 JSON request body"""
+        return self.render_text(values, **kwargs).encode("utf-8")
+
+    def render_dict(self, values: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        """Render to a dict for callers that still need to inspect or edit the payload"""
+        return fast_json.loads(self.render(values, **kwargs))
+
+
+class TemplateRegistry:
+    """Name → CompiledTemplate lookup"""
+
+    def __init__(self):
+        self._templates: Dict[str, CompiledTemplate] = {}
+
+    def register(self, name: str, shape: Dict[str, Any]) -> CompiledTemplate:
+        template = CompiledTemplate(name, shape)
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> CompiledTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, values: Optional[Dict[str, Any]] = None, **kwargs: Any) -> bytes:
+        return self._templates[name].render(values, **kwargs)
+
+    def render_dict(self, name: str, values: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        return self._templates[name].render_dict(values, **kwargs)
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._templates)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+
+TEMPLATES = TemplateRegistry()
+
+# ---- NotificationTester types (test_notifications.py) ----
+
+TEMPLATES.register("receive", {
+    "to": "{token}",
+    "notification": {
+        "title": "💰 Received: {amount} {currency}",
+        "body": "From {from_address}"
+    },
+    "data": {
+        "type": "receive",
+        "transaction_id": "{transaction_id}",
+        "amount": "{amount}",
+        "currency": "{currency}",
+        "from_address": "{from_address}",
+        "to_address": "{to_address}",
+        "wallet_id": "{wallet_id}"
+    }
+})
+
+# A burst of receives to one wallet merged into one message (notification_coalescing.py);
+# transactions is the JSON list of the individual receive data objects
+TEMPLATES.register("receive_summary", {
+    "to": "{token}",
+    "notification": {
+        "title": "💰 {count} incoming transfers",
+        "body": "{total} total"
+    },
+    "data": {
+        "type": "receive",
+        "transaction_id": "{transaction_ids}",
+        "count": "{count}",
+        "total": "{total}",
+        "wallet_id": "{wallet_id}",
+        "transactions": "{transactions}"
+    }
+})
+
+TEMPLATES.register("send", {
+    "to": "{token}",
+    "notification": {
+        "title": "💸 Sent: {amount} {currency}",
+        "body": "To {to_address_short}"
+    },
+    "data": {
+        "type": "send",
+        "transaction_id": "{transaction_id}",
+        "amount": "{amount}",
+        "currency": "{currency}",
+        "from_address": "{from_address}",
+        "to_address": "{to_address}",
+        "wallet_id": "{wallet_id}"
+    }
+})
+
+TEMPLATES.register("welcome", {
+    "to": "{token}",
+    "notification": {
+        "title": "🎉 Welcome to Laxce Wallet!",
+        "body": "Your crypto wallet is ready to use"
+    },
+    "data": {
+        "type": "welcome",
+        "wallet_id": "{wallet_id}",
+        "user_id": "{user_id}"
+    }
+})
+
+TEMPLATES.register("price_alert", {
+    "to": "{token}",
+    "notification": {
+        "title": "🚨 Price Alert: {symbol_name}",
+        "body": "{symbol} has reached ${current_price_display}! ({change_display}%)"
+    },
+    "data": {
+        "type": "price_alert",
+        "symbol": "{symbol}",
+        "current_price": "{current_price}",
+        "change_percent": "{change_percent}",
+        "target_price": "{target_price}"
+    }
+})
+
+TEMPLATES.register("transaction", {
+    "to": "{token}",
+    "notification": {
+        "title": "💳 Transaction Confirmed",
+        "body": "Your transaction has been confirmed"
+    },
+    "data": {
+        "type": "transaction",
+        "direction": "{direction}",  # inbound = receive, outbound = send
+        "transaction_id": "{transaction_id}",
+        "amount": "{amount}",
+        "symbol": "{symbol}",
+        "status": "{status}"
+    }
+})
+
+# ---- Android channel variants (server-key and Android test scripts) ----
+
+TEMPLATES.register("receive_android", {
+    "to": "{token}",
+    "notification": {
+        "title": "{title}",
+        "body": "{body}",
+        "sound": "receive_sound",
+        "click_action": "FLUTTER_NOTIFICATION_CLICK",
+        "icon": "notifsmall"
+    },
+    "data": {
+        "transaction_id": "{transaction_id}",
+        "type": "receive",
+        "direction": "inbound",
+        "amount": "{amount}",
+        "currency": "{currency}",
+        "symbol": "{currency}",
+        "from_address": "{from_address}",
+        "to_address": "{to_address}",
+        "wallet_id": "{wallet_id}",
+        "user_id": "{user_id}",
+        "timestamp": "{timestamp}"
+    },
+    "android": {
+        "notification": {
+            "channel_id": "receive_channel",
+            "sound": "receive_sound",
+            "priority": "high"
+        }
+    }
+})
+
+_ANDROID_HIGH_IMPORTANCE = {
+    "notification": {
+        "icon": "ic_launcher_foreground",
+        "color": "#16B369",
+        "sound": "default",
+        "channel_id": "high_importance_channel"
+    }
+}
+
+TEMPLATES.register("test", {
+    "to": "{token}",
+    "notification": {
+        "title": "🎉 Test Notification",
+        "body": "Your Laxce Wallet notifications are working!"
+    },
+    "data": {
+        "type": "test",
+        "timestamp": "{timestamp}",
+        "action": "none"
+    },
+    "android": _ANDROID_HIGH_IMPORTANCE
+})
+
+TEMPLATES.register("transaction_confirmed", {
+    "to": "{token}",
+    "notification": {
+        "title": "Transaction Confirmed ✅",
+        "body": "Your {amount} {symbol} transfer has been confirmed!"
+    },
+    "data": {
+        "type": "transaction",
+        "transactionId": "{transaction_id}",
+        "hash": "{hash}",
+        "amount": "{amount}",
+        "symbol": "{symbol}",
+        "status": "confirmed",
+        "explorerUrl": "{explorer_url}",
+        "action": "view_transaction",
+        "timestamp": "{timestamp}"
+    },
+    "android": _ANDROID_HIGH_IMPORTANCE
+})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    values = {
+        "token": "euYtawyFT86uVvt5L7shsS:APA91bHoic-emX8mYJNj4-l5MDz6DEA1v0IPdf0x5ri0EWlwvL6SZ",
+        "transaction_id": "tx_1700000000", "amount": "0.001", "currency": "BTC",
+        "from_address": "1A1zP1eP2RdK7WbKAXYqPBZ8CQUXBaXr4k",
+        "to_address": "bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh",
+        "wallet_id": "c2569417-736b-4352-860f-5f063948b6b1",
+        "user_id": "2a272775-17e9-4739-a756-67da1090dbcb",
+        "title": "💰 Transaction Received", "body": "You received 0.001 BTC",
+        "timestamp": "2024-01-01T00:00:00",
+    }
+
+    print("🧩 Template render benchmark (best of 5)")
+    print("=" * 50)
+
+    for name in ("receive", "receive_android"):
+        template = TEMPLATES.get(name)
+        row = {f: values[f] for f in template.fields}
+        shape = template.render_dict(row)
+
+        def build_and_dump():
+            # What the scripts do today: rebuild the nested literal, then json.dumps
+            payload = {k: dict(v) if isinstance(v, dict) else v for k, v in shape.items()}
+            return json.dumps(payload).encode()
+
+        baseline = min(timeit.repeat(build_and_dump, number=count, repeat=5)) / count
+        compiled = min(timeit.repeat(lambda: template.render(row), number=count, repeat=5)) / count
+
+        print(f"   {name}")
+        print(f"      dict + json.dumps : {baseline * 1e6:.2f} µs/message")
+        print(f"      compiled template : {compiled * 1e6:.2f} µs/message")
+        print(f"      🚀 speedup        : {baseline / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+🏗️ Pipelined payout submitter
+ارسال گروهی تراکنش‌ها با هم‌پوشانی مراحل prepare و confirm
+
+test_flutter_api_calls runs send/prepare, then send/confirm, then the next
+transaction. PayoutPipeline keeps up to `window` payouts in flight instead:
+prepares for later payouts run while earlier ones are being confirmed, so
+a batch costs about max(prepare, confirm) per payout rather than the sum.
+
+  * back-pressure: the input is only read while fewer than `window`
+    payouts are in the pipeline
+  * per-blockchain limits: at most chain_limits[blockchain] API calls in
+    flight per chain (default_chain_limit otherwise)
+  * confirms go through a ConfirmRetrier: transient broadcast failures are
+    retried with backoff, disguised 400 successes are not
+  * per-sender ordering: confirms of one sender address are broadcast in
+    submission order, so nonces go out in sequence. If a confirm fails,
+    that sender's next payout is prepared again instead of broadcasting a
+    transaction built on the nonce that never landed.
+
+    pipeline = PayoutPipeline(window=32, chain_limits={"polygon": 8})
+    for result in pipeline.submit(payouts):
+        print(result.index, result.success, result.tx_hash)
+
+Usage: python payout_pipeline.py [--count N] [--senders N] [--window N] [--base-url URL]
+       (without --base-url, benchmarks against the bundled API stand-in)
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from async_http import AsyncHttpClient, Response
+from confirm_retry import ConfirmOutcome, ConfirmRetrier, classify_confirm
+from test_flutter_api_simple import (BASE_URL, BLOCKCHAIN, HEADERS, PRIVATE_KEY, USER_ID, build_confirm_request,
+                                     build_prepare_request)
+
+@dataclass
+class Payout:
+    sender: str
+    recipient: str
+    amount: str
+    blockchain: str = BLOCKCHAIN
+    user_id: str = USER_ID
+    private_key: str = PRIVATE_KEY
+
+
+@dataclass
+class PayoutResult:
+    index: int
+    payout: Payout
+    success: bool
+    transaction_id: Optional[str] = None
+    tx_hash: Optional[str] = None
+    error: Optional[str] = None
+    prepares: int = 0
+    confirms: int = 0
+    prepare_seconds: float = 0.0
+    confirm_seconds: float = 0.0
+    elapsed: float = 0.0
+
+
+def _json(response: Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+class PayoutPipeline:
+    """Overlaps send/prepare and send/confirm across a batch of payouts"""
+
+    def __init__(self, base_url: str = BASE_URL, window: int = 32, chain_limits: Optional[Dict[str, int]] = None,
+                 default_chain_limit: int = 16, timeout: float = 30, retrier: Optional[ConfirmRetrier] = None,
+                 classify: Callable[..., ConfirmOutcome] = classify_confirm):
+        self.base_url = base_url
+        self.window = window
+        self.chain_limits = {k.lower(): v for k, v in (chain_limits or {}).items()}
+        self.default_chain_limit = default_chain_limit
+        self.timeout = timeout
+        self.retrier = retrier or ConfirmRetrier()
+        self.classify = classify
+        self._chains: Dict[str, asyncio.Semaphore] = {}
+
+    def _chain(self, blockchain: str) -> asyncio.Semaphore:
+        key = blockchain.lower()
+        slot = self._chains.get(key)
+        if slot is None:
+            slot = self._chains[key] = asyncio.Semaphore(self.chain_limits.get(key, self.default_chain_limit))
+        return slot
+
+    async def _prepare(self, client: AsyncHttpClient, result: PayoutResult) -> Optional[str]:
+        payout = result.payout
+        body = build_prepare_request(payout.user_id, payout.blockchain, payout.sender, payout.recipient, payout.amount)
+        started = time.perf_counter()
+        async with self._chain(payout.blockchain):
+            response = await client.post(f"{self.base_url}send/prepare", json=body, headers=HEADERS)
+        result.prepares += 1
+        result.prepare_seconds += time.perf_counter() - started
+        data = _json(response)
+        transaction_id = data.get("transaction_id") if isinstance(data, dict) else None
+        if response.status != 200 or not transaction_id:
+            result.error = (data or {}).get("message") if isinstance(data, dict) else None
+            result.error = result.error or f"Prepare failed: HTTP {response.status}"
+        return transaction_id if response.status == 200 else None
+
+    async def _confirm(self, client: AsyncHttpClient, result: PayoutResult):
+        payout = result.payout
+        data, headers = build_confirm_request(result.transaction_id, payout.user_id, payout.blockchain,
+                                              payout.private_key)
+
+        async def attempt() -> ConfirmOutcome:
+            started = time.perf_counter()
+            try:
+                async with self._chain(payout.blockchain):
+                    response = await client.post(f"{self.base_url}send/confirm", json=data, headers=headers)
+            finally:
+                result.confirm_seconds += time.perf_counter() - started
+            return self.classify(response.status, _json(response), response.headers.get("retry-after"))
+
+        outcome = await self.retrier.run_async(attempt)
+        result.confirms = outcome.attempts
+        result.success = outcome.success
+        result.tx_hash = outcome.tx_hash
+        result.error = None if outcome.success else outcome.message or f"Confirm failed: HTTP {outcome.status_code}"
+
+    async def _run_one(self, client: AsyncHttpClient, index: int, payout: Payout,
+                       previous: Optional["asyncio.Future"], done: "asyncio.Future") -> PayoutResult:
+        result = PayoutResult(index, payout, False)
+        started = time.perf_counter()
+        try:
+            result.transaction_id = await self._prepare(client, result)
+            if previous is not None:
+                before = await previous
+                if before.transaction_id and not before.success and result.transaction_id:
+                    # The previous transaction never landed: ours was built on its nonce
+                    result.transaction_id = await self._prepare(client, result)
+            if result.transaction_id:
+                await self._confirm(client, result)
+        except Exception as e:
+            result.success = False
+            result.error = f"{type(e).__name__}: {e}"
+        finally:
+            result.elapsed = time.perf_counter() - started
+            done.set_result(result)
+        return result
+
+    async def iter_submit(self, payouts: Iterable[Payout]) -> AsyncIterator[PayoutResult]:
+        """Yield results in completion order while at most `window` payouts are in flight"""
+        loop = asyncio.get_running_loop()
+        window = asyncio.Semaphore(self.window)
+        results: "asyncio.Queue" = asyncio.Queue()
+        latest: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        async with AsyncHttpClient(limit_per_host=self.window * 2, timeout=self.timeout) as client:
+            async def run(index: int, payout: Payout, key: Tuple[str, str], previous, done):
+                try:
+                    await results.put(await self._run_one(client, index, payout, previous, done))
+                finally:
+                    if latest.get(key) is done:
+                        del latest[key]
+                    window.release()
+
+            async def feed():
+                count = 0
+                try:
+                    for index, payout in enumerate(payouts):
+                        await window.acquire()
+                        key = (payout.blockchain.lower(), payout.sender.lower())
+                        done = loop.create_future()
+                        previous, latest[key] = latest.get(key), done
+                        asyncio.create_task(run(index, payout, key, previous, done))
+                        count += 1
+                except Exception as e:
+                    await results.put(e)
+                    return
+                await results.put(count)
+
+            feeder = asyncio.create_task(feed())
+            yielded, total = 0, None
+            try:
+                while total is None or yielded < total:
+                    item = await results.get()
+                    if isinstance(item, BaseException):
+                        raise item
+                    if isinstance(item, int):
+                        total = item
+                        continue
+                    yielded += 1
+                    yield item
+            finally:
+                feeder.cancel()
+                # Let payouts already handed to the backend finish before the client closes
+                for _ in range(self.window):
+                    await window.acquire()
+
+    def submit(self, payouts: Iterable[Payout]) -> List[PayoutResult]:
+        """Blocking helper: run the pipeline and return results in input order"""
+        async def collect():
+            return [result async for result in self.iter_submit(payouts)]
+        return sorted(asyncio.run(collect()), key=lambda r: r.index)
+
+
+async def submit_sequential(base_url: str, payouts: Iterable[Payout]) -> List[PayoutResult]:
+    """What test_flutter_api_calls does: prepare, confirm, then the next payout"""
+    pipeline = PayoutPipeline(base_url, window=1)
+    results = []
+    async with AsyncHttpClient(limit_per_host=1) as client:
+        for index, payout in enumerate(payouts):
+            done = asyncio.get_running_loop().create_future()
+            results.append(await pipeline._run_one(client, index, payout, None, done))
+    return results
+
+
+def _payouts(count: int, senders: int) -> List[Payout]:
+    # Every sender address lives on one chain, so each (chain, sender) is a single nonce sequence
+    chains = ("polygon", "ethereum", "tron")
+    return [
+        Payout(f"0x{i % senders:040x}", f"0x{i + 1:040x}", "0.01000000", chains[i % senders % len(chains)])
+        for i in range(count)
+    ]
+
+
+def _report(label: str, results: List[PayoutResult], seconds: float):
+    ok = sum(r.success for r in results)
+    prepare = sum(r.prepare_seconds for r in results) / len(results) * 1000
+    confirm = sum(r.confirm_seconds for r in results) / len(results) * 1000
+    print(f"   {label.ljust(26)} : {ok}/{len(results)} in {seconds:.2f}s → {seconds / len(results) * 1000:6.1f} ms/payout "
+          f"(prepare {prepare:.0f} ms, confirm {confirm:.0f} ms)")
+
+
+async def _benchmark(args: argparse.Namespace):
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        from api_stand_in import API_PREFIX, ApiStandIn
+
+        server = ApiStandIn().server()
+        base_url = await server.start() + API_PREFIX
+        print(f"🧪 Using bundled stand-in at {base_url}")
+
+    try:
+        for label, senders in (("one sender", 1), (f"{args.senders} senders", args.senders)):
+            payouts = _payouts(args.count, senders)
+            print(f"\n▶️  {args.count} payouts, {label}")
+            started = time.perf_counter()
+            sequential = await submit_sequential(base_url, payouts)
+            _report("sequential prepare→confirm", sequential, time.perf_counter() - started)
+
+            pipeline = PayoutPipeline(base_url, window=args.window)
+            started = time.perf_counter()
+            pipelined = [r async for r in pipeline.iter_submit(payouts)]
+            _report(f"pipeline (window {args.window})", pipelined, time.perf_counter() - started)
+    finally:
+        if server is not None:
+            await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipelined send/prepare → send/confirm for bulk payouts")
+    parser.add_argument("--count", type=int, default=100, help="payouts per run")
+    parser.add_argument("--senders", type=int, default=20, help="distinct sender addresses in the second run")
+    parser.add_argument("--window", type=int, default=32, help="payouts in flight")
+    parser.add_argument("--base-url", help="API base URL (default: start the bundled stand-in)")
+    args = parser.parse_args()
+
+    print("🏗️ Payout Pipeline Benchmark")
+    print("=" * 50)
+    asyncio.run(_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
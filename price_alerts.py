@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+📈 Price-alert matching engine
+موتور تطبیق هشدار قیمت با آرایه‌های مرتب NumPy و جستجوی دودویی
+
+User thresholds live in two sorted NumPy arrays per symbol: "above" alerts
+(fire when the price rises to the target) and "below" alerts (fire when it
+falls to the target). Fired alerts always form a prefix of the above array
+and a suffix of the below array, so a tick is two binary searches and a
+pointer move, O(log n + k) for k crossed alerts, instead of a scan over
+every alert. Alerts fire once. New alerts are buffered, sorted among
+themselves and spliced into place on the next tick, so a tick that follows
+m adds also pays an O(n + m log m) merge.
+
+    engine = PriceAlertEngine()
+    engine.add(token, "BTC", 45000, above=True)
+    for token, payload in engine.tick("BTC", 45210.5, change_percent=5.2):
+        dispatcher.send_one(0, token, payload)          # price_alert template
+
+Usage: python price_alerts.py [ALERTS] [TICKS]   (matching benchmark vs a full scan)
+"""
+
+import itertools
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("price_alerts needs NumPy 💡 Install with: pip install numpy") from None
+
+from notification_templates import TEMPLATES
+
+SYMBOL_NAMES = {
+    "BTC": "Bitcoin", "ETH": "Ethereum", "POL": "Polygon", "TRX": "Tron", "USDT": "Tether",
+    "BNB": "BNB", "SOL": "Solana", "XRP": "XRP", "DOGE": "Dogecoin", "ADA": "Cardano",
+}
+
+_EMPTY_PRICES = np.empty(0, dtype=np.float64)
+_EMPTY_IDS = np.empty(0, dtype=np.int64)
+
+
+def format_price(price: float) -> str:
+    """Shortest exact decimal: 45000.0 → '45000', 0.00001234 → '0.00001234'"""
+    return np.format_float_positional(price, trim="-")
+
+
+def display_price(price: float) -> str:
+    """Thousands separators for prices ≥ 1, as in '$45,000'"""
+    if price >= 1:
+        return f"{price:,.2f}".rstrip("0").rstrip(".")
+    return format_price(price)
+
+
+class _Side:
+    """Sorted targets + alert ids for one direction of one symbol"""
+
+    __slots__ = ("prices", "ids", "start", "end", "pending_prices", "pending_ids")
+
+    def __init__(self):
+        self.prices = _EMPTY_PRICES
+        self.ids = _EMPTY_IDS
+        # Live alerts are prices[start:end]; fired ones are cut off by moving a pointer
+        self.start = 0
+        self.end = 0
+        self.pending_prices: List[np.ndarray] = []
+        self.pending_ids: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return self.end - self.start + sum(len(p) for p in self.pending_ids)
+
+    def merge(self):
+        if not self.pending_ids:
+            return
+        prices = np.concatenate(self.pending_prices)
+        ids = np.concatenate(self.pending_ids)
+        order = np.argsort(prices, kind="stable")
+        # Only the new alerts are sorted; the live range already is, so they are spliced into it
+        live_prices, live_ids = self.prices[self.start:self.end], self.ids[self.start:self.end]
+        at = np.searchsorted(live_prices, prices[order], side="right")
+        self.prices = np.insert(live_prices, at, prices[order])
+        self.ids = np.insert(live_ids, at, ids[order])
+        self.start, self.end = 0, len(self.ids)
+        self.pending_prices.clear()
+        self.pending_ids.clear()
+
+
+class _Book:
+    __slots__ = ("above", "below", "last_price")
+
+    def __init__(self):
+        self.above = _Side()
+        self.below = _Side()
+        self.last_price: Optional[float] = None
+
+
+class PriceAlertEngine:
+    """Per-symbol sorted price thresholds; tick() returns price_alert messages"""
+
+    def __init__(self, template: str = "price_alert"):
+        self.template = TEMPLATES.get(template)
+        self._books: Dict[str, _Book] = {}
+        self._tokens: Dict[int, str] = {}
+        self._cancelled: Set[int] = set()
+        self._ids = itertools.count()
+
+    def _book(self, symbol: str) -> _Book:
+        symbol = symbol.upper()
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = _Book()
+        return book
+
+    def add(self, token: str, symbol: str, target_price: float, above: Optional[bool] = None) -> int:
+        """
+        Alert `token` when `symbol` crosses `target_price`. `above` defaults
+        to the side of the last seen price the target is on.
+        """
+        return int(self.add_many(symbol, [token], [target_price], above)[0])
+
+    def add_many(self, symbol: str, tokens: Sequence[str], target_prices: Sequence[float],
+                 above: Union[None, bool, Sequence[bool]] = None) -> np.ndarray:
+        """Vectorized add(); returns the new alert ids"""
+        book = self._book(symbol)
+        prices = np.asarray(target_prices, dtype=np.float64)
+        if len(prices) != len(tokens):
+            raise ValueError("tokens and target_prices must have the same length")
+        if above is None:
+            if book.last_price is None:
+                raise ValueError(f"No price seen for {symbol} yet: pass above=True/False")
+            above = prices > book.last_price
+        directions = np.broadcast_to(np.asarray(above, dtype=bool), prices.shape)
+
+        ids = np.fromiter(itertools.islice(self._ids, len(prices)), dtype=np.int64, count=len(prices))
+        self._tokens.update(zip(ids.tolist(), tokens))
+        for side, mask in ((book.above, directions), (book.below, ~directions)):
+            if mask.any():
+                side.pending_prices.append(prices[mask])
+                side.pending_ids.append(ids[mask])
+        return ids
+
+    def cancel(self, alert_id: int):
+        if alert_id in self._tokens:
+            self._cancelled.add(alert_id)
+
+    def matches(self, symbol: str, price: float) -> List[Tuple[str, float]]:
+        """(token, target price) of every alert `price` crosses; each fires once and is removed"""
+        fired, targets = self._match(symbol, price)
+        tokens = self._tokens
+        return [(tokens.pop(alert_id), target) for alert_id, target in zip(fired.tolist(), targets.tolist())]
+
+    def _match(self, symbol: str, price: float) -> Tuple[np.ndarray, np.ndarray]:
+        book = self._book(symbol)
+        book.last_price = price
+        above, below = book.above, book.below
+        above.merge()
+        below.merge()
+
+        # Above: targets ≤ price, a prefix of the live range
+        cut = max(int(np.searchsorted(above.prices[:above.end], price, side="right")), above.start)
+        ids, targets = [above.ids[above.start:cut]], [above.prices[above.start:cut]]
+        above.start = cut
+        # Below: targets ≥ price, a suffix of the live range
+        cut = min(int(np.searchsorted(below.prices[:below.end], price, side="left")), below.end)
+        if cut < below.end:
+            ids.append(below.ids[cut:below.end])
+            targets.append(below.prices[cut:below.end])
+            below.end = cut
+
+        fired, prices = (ids[0], targets[0]) if len(ids) == 1 else (np.concatenate(ids), np.concatenate(targets))
+        if self._cancelled and len(fired):
+            dropped = np.fromiter(self._cancelled, dtype=np.int64, count=len(self._cancelled))
+            keep = ~np.isin(fired, dropped)
+            for alert_id in fired[~keep].tolist():
+                self._cancelled.discard(alert_id)
+                self._tokens.pop(alert_id, None)
+            fired, prices = fired[keep], prices[keep]
+        return fired, prices
+
+    def tick(self, symbol: str, price: float, change_percent: Optional[float] = None) -> List[Tuple[str, bytes]]:
+        """
+        (token, price_alert payload) for every alert `price` crosses.
+        change_percent defaults to the change since the previous tick.
+        """
+        symbol = symbol.upper()
+        previous = self._book(symbol).last_price
+        crossed = self.matches(symbol, price)
+        if not crossed:
+            return []
+        if change_percent is None:
+            change_percent = (price - previous) / previous * 100 if previous else 0.0
+
+        fields = {
+            "symbol": symbol,
+            "symbol_name": SYMBOL_NAMES.get(symbol, symbol),
+            "current_price": format_price(price),
+            "current_price_display": display_price(price),
+            "change_percent": f"{change_percent:.1f}",
+            "change_display": f"{change_percent:+.1f}",
+        }
+        render = self.template.render
+        return [(token, render(token=token, target_price=format_price(target), **fields)) for token, target in crossed]
+
+    def __len__(self) -> int:
+        return sum(len(b.above) + len(b.below) for b in self._books.values()) - len(self._cancelled)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+    print("📈 Price Alert Matching Benchmark")
+    print("=" * 50)
+    rng = np.random.default_rng(7)
+    start_price = 45_000.0
+    targets = start_price * rng.uniform(0.8, 1.2, count)
+    tokens = [f"token-{i:07d}" for i in range(count)]
+    # Random walk of ±0.05% per tick
+    path = start_price * np.cumprod(1 + rng.normal(0, 0.0005, ticks))
+
+    engine = PriceAlertEngine()
+    started = time.perf_counter()
+    engine.add_many("BTC", tokens, targets, targets > start_price)
+    engine.matches("BTC", start_price)  # first tick merges the initial load
+    load = time.perf_counter() - started
+    print(f"   {count:,} BTC alerts loaded in {load * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    fired = sum(len(engine.tick("BTC", float(p))) for p in path)
+    engine_seconds = time.perf_counter() - started
+
+    # Baseline: check every alert on every tick
+    above = targets > start_price
+    active = np.ones(count, dtype=bool)
+    scan_ticks = min(ticks, 200)
+    started = time.perf_counter()
+    for p in path[:scan_ticks]:
+        crossed = active & np.where(above, targets <= p, targets >= p)
+        active &= ~crossed
+    scan_seconds = (time.perf_counter() - started) / scan_ticks * ticks
+
+    print(f"   {ticks:,} ticks, {fired:,} alerts fired ({len(engine):,} still armed)")
+    print(f"   sorted arrays + binary search : {engine_seconds / ticks * 1e6:9.1f} µs/tick (incl. rendering payloads)")
+    print(f"   full NumPy scan per tick      : {scan_seconds / ticks * 1e6:9.1f} µs/tick (matching only)")
+    print(f"   🚀 {scan_seconds / engine_seconds:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
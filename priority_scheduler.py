@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+🚦 Priority-aware send scheduler
+زمان‌بندی ارسال با اولویت: جدا کردن نوتیفیکیشن‌های تراکنشی از تبلیغاتی
+
+Every notification type used to share one path, so a big welcome campaign
+queued ahead of a receive delayed the receive by the whole campaign.
+PriorityScheduler keeps one queue per priority class and serves them with
+weighted fair queuing. Each job is stamped with a virtual finish time of
+max(virtual clock, class's last finish) + 1 / weight, and workers always
+take the smallest stamp. A class with weight 10 therefore gets ten sends
+for every one from a weight-1 class while both are backlogged, and an
+idle class never builds up credit.
+
+Classes can carry a latency SLO on queueing delay. When the head of such a
+class has waited `slo_guard` of its SLO, it is served next regardless of
+its stamp. Queueing delay per class is recorded in histograms (and in
+METRICS as sender=<class>, stage="queue").
+
+    with PriorityScheduler(tester.send_notification, concurrency=8) as scheduler:
+        for token in campaign_tokens:
+            scheduler.send("welcome", token, welcome_payload(token))
+        sent = scheduler.send("receive", token, receive_payload).result()   # jumps the campaign
+    scheduler.print_report()
+
+Usage: python priority_scheduler.py [CAMPAIGN_SIZE] [TRANSACTIONAL]   (shared FIFO pool vs WFQ, FCM emulator)
+"""
+
+import functools
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from latency_metrics import METRICS, Histogram, LatencyRecorder
+
+TRANSACTIONAL = "transactional"
+MARKETING = "marketing"
+
+# Notification types (template / test names) about the user's own money
+TRANSACTIONAL_TYPES = frozenset({"receive", "receive_summary", "send", "transaction", "transaction_confirmed"})
+
+
+@dataclass(frozen=True)
+class PriorityClass:
+    name: str
+    weight: float
+    # Target queueing delay in seconds; None for best effort
+    slo: Optional[float] = None
+
+
+DEFAULT_CLASSES = (
+    PriorityClass(TRANSACTIONAL, weight=10, slo=0.5),
+    PriorityClass(MARKETING, weight=1),
+)
+
+
+def class_for(kind: str) -> str:
+    """Priority class of a notification type; anything unknown is marketing"""
+    return TRANSACTIONAL if kind in TRANSACTIONAL_TYPES else MARKETING
+
+
+@dataclass
+class ClassStats:
+    name: str
+    weight: float
+    slo: Optional[float]
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    slo_misses: int = 0
+    queue_delay: Histogram = field(default_factory=Histogram)
+
+
+class _Job:
+    __slots__ = ("finish", "enqueued", "fn", "args", "kwargs", "future")
+
+    def __init__(self, finish: float, enqueued: float, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        self.finish = finish
+        self.enqueued = enqueued
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+
+
+class _ClassQueue:
+    __slots__ = ("cls", "jobs", "last_finish", "stats")
+
+    def __init__(self, cls: PriorityClass):
+        self.cls = cls
+        self.jobs: Deque[_Job] = deque()
+        self.last_finish = 0.0
+        self.stats = ClassStats(cls.name, cls.weight, cls.slo)
+
+
+class PriorityScheduler:
+    """Weighted fair queuing across priority classes in front of a send function"""
+
+    def __init__(self, send: Optional[Callable[..., Any]] = None, classes: Iterable[PriorityClass] = DEFAULT_CLASSES,
+                 concurrency: int = 4, classify: Callable[[str], str] = class_for, slo_guard: float = 0.5,
+                 metrics: Optional[LatencyRecorder] = None, clock: Callable[[], float] = time.monotonic):
+        self.send_fn = send
+        self.classify = classify
+        self.slo_guard = slo_guard
+        self.metrics = metrics or METRICS
+        self.clock = clock
+        self._queues: Dict[str, _ClassQueue] = {c.name: _ClassQueue(c) for c in classes}
+        self._virtual = 0.0
+        self._in_flight = 0
+        self._closed = False
+        self._ready = threading.Condition()
+        self._workers = [threading.Thread(target=self._work, name=f"priority-sender-{i}", daemon=True)
+                         for i in range(concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queue fn(*args, **kwargs) in the class of notification type `kind`"""
+        queue = self._queues.get(self.classify(kind))
+        if queue is None:
+            raise ValueError(f"No priority class '{self.classify(kind)}' for notification type '{kind}'")
+        with self._ready:
+            if self._closed:
+                raise RuntimeError("PriorityScheduler is closed")
+            finish = max(self._virtual, queue.last_finish) + 1 / queue.cls.weight
+            queue.last_finish = finish
+            job = _Job(finish, self.clock(), fn, args, kwargs)
+            queue.jobs.append(job)
+            queue.stats.submitted += 1
+            self._ready.notify()
+        return job.future
+
+    def send(self, kind: str, token: str, payload: Any) -> Future:
+        """submit() with the scheduler's send function"""
+        if self.send_fn is None:
+            raise ValueError("PriorityScheduler was created without a send function")
+        return self.submit(kind, self.send_fn, token, payload)
+
+    def _pick(self) -> Optional[_ClassQueue]:
+        backlogged = [q for q in self._queues.values() if q.jobs]
+        if not backlogged:
+            return None
+        now = self.clock()
+        at_risk = [q for q in backlogged
+                   if q.cls.slo is not None and now - q.jobs[0].enqueued >= q.cls.slo * self.slo_guard]
+        if at_risk:
+            return min(at_risk, key=lambda q: q.jobs[0].enqueued)
+        return min(backlogged, key=lambda q: q.jobs[0].finish)
+
+    def _work(self):
+        while True:
+            with self._ready:
+                queue = self._pick()
+                while queue is None:
+                    if self._closed:
+                        return
+                    self._ready.wait()
+                    queue = self._pick()
+                job = queue.jobs.popleft()
+                self._virtual = job.finish
+                self._in_flight += 1
+                delay = self.clock() - job.enqueued
+                stats = queue.stats
+                stats.queue_delay.record(delay)
+                stats.slo_misses += stats.slo is not None and delay > stats.slo
+
+            self.metrics.record(stats.name, "queue", delay)
+            ok = False
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    result = job.fn(*job.args, **job.kwargs)
+                    ok = result is not False and getattr(result, "success", True)
+                    job.future.set_result(result)
+                except BaseException as e:
+                    job.future.set_exception(e)
+
+            with self._ready:
+                self._in_flight -= 1
+                stats.completed += 1
+                stats.failed += not ok
+                self._ready.notify_all()
+
+    def pending(self) -> Dict[str, int]:
+        with self._ready:
+            return {name: len(q.jobs) for name, q in self._queues.items()}
+
+    def join(self):
+        """Block until every queued job has run"""
+        with self._ready:
+            while self._in_flight or any(q.jobs for q in self._queues.values()):
+                self._ready.wait()
+
+    def close(self):
+        """Run what is queued, then stop the workers"""
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def report(self) -> Dict[str, ClassStats]:
+        with self._ready:
+            return {name: q.stats for name, q in self._queues.items()}
+
+    def print_report(self):
+        print("\n🚦 Queueing delay by priority class (ms)")
+        print(f"   {'class'.ljust(14)} {'weight':>6} {'sent':>6} {'failed':>6} {'p50':>9} {'p99':>9} {'max':>9}  SLO")
+        for s in self.report().values():
+            h = s.queue_delay
+            slo = f"{s.slo * 1000:.0f} ms, {s.slo_misses} missed" if s.slo is not None else "-"
+            print(f"   {s.name.ljust(14)} {s.weight:>6g} {s.completed:>6} {s.failed:>6} {h.percentile(50) * 1000:>9.1f} "
+                  f"{h.percentile(99) * 1000:>9.1f} {h.max / 1000:>9.1f}  {slo}")
+
+
+def _mixed_load(submit: Callable[[str, str, bytes], Any], campaign: int, transactional: int, interval: float):
+    """A welcome campaign queued at once, then receives arriving every `interval` seconds behind it"""
+    from notification_templates import TEMPLATES
+
+    for i in range(campaign):
+        token = f"campaign-token-{i:06d}"
+        submit("welcome", token, TEMPLATES.render("welcome", token=token, wallet_id=f"wallet-{i:06d}",
+                                                  user_id=f"user-{i:06d}"))
+    for i in range(transactional):
+        token = f"wallet-token-{i:06d}"
+        submit("receive", token, TEMPLATES.render(
+            "receive", token=token, transaction_id=f"tx_{i:06d}", amount="0.001", currency="BTC",
+            from_address="1A1zP1eP2RdK7WbKAXYqPBZ8CQUXBaXr4k",
+            to_address="bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh", wallet_id=f"wallet-{i:06d}"))
+        time.sleep(interval)
+
+
+def main():
+    campaign = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    transactional = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    concurrency = 8
+
+    print("🚦 Priority Scheduler Benchmark")
+    print("=" * 50)
+
+    import fcm_transport
+    from fcm_dispatch import BatchDispatcher
+    from fcm_emulator import LEGACY_PATH, EmulatorConfig, FcmEmulator, LatencyDistribution
+
+    emulator = FcmEmulator(EmulatorConfig(latency=LatencyDistribution("constant", 0.02)))
+    base_url, stop = emulator.run_in_thread()
+    print(f"   {campaign:,} welcome messages queued at once, then {transactional} receives every 50 ms; "
+          f"{concurrency} senders, 20 ms FCM latency")
+
+    try:
+        with BatchDispatcher("local-benchmark-key", concurrency=concurrency,
+                             fcm_url=base_url + LEGACY_PATH) as dispatcher:
+            send = functools.partial(dispatcher.send_one, 0)
+
+            # Baseline: one shared FIFO pool for every type
+            delays: Dict[str, List[float]] = {TRANSACTIONAL: [], MARKETING: []}
+
+            def timed(kind: str, enqueued: float, token: str, payload: bytes):
+                delays[class_for(kind)].append(time.monotonic() - enqueued)
+                return send(token, payload)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                _mixed_load(lambda kind, token, payload: pool.submit(timed, kind, time.monotonic(), token, payload),
+                            campaign, transactional, 0.05)
+            print(f"\n▶️  shared FIFO pool ({time.perf_counter() - started:.1f}s)")
+            for name, values in delays.items():
+                values.sort()
+                p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+                print(f"   {name.ljust(14)} queueing delay p50 {values[len(values) // 2] * 1000:7.1f} ms, "
+                      f"p99 {p99 * 1000:7.1f} ms, max {values[-1] * 1000:7.1f} ms")
+
+            started = time.perf_counter()
+            with PriorityScheduler(send, concurrency=concurrency, metrics=LatencyRecorder()) as scheduler:
+                _mixed_load(scheduler.send, campaign, transactional, 0.05)
+            print(f"\n▶️  weighted fair queuing ({time.perf_counter() - started:.1f}s)", end="")
+            scheduler.print_report()
+    finally:
+        stop()
+        fcm_transport.close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+🗃️ Durable send queue
+صف ارسال پایدار روی دیسک با قابلیت ادامه پس از کرش
+
+SQLite (WAL mode) queue in front of the FCM senders. Every message moves
+through pending → in_flight → acked/failed, state changes are committed in
+batches, and a killed run resumes exactly where it stopped.
+
+Only the last claimed batch can be ambiguous after a crash (claimed and
+maybe sent, but never acked). Opening a queue leaves in_flight rows alone,
+since another process may still be sending them. The process that resumes
+after a crash passes requeue_in_flight=True to re-queue them (at-least-once)
+or False to park them as failed for manual review, or calls recover().
+
+Usage: python send_queue.py QUEUE_DB   (prints queue statistics)
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import fast_json
+
+PENDING, IN_FLIGHT, ACKED, FAILED = 0, 1, 2, 3
+STATE_NAMES = {PENDING: "pending", IN_FLIGHT: "in_flight", ACKED: "acked", FAILED: "failed"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    campaign  TEXT    NOT NULL,
+    key       TEXT    NOT NULL,
+    token     TEXT    NOT NULL,
+    payload   BLOB    NOT NULL,
+    state     INTEGER NOT NULL DEFAULT 0,
+    attempts  INTEGER NOT NULL DEFAULT 0,
+    error     TEXT,
+    updated   REAL    NOT NULL,
+    UNIQUE (campaign, key)
+);
+CREATE INDEX IF NOT EXISTS messages_state ON messages (campaign, state, id);
+"""
+
+Payload = Union[Dict[str, Any], bytes]
+
+
+@dataclass
+class QueuedMessage:
+    id: int
+    token: str
+    payload: bytes
+
+
+class SendQueue:
+    """Append-mostly SQLite queue with batched state transitions"""
+
+    def __init__(self, path: str, batch_size: int = 500, requeue_in_flight: Optional[bool] = None):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending_acks: List[Tuple[int, int, Optional[str]]] = []
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across process crashes in WAL mode; only an OS crash can lose the last commit
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if requeue_in_flight is not None:
+            self.recover(requeue_in_flight)
+
+    def recover(self, requeue: bool = True) -> int:
+        """
+        Re-queue (or fail) every in_flight row left by a crashed run; returns rows changed.
+        Only safe when no other process is draining this queue.
+        """
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute(
+                "UPDATE messages SET state = ?, error = COALESCE(error, 'interrupted'), updated = ? WHERE state = ?",
+                (PENDING if requeue else FAILED, time.time(), IN_FLIGHT),
+            )
+            return self._db.total_changes - before
+
+    def enqueue(self, messages: Iterable[Tuple[str, Payload]], campaign: str = "default",
+                key: Optional[Callable[[str, bytes], str]] = None) -> int:
+        """Add (token, payload) pairs; a (campaign, key) seen before is ignored. Returns rows added."""
+        added = 0
+        batch = []
+        for token, payload in messages:
+            body = payload if isinstance(payload, bytes) else fast_json.dumps(payload)
+            batch.append((campaign, key(token, body) if key else token, token, body, time.time()))
+            if len(batch) >= self.batch_size:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    def _insert(self, rows) -> int:
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO messages (campaign, key, token, payload, updated) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.execute("COMMIT")
+            return self._db.total_changes - before
+
+    def claim(self, limit: Optional[int] = None, campaign: str = "default") -> List[QueuedMessage]:
+        """Mark up to `limit` pending messages in_flight and return them"""
+        limit = limit or self.batch_size
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT id, token, payload FROM messages WHERE campaign = ? AND state = ? ORDER BY id LIMIT ?",
+                (campaign, PENDING, limit),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE messages SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                [(IN_FLIGHT, time.time(), row[0]) for row in rows],
+            )
+            self._db.execute("COMMIT")
+        return [QueuedMessage(*row) for row in rows]
+
+    def ack(self, message_id: int):
+        self._record(message_id, ACKED, None)
+
+    def fail(self, message_id: int, error: Optional[str] = None):
+        self._record(message_id, FAILED, error)
+
+    def retry_later(self, message_id: int, error: Optional[str] = None):
+        self._record(message_id, PENDING, error)
+
+    def _record(self, message_id: int, state: int, error: Optional[str]):
+        with self._lock:
+            self._pending_acks.append((state, message_id, error))
+            if len(self._pending_acks) < self.batch_size:
+                return
+        self.flush()
+
+    def flush(self):
+        """Commit buffered ack/fail transitions in one transaction"""
+        with self._lock:
+            if not self._pending_acks:
+                return
+            now = time.time()
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE messages SET state = ?, error = ?, updated = ? WHERE id = ?",
+                [(state, error, now, message_id) for state, message_id, error in self._pending_acks],
+            )
+            self._db.execute("COMMIT")
+            self._pending_acks.clear()
+
+    def stats(self, campaign: Optional[str] = None) -> Dict[str, int]:
+        self.flush()
+        query = "SELECT state, COUNT(*) FROM messages"
+        args: Tuple = ()
+        if campaign is not None:
+            query += " WHERE campaign = ?"
+            args = (campaign,)
+        counts = dict(self._db.execute(query + " GROUP BY state", args).fetchall())
+        return {name: counts.get(state, 0) for state, name in STATE_NAMES.items()}
+
+    def drain(self, send_batch: Callable[[List[QueuedMessage]], Iterable[Tuple[int, bool, Optional[str]]]],
+              campaign: str = "default") -> Dict[str, int]:
+        """
+        Claim, send and ack batches until nothing is pending.
+        `send_batch` receives the claimed messages and yields (message_id, success, error).
+        """
+        while True:
+            batch = self.claim(campaign=campaign)
+            if not batch:
+                break
+            for message_id, success, error in send_batch(batch):
+                if success:
+                    self.ack(message_id)
+                else:
+                    self.fail(message_id, error)
+            self.flush()
+        return self.stats(campaign)
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("❌ Usage: python send_queue.py QUEUE_DB")
+        sys.exit(1)
+
+    with SendQueue(sys.argv[1]) as queue:
+        print(f"🗃️ Send queue: {sys.argv[1]}")
+        for name, count in queue.stats().items():
+            print(f"   {name.ljust(10)} : {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+🧩 Multi-process sharded sender
+ارسال موازی روی چند پردازه برای استفاده از همه هسته‌های CPU
+
+Payload rendering, JSON encoding and response parsing are CPU-bound and a
+single process keeps them on one core. ShardedSender hashes every token to
+one of N worker processes, so a device always lands on the same shard.
+That keeps per-device pacing and dedup correct with state local to each
+worker. Each worker runs its own BatchDispatcher over its own connection
+pool, with its own RateLimiter (an equal slice of the project rate and
+burst, plus the full per-device rate) and DedupIndex. The parent only
+streams token chunks through bounded queues and merges the per-shard
+counts and latency histograms into one summary.
+
+    sender = ShardedSender(SERVER_KEY, workers=4)
+    summary = sender.send(prefetch(iter_tokens("tokens.csv")), "price_alert", symbol="BTC", ...)
+    print_shard_results(summary)
+
+Usage: python sharded_sender.py [--count N] [--workers 1,2,4] [--tokens FILE] [--fcm-url URL]
+       (without --fcm-url, benchmarks against the FCM emulator in its own process)
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from dead_tokens import DeadTokenStore
+from fcm_dispatch import FCM_URL, BatchDispatcher
+from fcm_ratelimit import RateLimiter
+from latency_metrics import METRICS, LatencyRecorder
+from notification_dedup import DedupIndex
+from notification_templates import TEMPLATES
+from token_source import iter_tokens
+
+# Tokens per chunk handed to a worker, and chunks buffered per worker
+CHUNK_SIZE = 500
+QUEUE_CHUNKS = 8
+
+
+@dataclass
+class ShardResult:
+    shard: int
+    total: int = 0
+    success: int = 0
+    failure: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+    latency: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ShardedSummary:
+    shards: List[ShardResult]
+    seconds: float
+    latency: LatencyRecorder
+
+    @property
+    def total(self) -> int:
+        return sum(s.total for s in self.shards)
+
+    @property
+    def success(self) -> int:
+        return sum(s.success for s in self.shards)
+
+    @property
+    def errors(self) -> Dict[str, int]:
+        merged: Counter = Counter()
+        for shard in self.shards:
+            merged.update(shard.errors)
+        return dict(merged)
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.total / self.seconds if self.seconds else 0.0
+
+
+def shard_of(token: str, shards: int) -> int:
+    """Stable token → shard mapping (same device, same worker, every run)"""
+    return zlib.crc32(token.encode()) % shards
+
+
+def _worker(shard: int, inbox: "mp.Queue", outbox: "mp.Queue", server_key: str, fcm_url: str,
+            concurrency: int, template: str, fields: Dict[str, str], project_rate: Optional[float],
+            project_burst: float, device_rate: float, device_burst: float, dedup_ttl: Optional[float],
+            dead_tokens_path: Optional[str]):
+    # A forked child inherits the parent's histograms; count only this shard's sends
+    METRICS.reset()
+    rate_limiter = None
+    if project_rate or device_rate:
+        # project_rate is this shard's slice already; 0 leaves the project unlimited
+        rate_limiter = RateLimiter(project_rate=project_rate or 0, project_burst=project_burst,
+                                   device_rate=device_rate, device_burst=device_burst)
+    # Every token of a device hashes to this shard, so a local index sees all its repeats
+    dedup = DedupIndex(ttl=dedup_ttl) if dedup_ttl else None
+    dead_tokens = DeadTokenStore(dead_tokens_path) if dead_tokens_path else None
+    compiled = TEMPLATES.get(template)
+    result = ShardResult(shard)
+    errors: Counter = Counter()
+
+    def messages():
+        while True:
+            chunk = inbox.get()
+            if chunk is None:
+                return
+            for token in chunk:
+                yield token, compiled.render(token=token, **fields)
+
+    started = time.perf_counter()
+    try:
+        with BatchDispatcher(server_key, concurrency=concurrency, fcm_url=fcm_url,
+                             rate_limiter=rate_limiter, dedup=dedup, dead_tokens=dead_tokens) as dispatcher:
+            for sent in dispatcher.iter_dispatch(messages()):
+                result.total += 1
+                if sent.success:
+                    result.success += 1
+                else:
+                    result.failure += 1
+                    errors[sent.error or "Unknown"] += 1
+    finally:
+        if dead_tokens is not None:
+            dead_tokens.close()
+    result.seconds = time.perf_counter() - started
+    result.errors = dict(errors)
+    result.latency = METRICS.to_dict()
+    outbox.put(result)
+
+
+class ShardedSender:
+    """Fan a token stream out over worker processes, one dispatcher and pool each"""
+
+    def __init__(self, server_key: str, workers: Optional[int] = None, concurrency: int = 64,
+                 fcm_url: str = FCM_URL, project_rate: Optional[float] = None, project_burst: float = 100,
+                 device_rate: float = 0.5, device_burst: float = 1, dedup_ttl: Optional[float] = None,
+                 dead_tokens_path: Optional[str] = None):
+        self.server_key = server_key
+        self.workers = workers or os.cpu_count() or 1
+        self.concurrency = concurrency
+        self.fcm_url = fcm_url
+        # The project quota is shared, so every worker gets an equal slice of it
+        self.project_rate = project_rate / self.workers if project_rate else None
+        self.project_burst = max(1.0, project_burst / self.workers)
+        # Device quotas are not shared: a device's messages all go through one worker
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.dedup_ttl = dedup_ttl
+        self.dead_tokens_path = dead_tokens_path
+
+    @staticmethod
+    def _put(inbox: "mp.Queue", item: Any, process: mp.Process):
+        # Blocks while the worker is behind (back-pressure) but notices if it died
+        while True:
+            try:
+                inbox.put(item, timeout=1)
+                return
+            except queue.Full:
+                if not process.is_alive():
+                    raise RuntimeError(f"Shard worker {process.name} exited with code {process.exitcode}")
+
+    def send(self, tokens: Iterable[str], template: str, **fields: str) -> ShardedSummary:
+        """Render `template` for every token and send it; returns merged per-shard results"""
+        TEMPLATES.get(template)  # fail fast on an unknown template
+        outbox: "mp.Queue" = mp.Queue()
+        inboxes = [mp.Queue(QUEUE_CHUNKS) for _ in range(self.workers)]
+        processes = [
+            mp.Process(target=_worker, name=f"shard-{i}", daemon=True, args=(
+                i, inboxes[i], outbox, self.server_key, self.fcm_url, self.concurrency,
+                template, fields, self.project_rate, self.project_burst, self.device_rate, self.device_burst,
+                self.dedup_ttl, self.dead_tokens_path,
+            ))
+            for i in range(self.workers)
+        ]
+
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        try:
+            buffers: List[List[str]] = [[] for _ in range(self.workers)]
+            for token in tokens:
+                shard = shard_of(token, self.workers)
+                buffer = buffers[shard]
+                buffer.append(token)
+                if len(buffer) >= CHUNK_SIZE:
+                    self._put(inboxes[shard], buffer, processes[shard])
+                    buffers[shard] = []
+            for shard, buffer in enumerate(buffers):
+                if buffer:
+                    self._put(inboxes[shard], buffer, processes[shard])
+                self._put(inboxes[shard], None, processes[shard])
+
+            results = []
+            while len(results) < self.workers:
+                try:
+                    results.append(outbox.get(timeout=1))
+                except queue.Empty:
+                    finished = {r.shard for r in results}
+                    dead = [p for i, p in enumerate(processes) if i not in finished and not p.is_alive()]
+                    if dead:
+                        raise RuntimeError(f"Shard worker {dead[0].name} exited with code {dead[0].exitcode}")
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        elapsed = time.perf_counter() - started
+
+        latency = LatencyRecorder()
+        for result in results:
+            latency.merge(LatencyRecorder.from_dict(result.latency))
+        return ShardedSummary(sorted(results, key=lambda r: r.shard), elapsed, latency)
+
+
+def print_shard_results(summary: ShardedSummary):
+    """Print the merged summary in the same layout as test_notifications.print_results"""
+    print("\n" + "="*50)
+    print("📊 SHARDED SEND SUMMARY")
+    print("="*50)
+
+    for shard in summary.shards:
+        rate = shard.total / shard.seconds if shard.seconds else 0.0
+        status = "✅ PASS" if shard.failure == 0 else "❌ FAIL"
+        print(f"   {f'shard {shard.shard}'.ljust(15)} : {status}  {shard.success}/{shard.total} sent, {rate:.1f} msg/s")
+
+    print(f"\nOverall: {summary.success}/{summary.total} notifications sent in {summary.seconds:.2f}s "
+          f"→ {summary.messages_per_second:.1f} msg/s across {len(summary.shards)} workers")
+
+    errors = summary.errors
+    if errors:
+        print("⚠️  Failures by error:")
+        for error, count in sorted(errors.items(), key=lambda kv: -kv[1]):
+            print(f"   {error.ljust(28)} : {count}")
+    else:
+        print("🎉 Every notification was accepted by FCM.")
+
+    summary.latency.print_summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process FCM sender benchmark")
+    parser.add_argument("--count", type=int, default=20000, help="synthetic tokens to send (ignored with --tokens)")
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts to compare (default: 1,CPUs)")
+    parser.add_argument("--tokens", help="token file (CSV, JSONL or one per line)")
+    parser.add_argument("--fcm-url", help="FCM endpoint (default: start a local emulator)")
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight requests per worker")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    worker_counts = [int(w) for w in args.workers.split(",")] if args.workers else sorted({1, cpus})
+
+    print("🧩 Sharded FCM Sender")
+    print("=" * 50)
+    print(f"   CPUs: {cpus}  workers: {worker_counts}")
+
+    stop_emulator = None
+    fcm_url = args.fcm_url
+    if fcm_url is None:
+        from fcm_emulator import LEGACY_PATH, FcmEmulator
+
+        base_url, stop_emulator = FcmEmulator().run_in_process()
+        fcm_url = base_url + LEGACY_PATH
+        print(f"🧪 Using local FCM emulator at {fcm_url}")
+
+    rates = {}
+    try:
+        for workers in worker_counts:
+            tokens = iter_tokens(args.tokens) if args.tokens else (f"bench-token-{i:08d}" for i in range(args.count))
+            sender = ShardedSender("local-benchmark-key", workers=workers, concurrency=args.concurrency, fcm_url=fcm_url)
+            summary = sender.send(tokens, "welcome", wallet_id="bench-wallet", user_id="bench-user")
+            print(f"\n▶️  {workers} worker(s)")
+            print_shard_results(summary)
+            rates[workers] = summary.messages_per_second
+    finally:
+        if stop_emulator is not None:
+            stop_emulator()
+
+    if len(rates) > 1:
+        base = rates[worker_counts[0]]
+        print("\n🚀 Scaling")
+        for workers, rate in rates.items():
+            print(f"   {str(workers).rjust(3)} worker(s) : {rate:>9.1f} msg/s  ({rate / base:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
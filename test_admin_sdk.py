@@ -1,10 +1,22 @@
 #!/usr/bin/env python3
 """
 Test FCM with Firebase Admin SDK (using Service Account)
+
+Usage: python test_admin_sdk.py [DEVICE_TOKEN ...]
+       (with tokens, fans the notification out via multicast batches)
 """
 
+import itertools
 import json
+import sys
+import time
 from pathlib import Path
+from typing import List, Optional
+
+import firebase_cache
+from dead_tokens import DEAD_TOKEN_ERROR, DeadTokenStore
+from fcm_dispatch import SendResult
+from latency_metrics import METRICS
 
 # Service Account path (adjust if needed)
 service_account_path = Path(__file__).parent / 'coinceeper-f2eaf-firebase-adminsdk-fbsvc-4f2bc9645c.json'
@@ -14,66 +26,81 @@ DEVICE_TOKEN = "euYtawyFT86uVvt5L7shsS:APA91bHoic-emX8mYJNj4-l5MDz6DEA1v0IPdf0x5
 USER_ID = "2a272775-17e9-4739-a756-67da1090dbcb"
 WALLET_ID = "c2569417-736b-4352-860f-5f063948b6b1"
 
-def test_with_admin_sdk():
-    """Test with Firebase Admin SDK"""
+# FCM accepts at most 500 tokens per multicast batch
+MULTICAST_BATCH_SIZE = 500
+
+# The SDK serializes, connects and does TLS inside send(), so those stages are part of "response"
+LATENCY_SENDER = "admin_sdk"
+
+def _init_firebase():
+    """Import and initialize Firebase Admin; returns the messaging module or None"""
     
     if not service_account_path.exists():
         print(f"❌ Service account file not found: {service_account_path}")
         print("💡 Please put the JSON file in the same directory as this script")
-        return
+        return None
     
     try:
         # Try to import firebase_admin
-        import firebase_admin
-        from firebase_admin import credentials, messaging
+        from firebase_admin import messaging
         print("✅ Firebase Admin SDK imported successfully")
         
     except ImportError:
         print("❌ Firebase Admin SDK not installed")
         print("💡 Install with: pip install firebase-admin")
-        return
+        return None
+    
+    # Credentials and app are parsed/initialized once per process
+    firebase_cache.get_app(service_account_path)
+    print("✅ Firebase Admin initialized")
+    
+    return messaging
+
+def _transaction_message_fields(messaging):
+    """Notification, data and Android config shared by single and multicast sends"""
+    return dict(
+        notification=messaging.Notification(
+            title="💰 Transaction Received (Admin SDK)",
+            body="You received 0.001 BTC via Admin SDK",
+        ),
+        data={
+            "transaction_id": f"admin_test_{int(time.time())}",
+            "type": "receive",
+            "amount": "0.001",
+            "currency": "BTC",
+            "user_id": USER_ID,
+            "wallet_id": WALLET_ID,
+        },
+        android=messaging.AndroidConfig(
+            notification=messaging.AndroidNotification(
+                channel_id="receive_channel",
+                sound="receive_sound",
+                priority=messaging.Priority.HIGH,
+            )
+        ),
+    )
+
+def test_with_admin_sdk():
+    """Test with Firebase Admin SDK"""
     
     try:
-        # Initialize Firebase Admin
-        cred = credentials.Certificate(str(service_account_path))
-        
-        # Check if already initialized
-        try:
-            app = firebase_admin.get_app()
-            print("✅ Firebase Admin already initialized")
-        except ValueError:
-            app = firebase_admin.initialize_app(cred)
-            print("✅ Firebase Admin initialized successfully")
+        messaging = _init_firebase()
+        if messaging is None:
+            return
         
         # Create message
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title="💰 Transaction Received (Admin SDK)",
-                body="You received 0.001 BTC via Admin SDK",
-            ),
-            data={
-                "transaction_id": f"admin_test_{int(__import__('time').time())}",
-                "type": "receive",
-                "amount": "0.001",
-                "currency": "BTC",
-                "user_id": USER_ID,
-                "wallet_id": WALLET_ID,
-            },
-            android=messaging.AndroidConfig(
-                notification=messaging.AndroidNotification(
-                    channel_id="receive_channel",
-                    sound="receive_sound",
-                    priority=messaging.Priority.HIGH,
-                )
-            ),
-            token=DEVICE_TOKEN
-        )
+        with METRICS.time(LATENCY_SENDER, "build"):
+            message = messaging.Message(
+                **_transaction_message_fields(messaging),
+                token=DEVICE_TOKEN
+            )
         
         print("🚀 Sending notification via Firebase Admin SDK...")
         print(f"📱 Device Token: {DEVICE_TOKEN[:30]}...")
         
         # Send message
-        response = messaging.send(message)
+        with METRICS.time(LATENCY_SENDER, "response"):
+            response = messaging.send(message)
         print(f"✅ Message sent successfully! Message ID: {response}")
         print("📱 Check your Android device for the notification")
         
@@ -81,12 +108,93 @@ def test_with_admin_sdk():
         print(f"❌ Admin SDK Error: {e}")
         print(f"❌ Error type: {type(e).__name__}")
 
+def send_multicast(tokens: List[str], messaging, batch_size: int = MULTICAST_BATCH_SIZE,
+                   dry_run: bool = False, dead_tokens: Optional[DeadTokenStore] = None) -> List[SendResult]:
+    """
+    Fan one transaction notification out to many devices, one API round trip per batch.
+    `messaging` is firebase_admin.messaging (or any object with the same interface,
+    e.g. a mock in tests). Returns one SendResult per token, in input order.
+    With a DeadTokenStore, known-dead tokens are not sent (their result carries
+    DEAD_TOKEN_ERROR) and UnregisteredError responses are recorded.
+    """
+    
+    results = []
+    # (input index, token) of every token that goes out, so results keep input positions
+    live = list(enumerate(tokens))
+    if dead_tokens is not None:
+        live = []
+        for index, token in enumerate(tokens):
+            if token in dead_tokens:
+                dead_tokens.skipped += 1
+                results.append(SendResult(index, token, False, error=DEAD_TOKEN_ERROR))
+            else:
+                live.append((index, token))
+    
+    batch_size = min(batch_size, MULTICAST_BATCH_SIZE)
+    with METRICS.time(LATENCY_SENDER, "build"):
+        fields = _transaction_message_fields(messaging)
+    # send_each_for_multicast replaced send_multicast in firebase-admin 6.2
+    send_batch = getattr(messaging, "send_each_for_multicast", None) or messaging.send_multicast
+    
+    for start in range(0, len(live), batch_size):
+        chunk = live[start:start + batch_size]
+        with METRICS.time(LATENCY_SENDER, "build"):
+            multicast = messaging.MulticastMessage(tokens=[token for _, token in chunk], **fields)
+        
+        batch_error = "No response for this token"
+        try:
+            with METRICS.time(LATENCY_SENDER, "response"):
+                batch = send_batch(multicast, dry_run=dry_run)
+            responses = batch.responses
+        except Exception as e:
+            responses = []
+            batch_error = f"{type(e).__name__}: {e}"
+        
+        with METRICS.time(LATENCY_SENDER, "parse"):
+            # A short response list must not hide tokens: the missing ones count as failures
+            padded = itertools.chain(responses, itertools.repeat(None))
+            for (index, token), response in zip(chunk, padded):
+                if response is None:
+                    results.append(SendResult(index, token, False, error=batch_error))
+                elif response.success:
+                    results.append(SendResult(index, token, True, message_id=response.message_id))
+                else:
+                    results.append(SendResult(index, token, False, error=str(response.exception)))
+                    if dead_tokens is not None:
+                        dead_tokens.record(token, type(response.exception).__name__)
+    
+    results.sort(key=lambda r: r.index)
+    return results
+
+def test_multicast_with_admin_sdk(tokens: List[str]):
+    """Test multicast fan-out to every given device token"""
+    
+    try:
+        messaging = _init_firebase()
+        if messaging is None:
+            return
+        
+        print(f"🚀 Sending multicast to {len(tokens)} devices in batches of {MULTICAST_BATCH_SIZE}...")
+        results = send_multicast(tokens, messaging)
+        
+        for result in results:
+            if result.success:
+                print(f"   ✅ {result.token[:30]}... → {result.message_id}")
+            else:
+                print(f"   ❌ {result.token[:30]}... → {result.error}")
+        
+        sent = sum(1 for r in results if r.success)
+        print(f"📊 Multicast finished: {sent}/{len(results)} delivered")
+        
+    except Exception as e:
+        print(f"❌ Admin SDK Error: {e}")
+        print(f"❌ Error type: {type(e).__name__}")
+
 def check_service_account():
     """Check service account file"""
     if service_account_path.exists():
         try:
-            with open(service_account_path, 'r') as f:
-                data = json.load(f)
+            data = firebase_cache.load_service_account(service_account_path)
             
             print("✅ Service account file found and valid")
             print(f"   Project ID: {data.get('project_id', 'N/A')}")
@@ -107,7 +215,11 @@ if __name__ == "__main__":
     print("=" * 50)
     
     if check_service_account():
-        test_with_admin_sdk()
+        if len(sys.argv) > 1:
+            test_multicast_with_admin_sdk(sys.argv[1:])
+        else:
+            test_with_admin_sdk()
+        METRICS.print_summary()
     
     print("\n" + "=" * 50)
     print("✅ Test completed!") 
\ No newline at end of file
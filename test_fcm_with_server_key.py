@@ -3,10 +3,12 @@
 Test FCM Notification with Firebase Server Key
 """
 
-import requests
 import json
 from datetime import datetime
 
+import fcm_transport
+from notification_templates import TEMPLATES
+
 # ✅ REPLACE WITH YOUR FIREBASE SERVER KEY
 FIREBASE_SERVER_KEY = "AAAA_YOUR_FIREBASE_SERVER_KEY_HERE"
 
@@ -29,48 +31,33 @@ def test_fcm_notification():
     }
     
     # Test notification payload - مطابق Android notification format
-    payload = {
-        "to": DEVICE_TOKEN,
-        "notification": {
-            "title": "💰 Transaction Received",
-            "body": "You received 0.001 BTC",
-            "sound": "receive_sound",
-            "click_action": "FLUTTER_NOTIFICATION_CLICK",
-            "icon": "notifsmall"
-        },
-        "data": {
-            "transaction_id": f"test_tx_{int(datetime.now().timestamp())}",
-            "type": "receive",
-            "direction": "inbound", 
-            "amount": "0.001",
-            "currency": "BTC",
-            "symbol": "BTC",
-            "from_address": "bc1qtest123abc...",
-            "to_address": "bc1qreceive456def...",
-            "wallet_id": WALLET_ID,
-            "user_id": USER_ID,
-            "timestamp": datetime.now().isoformat()
-        },
-        "android": {
-            "notification": {
-                "channel_id": "receive_channel",
-                "sound": "receive_sound",
-                "priority": "high"
-            }
-        }
-    }
+    title = "💰 Transaction Received"
+    payload = TEMPLATES.render(
+        "receive_android",
+        token=DEVICE_TOKEN,
+        title=title,
+        body="You received 0.001 BTC",
+        transaction_id=f"test_tx_{int(datetime.now().timestamp())}",
+        amount="0.001",
+        currency="BTC",
+        from_address="bc1qtest123abc...",
+        to_address="bc1qreceive456def...",
+        wallet_id=WALLET_ID,
+        user_id=USER_ID,
+        timestamp=datetime.now().isoformat()
+    )
     
     print("🚀 Sending FCM Notification...")
     print(f"📱 Device Token: {DEVICE_TOKEN[:30]}...")
     print(f"👤 User ID: {USER_ID}")
     print(f"🆔 Wallet ID: {WALLET_ID}")
-    print(f"📧 Notification: {payload['notification']['title']}")
+    print(f"📧 Notification: {title}")
     
     try:
-        response = requests.post(
+        response = fcm_transport.post(
             'https://fcm.googleapis.com/fcm/send',
             headers=headers,
-            json=payload,
+            data=payload,
             timeout=30
         )
         
@@ -3,10 +3,12 @@
 Test Firebase FCM Notification directly
 """
 
-import requests
 import json
 from datetime import datetime
 
+import fcm_transport
+from notification_templates import TEMPLATES
+
 # Firebase Server Key - باید از Firebase Console دریافت شود
 # برای تست، از public FCM testing endpoint استفاده می‌کنیم
 FCM_SERVER_KEY = "YOUR_FIREBASE_SERVER_KEY_HERE"
@@ -24,41 +26,27 @@ def test_fcm_notification():
     }
     
     # Test notification payload
-    payload = {
-        "to": DEVICE_TOKEN,
-        "notification": {
-            "title": "💰 Test Transaction",
-            "body": "Received: 0.001 BTC from Flutter App Test",
-            "sound": "receive_sound",
-            "click_action": "FLUTTER_NOTIFICATION_CLICK"
-        },
-        "data": {
-            "transaction_id": f"test_tx_{int(datetime.now().timestamp())}",
-            "type": "receive",
-            "direction": "inbound", 
-            "amount": "0.001",
-            "currency": "BTC",
-            "symbol": "BTC",
-            "from_address": "bc1qtest...",
-            "to_address": "bc1qreceive...",
-            "wallet_id": "c2569417-736b-4352-860f-5f063948b6b1",
-            "user_id": "2a272775-17e9-4739-a756-67da1090dbcb"
-        },
-        "android": {
-            "notification": {
-                "channel_id": "receive_channel",
-                "sound": "receive_sound",
-                "priority": "high"
-            }
-        }
-    }
+    payload = TEMPLATES.render_dict(
+        "receive_android",
+        token=DEVICE_TOKEN,
+        title="💰 Test Transaction",
+        body="Received: 0.001 BTC from Flutter App Test",
+        transaction_id=f"test_tx_{int(datetime.now().timestamp())}",
+        amount="0.001",
+        currency="BTC",
+        from_address="bc1qtest...",
+        to_address="bc1qreceive...",
+        wallet_id="c2569417-736b-4352-860f-5f063948b6b1",
+        user_id="2a272775-17e9-4739-a756-67da1090dbcb",
+        timestamp=datetime.now().isoformat()
+    )
     
     print("🚀 Sending FCM Test Notification...")
     print(f"📱 Device Token: {DEVICE_TOKEN[:30]}...")
     print(f"📤 Payload: {json.dumps(payload, indent=2)}")
     
     try:
-        response = requests.post(FCM_URL, headers=headers, json=payload)
+        response = fcm_transport.post(FCM_URL, headers=headers, json=payload)
         
         print(f"\n📥 Response Status: {response.status_code}")
         print(f"📥 Response Headers: {dict(response.headers)}")
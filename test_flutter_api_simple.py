@@ -4,31 +4,60 @@ Simple test to replicate exactly what the Flutter app does for Polygon transacti
 """
 
 import json
-import requests
 
-def test_flutter_api_calls():
+import fcm_transport
+from confirm_retry import RETRYABLE, SUCCESS, classify_confirm
+from latency_metrics import METRICS
+
+# Configuration (same as Flutter app)
+BASE_URL = "https://coinceeper.com/api/"
+USER_ID = "c1bf9df0-8263-41f1-844f-2e587f9b4050"
+SENDER_ADDRESS = "0x68Ba7F66B09783977E36AA7bD8390b812742853C"
+RECIPIENT_ADDRESS = "0x184ac75b74C77D5BF3b3BffB5Ed26aE091B3feD1"
+AMOUNT = "0.01000000"
+BLOCKCHAIN = "polygon"  # lowercase as fixed in Flutter
+PRIVATE_KEY = "b7b9c47587f84c99d92d7f3207db9fa8a1c6689e7aa783d461c025bf216270d7"
+
+# Headers (same as Flutter app)
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json',
+    'User-Agent': 'Flutter-App/1.0',
+}
+
+def build_prepare_request(user_id=USER_ID, blockchain=BLOCKCHAIN, sender=SENDER_ADDRESS,
+                          recipient=RECIPIENT_ADDRESS, amount=AMOUNT):
+    """send/prepare body, same shape as the Flutter app"""
+    return {
+        "UserID": user_id,
+        "blockchain": blockchain,
+        "sender_address": sender,
+        "recipient_address": recipient,
+        "amount": amount,
+        "smart_contract_address": ""
+    }
+
+def build_confirm_request(transaction_id, user_id=USER_ID, blockchain=BLOCKCHAIN, private_key=PRIVATE_KEY):
+    """send/confirm body and headers (the app also sends UserID as a header)"""
+    data = {
+        "UserID": user_id,
+        "transaction_id": transaction_id,
+        "blockchain": blockchain,
+        "private_key": private_key
+    }
+    headers = dict(HEADERS)
+    headers['UserID'] = user_id
+    return data, headers
+
+def test_flutter_api_calls(base_url=BASE_URL):
     """Test the exact same API calls that Flutter makes"""
     print("=== Testing Flutter App API Calls ===")
     print()
     
-    # Configuration (same as Flutter app)
-    BASE_URL = "https://coinceeper.com/api/"
-    USER_ID = "c1bf9df0-8263-41f1-844f-2e587f9b4050"
-    SENDER_ADDRESS = "0x68Ba7F66B09783977E36AA7bD8390b812742853C"
-    RECIPIENT_ADDRESS = "0x184ac75b74C77D5BF3b3BffB5Ed26aE091B3feD1"
-    AMOUNT = "0.01000000"
-    BLOCKCHAIN = "polygon"  # lowercase as fixed in Flutter
-    PRIVATE_KEY = "b7b9c47587f84c99d92d7f3207db9fa8a1c6689e7aa783d461c025bf216270d7"
-    
-    # Headers (same as Flutter app)
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
-        'User-Agent': 'Flutter-App/1.0',
-    }
+    headers = dict(HEADERS)
     
     print("🔧 Configuration:")
-    print(f"   Base URL: {BASE_URL}")
+    print(f"   Base URL: {base_url}")
     print(f"   UserID: {USER_ID}")
     print(f"   Blockchain: {BLOCKCHAIN}")
     print(f"   Sender: {SENDER_ADDRESS}")
@@ -38,22 +67,18 @@ def test_flutter_api_calls():
     
     # Step 1: Test Prepare Transaction (same as Flutter)
     print("🚀 Step 1: Prepare Transaction")
-    prepare_url = f"{BASE_URL}send/prepare"
-    prepare_data = {
-        "UserID": USER_ID,
-        "blockchain": BLOCKCHAIN,
-        "sender_address": SENDER_ADDRESS,
-        "recipient_address": RECIPIENT_ADDRESS,
-        "amount": AMOUNT,
-        "smart_contract_address": ""
-    }
+    prepare_url = f"{base_url}send/prepare"
+    with METRICS.time("send/prepare", "build"):
+        prepare_data = build_prepare_request()
     
     print(f"   URL: {prepare_url}")
     print(f"   Request Data: {json.dumps(prepare_data, indent=2)}")
     print()
     
     try:
-        prepare_response = requests.post(prepare_url, json=prepare_data, headers=headers, timeout=30)
+        # Pooled session: records serialize/connect/tls/response stages for this call
+        with METRICS.trace("send/prepare"):
+            prepare_response = fcm_transport.post(prepare_url, json=prepare_data, headers=headers, timeout=30)
         
         print(f"📥 Prepare Response:")
         print(f"   Status Code: {prepare_response.status_code}")
@@ -62,7 +87,8 @@ def test_flutter_api_calls():
         print()
         
         if prepare_response.status_code == 200:
-            prepare_result = prepare_response.json()
+            with METRICS.time("send/prepare", "parse"):
+                prepare_result = prepare_response.json()
             transaction_id = prepare_result.get('transaction_id')
             
             if transaction_id:
@@ -71,17 +97,10 @@ def test_flutter_api_calls():
                 
                 # Step 2: Test Confirm Transaction (same as Flutter) 
                 print("🚀 Step 2: Confirm Transaction")
-                confirm_url = f"{BASE_URL}send/confirm"
-                confirm_data = {
-                    "UserID": USER_ID,
-                    "transaction_id": transaction_id,
-                    "blockchain": BLOCKCHAIN,
-                    "private_key": PRIVATE_KEY
-                }
-                
+                confirm_url = f"{base_url}send/confirm"
                 # Add UserID to headers (same as Flutter)
-                confirm_headers = headers.copy()
-                confirm_headers['UserID'] = USER_ID
+                with METRICS.time("send/confirm", "build"):
+                    confirm_data, confirm_headers = build_confirm_request(transaction_id)
                 
                 print(f"   URL: {confirm_url}")
                 print(f"   Request Data: {json.dumps(confirm_data, indent=2)}")
@@ -89,7 +108,8 @@ def test_flutter_api_calls():
                 print()
                 
                 try:
-                    confirm_response = requests.post(confirm_url, json=confirm_data, headers=confirm_headers, timeout=30)
+                    with METRICS.trace("send/confirm"):
+                        confirm_response = fcm_transport.post(confirm_url, json=confirm_data, headers=confirm_headers, timeout=30)
                     
                     print(f"📥 Confirm Response:")
                     print(f"   Status Code: {confirm_response.status_code}")
@@ -98,7 +118,8 @@ def test_flutter_api_calls():
                     print()
                     
                     if confirm_response.status_code == 200:
-                        confirm_result = confirm_response.json()
+                        with METRICS.time("send/confirm", "parse"):
+                            confirm_result = confirm_response.json()
                         print("✅ Confirm successful!")
                         print(f"   Success: {confirm_result.get('success')}")
                         print(f"   Message: {confirm_result.get('message')}")
@@ -108,18 +129,17 @@ def test_flutter_api_calls():
                     elif confirm_response.status_code == 400:
                         print("❌ Confirm failed with 400 Bad Request")
                         try:
-                            error_data = confirm_response.json()
+                            with METRICS.time("send/confirm", "parse"):
+                                error_data = confirm_response.json()
                             print(f"   Error Details: {json.dumps(error_data, indent=2)}")
                             
                             # Check if this is actually a success disguised as error
-                            message = error_data.get('message', '')
-                            success = error_data.get('success')
-                            tx_hash = error_data.get('tx_hash') or error_data.get('transaction_hash')
+                            outcome = classify_confirm(400, error_data)
                             
-                            if message == "Transaction sent successfully" or tx_hash:
+                            if outcome.kind == SUCCESS:
                                 print("✅ Actually successful despite 400 status!")
                                 return True
-                            elif 'Failed to broadcast transaction via Tatum API' in message:
+                            elif outcome.kind == RETRYABLE:
                                 print("❌ Tatum API broadcast issue - server-side problem")
                                 return False
                             else:
@@ -157,6 +177,7 @@ def compare_with_curl_test():
 
 if __name__ == "__main__":
     success = test_flutter_api_calls()
+    METRICS.print_summary()
     print()
     compare_with_curl_test()
     
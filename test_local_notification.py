@@ -9,6 +9,8 @@ from datetime import datetime
 import subprocess
 import sys
 
+from notification_templates import TEMPLATES
+
 def send_android_notification():
     """Send test notification using ADB"""
     
@@ -18,21 +20,24 @@ def send_android_notification():
         "device_token": "euYtawyFT86uVvt5L7shsS:APA91bHoic-emX8mYJNj4-l5MDz6DEA1v0IPdf0x5ri0EWlwvL6SZBnulgzCcd3pSrsOIUOCkOHAT7QNKyrMWdEhd7W-7466vzZ740lDRT9iNf0sDa7pP38"
     }
     
+    payload = TEMPLATES.render_dict(
+        "receive_android",
+        token=device_data["device_token"],
+        title="💰 Transaction Received",
+        body="You received 0.001 BTC",
+        transaction_id=f"tx_{int(datetime.now().timestamp())}",
+        amount="0.001",
+        currency="BTC",
+        from_address="bc1qtest123...",
+        to_address="bc1qreceive456...",
+        wallet_id=device_data["wallet_id"],
+        user_id=device_data["user_id"],
+        timestamp=datetime.now().isoformat()
+    )
     notification_data = {
-        "title": "💰 Transaction Received",
-        "body": "You received 0.001 BTC",
-        "data": {
-            "transaction_id": f"tx_{int(datetime.now().timestamp())}",
-            "type": "receive",
-            "direction": "inbound",
-            "amount": "0.001",
-            "currency": "BTC", 
-            "symbol": "BTC",
-            "from_address": "bc1qtest123...",
-            "to_address": "bc1qreceive456...",
-            "wallet_id": device_data["wallet_id"],
-            "user_id": device_data["user_id"]
-        }
+        "title": payload["notification"]["title"],
+        "body": payload["notification"]["body"],
+        "data": payload["data"]
     }
     
     print("📱 Device Information:")
@@ -8,15 +8,63 @@ python test_notification_android.py [FCM_TOKEN]
 """
 
 import sys
-import json
 import subprocess
 from datetime import datetime
 
-def send_test_notification_curl(fcm_token, server_key=None):
-    """
-    Send test notification using curl (without Firebase Admin SDK)
-    """
-    
+import fast_json
+import fcm_transport
+from dead_tokens import DEAD_TOKEN_ERROR
+from fcm_dispatch import SendResult
+from notification_templates import TEMPLATES
+from token_source import chunked
+
+FCM_URL = "https://fcm.googleapis.com/fcm/send"
+
+# Legacy FCM accepts up to 1000 registration_ids per request
+MAX_REGISTRATION_IDS = 1000
+
+def build_test_payload(fcm_token):
+    """Payload for the basic test notification"""
+    return TEMPLATES.render_dict(
+        "test",
+        token=fcm_token,
+        timestamp=datetime.now().isoformat()
+    )
+
+def build_transaction_payload(fcm_token):
+    """Payload for the transaction confirmed notification"""
+    return TEMPLATES.render_dict(
+        "transaction_confirmed",
+        token=fcm_token,
+        transaction_id="tx_test_123456",
+        hash="0x1234567890abcdef...",
+        amount="0.5",
+        symbol="ETH",
+        explorer_url="https://etherscan.io/tx/0x1234567890abcdef...",
+        timestamp=datetime.now().isoformat()
+    )
+
+def _curl_command(payload, server_key, fcm_url=FCM_URL):
+    return [
+        "curl",
+        "-X", "POST",
+        "-H", "Authorization: key=" + server_key,
+        "-H", "Content-Type: application/json",
+        "-d", fast_json.dumps(payload).decode("utf-8"),
+        fcm_url
+    ]
+
+def _post_fcm(payload, server_key, fcm_url=FCM_URL):
+    """POST a payload in-process over the shared pooled transport and return the parsed JSON"""
+    headers = {
+        "Authorization": "key=" + server_key,
+        "Content-Type": "application/json"
+    }
+    response = fcm_transport.post(fcm_url, json=payload, headers=headers)
+    response.raise_for_status()
+    return fast_json.response_json(response)
+
+def _require_server_key(server_key):
     if not server_key:
         print("⚠️ No Firebase Server Key provided")
         print("📍 To get Server Key:")
@@ -25,38 +73,125 @@ def send_test_notification_curl(fcm_token, server_key=None):
         print("3. Copy 'Server key'")
         print()
         return False
+    return True
+
+def send_test_notification(fcm_token, server_key=None, fcm_url=FCM_URL):
+    """
+    Send test notification in-process (no curl subprocess)
+    """
     
-    # Prepare notification payload
-    payload = {
-        "to": fcm_token,
-        "notification": {
-            "title": "🎉 Test Notification",
-            "body": "Your Laxce Wallet notifications are working!"
-        },
-        "data": {
-            "type": "test",
-            "timestamp": datetime.now().isoformat(),
-            "action": "none"
-        },
-        "android": {
-            "notification": {
-                "icon": "ic_launcher_foreground",
-                "color": "#16B369",
-                "sound": "default",
-                "channel_id": "high_importance_channel"
-            }
-        }
-    }
+    if not _require_server_key(server_key):
+        return False
     
-    # Prepare curl command
-    curl_cmd = [
-        "curl",
-        "-X", "POST",
-        "-H", "Authorization: key=" + server_key,
-        "-H", "Content-Type: application/json",
-        "-d", json.dumps(payload),
-        "https://fcm.googleapis.com/fcm/send"
-    ]
+    print("📤 Sending test notification...")
+    print(f"🪙 Target FCM Token: {fcm_token[:30]}...")
+    print()
+    
+    try:
+        response = _post_fcm(build_test_payload(fcm_token), server_key, fcm_url)
+        
+        if response.get('success') == 1:
+            print("✅ Notification sent successfully!")
+            print(f"📱 Message ID: {response.get('results', [{}])[0].get('message_id', 'Unknown')}")
+            return True
+        else:
+            print("❌ Notification failed:")
+            print(f"   Error: {response.get('results', [{}])[0].get('error', 'Unknown error')}")
+            return False
+            
+    except ValueError as e:
+        print(f"❌ JSON parsing error: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Request error: {e}")
+        return False
+
+def send_transaction_notification(fcm_token, server_key, fcm_url=FCM_URL):
+    """
+    Send transaction notification test in-process (no curl subprocess)
+    """
+    
+    print("📤 Sending transaction notification...")
+    
+    try:
+        response = _post_fcm(build_transaction_payload(fcm_token), server_key, fcm_url)
+        
+        if response.get('success') == 1:
+            print("✅ Transaction notification sent!")
+            return True
+        else:
+            print("❌ Transaction notification failed:")
+            print(f"   Error: {response.get('results', [{}])[0].get('error', 'Unknown error')}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error sending transaction notification: {e}")
+        return False
+
+def iter_notification_batch(fcm_tokens, server_key, build_payload=build_test_payload, fcm_url=FCM_URL,
+                            dead_tokens=None):
+    """
+    Multiplexed mode: send one payload to many tokens per request using registration_ids.
+    `fcm_tokens` may be any iterable (e.g. token_source.iter_tokens on a large file);
+    it is consumed MAX_REGISTRATION_IDS at a time and one SendResult per token is yielded
+    in input order. With a DeadTokenStore, known-dead tokens are not sent (their result
+    carries DEAD_TOKEN_ERROR) and newly dead ones are recorded.
+    """
+    
+    start = 0
+    for chunk in chunked(fcm_tokens, MAX_REGISTRATION_IDS):
+        dead = set()
+        if dead_tokens is not None:
+            dead = {token for token in chunk if token in dead_tokens}
+        live = [token for token in chunk if token not in dead]
+        
+        per_token = []
+        if live:
+            payload = build_payload(live[0])
+            del payload["to"]
+            payload["registration_ids"] = live
+            try:
+                response = _post_fcm(payload, server_key, fcm_url)
+                per_token = response.get('results', [])
+            except Exception as e:
+                per_token = [{"error": f"{type(e).__name__}: {e}"}] * len(live)
+        
+        results = iter(per_token)
+        for offset, token in enumerate(chunk):
+            if token in dead:
+                dead_tokens.skipped += 1
+                yield SendResult(index=start + offset, token=token, success=False, error=DEAD_TOKEN_ERROR)
+                continue
+            res = next(results, None) or {"error": "Missing result"}
+            if dead_tokens is not None:
+                dead_tokens.record(token, res.get('error'))
+            yield SendResult(
+                index=start + offset,
+                token=token,
+                success='message_id' in res,
+                message_id=res.get('message_id'),
+                error=res.get('error')
+            )
+        start += len(chunk)
+
+def send_notification_batch(fcm_tokens, server_key, build_payload=build_test_payload, fcm_url=FCM_URL,
+                            dead_tokens=None):
+    """
+    Multiplexed mode: send one payload to many tokens per request using registration_ids.
+    Returns one SendResult per token, in input order.
+    """
+    
+    return list(iter_notification_batch(fcm_tokens, server_key, build_payload, fcm_url, dead_tokens))
+
+def send_test_notification_curl(fcm_token, server_key=None, fcm_url=FCM_URL):
+    """
+    Send test notification using curl (without Firebase Admin SDK)
+    """
+    
+    if not _require_server_key(server_key):
+        return False
+    
+    curl_cmd = _curl_command(build_test_payload(fcm_token), server_key, fcm_url)
     
     print("📤 Sending test notification...")
     print(f"🪙 Target FCM Token: {fcm_token[:30]}...")
@@ -66,7 +201,7 @@ def send_test_notification_curl(fcm_token, server_key=None):
         result = subprocess.run(curl_cmd, capture_output=True, text=True, check=True)
         
         if result.returncode == 0:
-            response = json.loads(result.stdout)
+            response = fast_json.loads(result.stdout)
             
             if response.get('success') == 1:
                 print("✅ Notification sent successfully!")
@@ -84,57 +219,23 @@ def send_test_notification_curl(fcm_token, server_key=None):
     except subprocess.CalledProcessError as e:
         print(f"❌ Curl command error: {e}")
         return False
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         print(f"❌ JSON parsing error: {e}")
         print(f"   Response: {result.stdout}")
         return False
 
-def send_transaction_notification_curl(fcm_token, server_key):
+def send_transaction_notification_curl(fcm_token, server_key, fcm_url=FCM_URL):
     """
     Send transaction notification test
     """
     
-    payload = {
-        "to": fcm_token,
-        "notification": {
-            "title": "Transaction Confirmed ✅",
-            "body": "Your 0.5 ETH transfer has been confirmed!"
-        },
-        "data": {
-            "type": "transaction",
-            "transactionId": "tx_test_123456",
-            "hash": "0x1234567890abcdef...",
-            "amount": "0.5",
-            "symbol": "ETH",
-            "status": "confirmed",
-            "explorerUrl": "https://etherscan.io/tx/0x1234567890abcdef...",
-            "action": "view_transaction",
-            "timestamp": datetime.now().isoformat()
-        },
-        "android": {
-            "notification": {
-                "icon": "ic_launcher_foreground",
-                "color": "#16B369",
-                "sound": "default",
-                "channel_id": "high_importance_channel"
-            }
-        }
-    }
-    
-    curl_cmd = [
-        "curl",
-        "-X", "POST",
-        "-H", "Authorization: key=" + server_key,
-        "-H", "Content-Type: application/json",
-        "-d", json.dumps(payload),
-        "https://fcm.googleapis.com/fcm/send"
-    ]
+    curl_cmd = _curl_command(build_transaction_payload(fcm_token), server_key, fcm_url)
     
     print("📤 Sending transaction notification...")
     
     try:
         result = subprocess.run(curl_cmd, capture_output=True, text=True, check=True)
-        response = json.loads(result.stdout)
+        response = fast_json.loads(result.stdout)
         
         if response.get('success') == 1:
             print("✅ Transaction notification sent!")
@@ -223,13 +324,13 @@ def main():
     choice = input("Select test type (1-3): ").strip()
     
     if choice == "1":
-        success = send_test_notification_curl(fcm_token, server_key)
+        success = send_test_notification(fcm_token, server_key)
         if success:
             print()
             print("🎉 Test completed! Check your Android device for notification.")
         
     elif choice == "2":
-        success = send_transaction_notification_curl(fcm_token, server_key)
+        success = send_transaction_notification(fcm_token, server_key)
         if success:
             print()
             print("💰 Transaction notification sent! Check your device.")
@@ -0,0 +1,51 @@
+import pytest
+import requests
+
+import fcm_transport
+from fcm_emulator import LEGACY_PATH, EmulatorConfig, FcmEmulator
+from test_notification_android import _post_fcm, build_test_payload, send_test_notification, \
+    send_transaction_notification
+
+
+@pytest.fixture
+def emulator():
+    emulator = FcmEmulator(EmulatorConfig(seed=1))
+    base_url, stop = emulator.run_in_thread()
+    emulator.url = base_url + LEGACY_PATH
+    yield emulator
+    stop()
+    fcm_transport.close_all()
+
+
+def test_post_fcm_returns_parsed_legacy_response(emulator):
+    response = _post_fcm(build_test_payload("token-1"), "local-key", emulator.url)
+
+    assert response["success"] == 1
+    assert response["results"][0]["message_id"]
+
+
+def test_post_fcm_raises_on_http_error(emulator):
+    with pytest.raises(requests.HTTPError):
+        _post_fcm(build_test_payload("token-1"), "local-key", emulator.url.replace(LEGACY_PATH, "/missing"))
+
+
+def test_send_test_and_transaction_notifications_in_process(emulator):
+    assert send_test_notification("token-1", "local-key", emulator.url) is True
+    assert send_transaction_notification("token-2", "local-key", emulator.url) is True
+    assert emulator.stats.delivered == 2
+
+
+def test_send_reports_per_message_errors(emulator):
+    assert send_test_notification("dead-1", "local-key", emulator.url) is False
+    assert send_transaction_notification("invalid-1", "local-key", emulator.url) is False
+    assert emulator.stats.errors == {"NotRegistered": 1, "InvalidRegistration": 1}
+
+
+def test_send_without_server_key_makes_no_request(emulator):
+    assert send_test_notification("token-1", None, emulator.url) is False
+    assert emulator.stats.requests == 0
+
+
+def test_send_survives_unreachable_server():
+    assert send_test_notification("token-1", "local-key", "http://127.0.0.1:9/fcm/send") is False
+    assert send_transaction_notification("token-1", "local-key", "http://127.0.0.1:9/fcm/send") is False
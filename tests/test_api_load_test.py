@@ -0,0 +1,35 @@
+import asyncio
+
+from api_load_test import LoadTest, percentile
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 11)]
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 95) == 10.0
+    assert percentile(values, 10) == 1.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 25) == 1.0
+    assert percentile([], 99) == 0.0
+
+
+def test_scale_refills_missing_slots_after_partial_ramp_down():
+    async def scenario():
+        test = LoadTest("http://127.0.0.1:9/", [(5, 1)])
+
+        async def idle(slot):
+            while slot < test._target:
+                await asyncio.sleep(0.001)
+
+        test._worker = idle
+        test._scale(5)
+        await asyncio.sleep(0.01)
+        test._scale(3)
+        await asyncio.sleep(0.01)
+        assert sorted(slot for slot, w in test._workers.items() if not w.done()) == [0, 1, 2]
+        test._scale(5)
+        assert sorted(test._workers) == [0, 1, 2, 3, 4]
+        test._target = 0
+        await asyncio.gather(*test._workers.values())
+        await test.client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,147 @@
+import threading
+
+import pytest
+import requests
+
+import fcm_transport
+from api_stand_in import API_PREFIX, ApiStandIn, StandInConfig
+from balance_client import BalanceClient, build_balance_request
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stand_in():
+    stand_in = ApiStandIn(StandInConfig(latency={}))
+    base_url, stop = stand_in.server().run_in_thread()
+    stand_in.url = base_url + API_PREFIX
+    yield stand_in
+    stop()
+    fcm_transport.close_all()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_fresh_entries_are_served_from_cache(stand_in, clock):
+    client = BalanceClient(stand_in.url, ttl={"balance": 10}, clock=clock)
+
+    first = client.get_balance("user-1", ["BTC"])
+    clock.now = 9.9
+    assert client.get_balance("user-1", ["BTC"]) == first
+
+    assert (client.stats.fetched, client.stats.hits) == (1, 1)
+    assert stand_in.calls["balance"] == 1
+
+
+def test_stale_entry_is_revalidated_with_etag(stand_in, clock):
+    client = BalanceClient(stand_in.url, ttl={"all-currencies": 10}, clock=clock)
+    first = client.all_currencies()
+
+    clock.now = 11
+    assert client.all_currencies() is first
+    assert (client.stats.fetched, client.stats.revalidated) == (1, 1)
+
+    # The 304 extended the entry for a full TTL
+    clock.now = 20
+    client.all_currencies()
+    assert client.stats.hits == 1 and stand_in.calls["all-currencies"] == 2
+
+
+def test_changed_resource_is_downloaded_again(stand_in, clock):
+    client = BalanceClient(stand_in.url, ttl={"balance": 10}, clock=clock)
+    client.get_balance("user-1", ["BTC"])
+
+    stand_in.balances["user-1"] = {"BTC": "2.0"}
+    clock.now = 11
+    balances = client.get_balance("user-1", ["BTC"])["Balances"]
+
+    assert balances[0]["balance"] == "2.0"
+    assert (client.stats.fetched, client.stats.revalidated) == (2, 0)
+
+
+def test_cache_key_is_the_request_body(stand_in, clock):
+    client = BalanceClient(stand_in.url, ttl={"balance": 10}, clock=clock)
+    client.get_balance("user-1", ["BTC"], {"BTC": "bitcoin", "ETH": "ethereum"})
+    client.get_balance("user-1", ["BTC"], {"ETH": "ethereum", "BTC": "bitcoin"})
+    client.get_balance("user-2", ["BTC"])
+
+    assert (client.stats.hits, client.stats.fetched) == (1, 2)
+    assert build_balance_request("u", ["BTC"], {"b": "1", "a": "2"})["Blockchain"] == {"a": "2", "b": "1"}
+
+
+def test_failures_are_not_cached(stand_in, clock):
+    client = BalanceClient(stand_in.url, ttl={"balance": 10}, clock=clock)
+    with pytest.raises(requests.HTTPError):
+        client.get_balance("")
+    with pytest.raises(requests.HTTPError):
+        client.get_balance("")
+    assert stand_in.calls["balance"] == 2
+
+
+def test_invalidate_drops_one_endpoint(stand_in, clock):
+    client = BalanceClient(stand_in.url, clock=clock)
+    client.get_balance("user-1")
+    client.all_currencies()
+
+    client.invalidate("balance")
+    client.get_balance("user-1")
+    client.all_currencies()
+    assert (stand_in.calls["balance"], stand_in.calls["all-currencies"]) == (2, 1)
+
+    client.invalidate()
+    client.all_currencies()
+    assert stand_in.calls["all-currencies"] == 2
+
+
+def test_concurrent_identical_calls_share_one_request(stand_in, clock):
+    stand_in.config.latency = {"balance": 0.2}
+    stand_in.config.jitter = 0
+    client = BalanceClient(stand_in.url, clock=clock)
+    start = threading.Barrier(8)
+    results = []
+
+    def poll():
+        start.wait()
+        results.append(client.get_balance("user-1", ["ETH"]))
+
+    threads = [threading.Thread(target=poll) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stand_in.calls["balance"] == 1
+    assert client.stats.coalesced == 7
+    assert all(result is results[0] for result in results)
+
+
+def test_coalesced_callers_see_the_leaders_error(stand_in, clock):
+    stand_in.config.latency = {"balance": 0.2}
+    stand_in.config.jitter = 0
+    client = BalanceClient(stand_in.url, clock=clock)
+    start = threading.Barrier(4)
+    errors = []
+
+    def poll():
+        start.wait()
+        try:
+            client.get_balance("")
+        except requests.HTTPError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=poll) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 4 and stand_in.calls["balance"] == 1
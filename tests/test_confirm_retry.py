@@ -0,0 +1,57 @@
+import socket
+
+from confirm_retry import FATAL, RETRYABLE, SUCCESS, ConfirmOutcome, ConfirmRetrier, classify_confirm, \
+    classify_exception
+from fcm_ratelimit import RetryPolicy
+
+TATUM_FAILURE = {"success": False, "message": "Failed to broadcast transaction via Tatum API"}
+
+
+def test_disguised_400_successes():
+    assert classify_confirm(400, {"success": False, "message": "Transaction sent successfully"}).kind == SUCCESS
+    outcome = classify_confirm(400, {"success": False, "tx_hash": "0xabc"})
+    assert outcome.kind == SUCCESS and outcome.tx_hash == "0xabc"
+    assert classify_confirm(200, {"tx_hash": "0xabc"}).kind == SUCCESS
+
+
+def test_tatum_broadcast_failure_is_retryable():
+    assert classify_confirm(400, TATUM_FAILURE).kind == RETRYABLE
+    assert classify_confirm(429, None).kind == RETRYABLE
+    assert classify_confirm(503, None, retry_after="2").kind == RETRYABLE
+
+
+def test_responses_after_a_possible_broadcast_are_fatal():
+    for status in (500, 502, 504):
+        assert classify_confirm(status, None).kind == FATAL
+    assert classify_confirm(503, None).kind == FATAL
+    assert classify_confirm(400, {"message": "Insufficient balance"}).kind == FATAL
+    assert classify_exception(socket.timeout("timed out")).kind == FATAL
+    assert classify_exception(ConnectionRefusedError()).kind == RETRYABLE
+
+
+def _retrier(sleeps):
+    return ConfirmRetrier(RetryPolicy(max_retries=3, base=0.01, cap=0.1), sleep=sleeps.append)
+
+
+def test_retrier_stops_on_fatal():
+    sleeps, outcomes = [], [classify_confirm(400, TATUM_FAILURE), classify_confirm(504, None)]
+    outcome = _retrier(sleeps).run(lambda: outcomes.pop(0))
+    assert outcome.kind == FATAL and outcome.attempts == 2
+    assert len(sleeps) == 1 and outcomes == []
+
+
+def test_retrier_never_resends_a_disguised_success():
+    calls = []
+
+    def confirm():
+        calls.append(1)
+        return classify_confirm(400, {"message": "Transaction sent successfully", "tx_hash": "0xabc"})
+
+    outcome = _retrier([]).run(confirm)
+    assert outcome.success and outcome.attempts == 1 and len(calls) == 1
+
+
+def test_retrier_gives_up_after_max_retries():
+    sleeps = []
+    outcome = _retrier(sleeps).run(lambda: ConfirmOutcome(RETRYABLE))
+    assert outcome.kind == RETRYABLE and outcome.attempts == 4 and len(sleeps) == 3
@@ -0,0 +1,50 @@
+import csv
+import json
+
+from dead_tokens import DeadTokenStore
+
+
+def test_record_keeps_only_dead_errors(tmp_path):
+    with DeadTokenStore(str(tmp_path / "dead.db")) as store:
+        assert store.record("a", "NotRegistered")
+        assert store.record("b", "UnregisteredError")
+        assert not store.record("c", "Unavailable")
+        assert not store.record("d", None)
+        assert "a" in store and "b" in store
+        assert "c" not in store and "d" not in store
+        assert list(store.filter_tokens(["a", "c", "b", "d"])) == ["c", "d"]
+        assert store.skipped == 2
+
+
+def test_bloom_filter_grows_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "dead.db")
+    with DeadTokenStore(path, batch_size=100) as store:
+        for i in range(3000):
+            store.add(f"dead-{i}")
+        # The 1024-token filter was rebuilt larger instead of filling up
+        assert store._bloom_capacity >= 3000
+        assert len(store) == 3000
+        assert all(f"dead-{i}" in store for i in range(0, 3000, 7))
+        assert sum(f"live-{i}" in store for i in range(3000)) == 0
+
+    with DeadTokenStore(path) as reopened:
+        assert "dead-2999" in reopened and len(reopened) == 3000
+        reopened.discard("dead-2999")
+        assert "dead-2999" not in reopened
+
+
+def test_export_writes_only_new_tokens(tmp_path):
+    with DeadTokenStore(str(tmp_path / "dead.db")) as store:
+        store.add("a", "NotRegistered")
+        store.add("b", "InvalidRegistration")
+        assert store.export(str(tmp_path / "first.csv")) == 2
+        with open(tmp_path / "first.csv", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert {(r["DeviceToken"], r["error"]) for r in rows} == {("a", "NotRegistered"), ("b", "InvalidRegistration")}
+
+        store.add("c")
+        assert store.export(str(tmp_path / "second.jsonl")) == 1
+        lines = (tmp_path / "second.jsonl").read_text().splitlines()
+        assert [json.loads(line)["DeviceToken"] for line in lines] == ["c"]
+        assert store.export(str(tmp_path / "all.jsonl"), only_new=False) == 3
+        assert store.stats()["not_exported"] == 0
@@ -0,0 +1,62 @@
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import fast_json
+
+PAYLOAD = {
+    "to": "token-1",
+    "notification": {"title": "💰 دریافت شد", "body": "0.5 ETH \"quoted\" / slash"},
+    "data": {"amount": 0.5, "count": 3, "ok": True, "missing": None, "items": [1, "two"]},
+}
+
+
+@pytest.fixture(params=sorted(fast_json.available_backends()))
+def backend(request):
+    return fast_json.available_backends()[request.param]
+
+
+def test_backends_round_trip_bytes_and_str(backend):
+    dumps, loads = backend
+    wire = dumps(PAYLOAD)
+
+    assert isinstance(wire, bytes)
+    assert loads(wire) == PAYLOAD
+    assert loads(wire.decode("utf-8")) == PAYLOAD
+    # Whatever backend encoded it, the stdlib (and so FCM) reads the same document
+    assert json.loads(wire) == PAYLOAD
+
+
+def test_stdlib_is_always_available():
+    assert "json" in fast_json.available_backends()
+    assert list(fast_json.available_backends())[-1] == "json"
+
+
+def test_falls_back_to_stdlib_without_optional_backends(monkeypatch):
+    monkeypatch.delenv("FAST_JSON_BACKEND", raising=False)
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    monkeypatch.setitem(sys.modules, "ujson", None)
+
+    name, dumps, loads = fast_json._select()
+
+    assert name == "json"
+    assert loads(dumps(PAYLOAD)) == PAYLOAD
+
+
+def test_forced_backend(monkeypatch):
+    monkeypatch.setenv("FAST_JSON_BACKEND", "json")
+    assert fast_json._select()[0] == "json"
+
+    monkeypatch.setenv("FAST_JSON_BACKEND", "simplejson")
+    with pytest.raises(ValueError, match="Unknown FAST_JSON_BACKEND"):
+        fast_json._select()
+
+
+def test_response_json_parses_raw_content():
+    response = SimpleNamespace(content='{"success": 1, "results": [{"message_id": "0:1%2f"}], "t": "é"}'.encode())
+    assert fast_json.response_json(response) == {"success": 1, "results": [{"message_id": "0:1%2f"}], "t": "é"}
+
+    with pytest.raises(ValueError):
+        fast_json.response_json(SimpleNamespace(content=b"<html>"))
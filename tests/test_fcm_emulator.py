@@ -0,0 +1,158 @@
+import random
+
+import pytest
+import requests
+
+from fcm_emulator import IID_BATCH_ADD_PATH, IID_BATCH_REMOVE_PATH, LEGACY_PATH, EmulatorConfig, FcmEmulator, \
+    LatencyDistribution, v1_url
+
+LEGACY_HEADERS = {"Authorization": "key=local-key"}
+V1_HEADERS = {"Authorization": "Bearer local-token"}
+
+
+@pytest.fixture
+def serve():
+    stops = []
+
+    def start(config=None):
+        emulator = FcmEmulator(config or EmulatorConfig(seed=1))
+        base_url, stop = emulator.run_in_thread()
+        stops.append(stop)
+        return emulator, base_url
+
+    yield start
+    for stop in stops:
+        stop()
+
+
+def test_legacy_multicast_reports_each_token(serve):
+    emulator, base_url = serve()
+    response = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS,
+                             json={"registration_ids": ["a", "dead-b", "invalid-c", "d"]})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body["success"], body["failure"]) == (2, 2)
+    assert [r.get("error") for r in body["results"]] == [None, "NotRegistered", "InvalidRegistration", None]
+    assert emulator.stats.messages == 4 and emulator.stats.delivered == 2
+
+
+def test_legacy_requires_server_key_and_json(serve):
+    _, base_url = serve()
+    assert requests.post(base_url + LEGACY_PATH, json={"to": "a"}).status_code == 401
+    bad = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS, data=b"{not json")
+    assert (bad.status_code, bad.text) == (400, "JSON_PARSING_ERROR")
+
+
+def test_error_rates_inject_per_message_errors(serve):
+    emulator, base_url = serve(EmulatorConfig(error_rates={"Unavailable": 1.0}, seed=1))
+    body = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS,
+                         json={"registration_ids": ["a", "b"]}).json()
+
+    assert [r["error"] for r in body["results"]] == ["Unavailable", "Unavailable"]
+    assert emulator.stats.errors == {"Unavailable": 2}
+
+
+def test_server_error_rate_fails_whole_request(serve):
+    _, base_url = serve(EmulatorConfig(server_error_rate=1.0, retry_after=7))
+    response = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS, json={"to": "a"})
+    assert (response.status_code, response.headers["retry-after"]) == (503, "7")
+
+
+def test_project_quota_answers_429_with_retry_after(serve):
+    emulator, base_url = serve(EmulatorConfig(project_rate=0.001, project_burst=2, retry_after=3))
+    statuses = [requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS, json={"to": f"t{i}"})
+                for i in range(3)]
+
+    assert [r.status_code for r in statuses] == [200, 200, 429]
+    assert statuses[2].headers["retry-after"] == "3"
+    assert statuses[2].json() == {"error": "QuotaExceeded"}
+    assert emulator.stats.throttled == 1
+
+
+def test_device_quota_is_per_token(serve):
+    _, base_url = serve(EmulatorConfig(device_rate=0.001, device_burst=1))
+    body = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS,
+                         json={"registration_ids": ["a", "a", "b"]}).json()
+    assert [r.get("error") for r in body["results"]] == [None, "DeviceMessageRateExceeded", None]
+
+
+def test_v1_send_and_error_shape(serve):
+    _, base_url = serve()
+    url = v1_url(base_url, "demo")
+
+    ok = requests.post(url, headers=V1_HEADERS, json={"message": {"token": "a"}})
+    assert ok.status_code == 200 and ok.json()["name"].startswith("projects/demo/messages/")
+
+    dead = requests.post(url, headers=V1_HEADERS, json={"message": {"token": "dead-a"}})
+    error = dead.json()["error"]
+    assert (dead.status_code, error["status"], error["details"][0]["errorCode"]) == (404, "NOT_FOUND", "UNREGISTERED")
+
+    assert requests.post(url, json={"message": {"token": "a"}}).status_code == 401
+    assert requests.post(url, headers=V1_HEADERS, json={"message": {}}).status_code == 400
+
+
+def test_v1_quota_error_carries_retry_after(serve):
+    _, base_url = serve(EmulatorConfig(project_rate=0.001, project_burst=1, retry_after=2))
+    url = v1_url(base_url)
+    requests.post(url, headers=V1_HEADERS, json={"message": {"token": "a"}})
+    throttled = requests.post(url, headers=V1_HEADERS, json={"message": {"token": "a"}})
+
+    assert throttled.status_code == 429
+    assert throttled.headers["retry-after"] == "2"
+    assert throttled.json()["error"]["details"][0]["errorCode"] == "QUOTA_EXCEEDED"
+
+
+def test_topic_fanout_follows_iid_subscriptions(serve):
+    emulator, base_url = serve()
+    added = requests.post(base_url + IID_BATCH_ADD_PATH, headers=LEGACY_HEADERS,
+                          json={"to": "/topics/news", "registration_tokens": ["a", "b", "dead-c", "invalid-d"]})
+    assert added.json()["results"] == [{}, {}, {"error": "NOT_FOUND"}, {"error": "INVALID_ARGUMENT"}]
+    requests.post(base_url + IID_BATCH_REMOVE_PATH, headers=LEGACY_HEADERS,
+                  json={"to": "/topics/news", "registration_tokens": ["b"]})
+
+    sent = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS, json={"to": "/topics/news"})
+    assert "message_id" in sent.json()
+    assert emulator.topics["news"] == {"a"}
+    assert (emulator.stats.topic_messages, emulator.stats.delivered) == (1, 1)
+
+
+def test_topic_rate_exceeded_is_injected_per_topic_message(serve):
+    emulator, base_url = serve(EmulatorConfig(error_rates={"TopicsMessageRateExceeded": 1.0}))
+    body = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS, json={"to": "/topics/news"}).json()
+    assert body == {"error": "TopicsMessageRateExceeded"}
+
+    # Topic-only errors never hit single-token sends
+    single = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS, json={"to": "a"}).json()
+    assert single["success"] == 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("0.01", LatencyDistribution("constant", 0.01)),
+    ("lognormal:0.02:0.5", LatencyDistribution("lognormal", 0.02, 0.5)),
+    ("exponential:0.1", LatencyDistribution("exponential", 0.1)),
+])
+def test_latency_parse(text, expected):
+    assert LatencyDistribution.parse(text) == expected
+
+
+def test_latency_samples_are_non_negative_and_centred():
+    rng = random.Random(3)
+    assert LatencyDistribution("constant", 0.0).sample(rng) == 0.0
+    uniform = [LatencyDistribution("uniform", 0.05, 0.01).sample(rng) for _ in range(500)]
+    assert all(0.04 <= value <= 0.06 for value in uniform)
+    normal = [LatencyDistribution("normal", 0.001, 0.01).sample(rng) for _ in range(500)]
+    assert min(normal) == 0.0
+    median = sorted(LatencyDistribution("lognormal", 0.02, 0.5).sample(rng) for _ in range(1001))[500]
+    assert median == pytest.approx(0.02, rel=0.2)
+
+
+def test_run_in_process_serves_a_copy():
+    emulator = FcmEmulator(EmulatorConfig(seed=1))
+    base_url, stop = emulator.run_in_process()
+    try:
+        body = requests.post(base_url + LEGACY_PATH, headers=LEGACY_HEADERS, json={"to": "a"}).json()
+    finally:
+        stop()
+    assert body["success"] == 1
+    assert emulator.stats.requests == 0
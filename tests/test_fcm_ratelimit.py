@@ -0,0 +1,45 @@
+from fcm_ratelimit import Attempt, RetryPolicy, TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after_rejects_non_finite_values():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after("inf") is None
+    assert parse_retry_after("nan") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_delay_clamps_the_server_hint():
+    policy = RetryPolicy(base=1.0, max_retry_after=30)
+    assert 2.0 <= policy.delay(0, "2") <= 3.0
+    assert policy.delay(0, "86400") <= 31.0
+
+
+def test_retry_after_over_the_limit_ends_the_retries():
+    policy = RetryPolicy(max_retry_after=30)
+    assert policy.should_retry(0, 429, retry_after="10")
+    assert not policy.should_retry(0, 429, retry_after="86400")
+
+    waits = []
+    result = policy.run(lambda attempt: Attempt("throttled", 429, retry_after="86400"),
+                        wait=lambda delay, outcome: waits.append(delay))
+    assert result == "throttled" and waits == []
+
+
+def test_run_retries_until_done():
+    outcomes = [Attempt("busy", 503), Attempt("busy", 429, retry_after="0"), Attempt("sent", 200, done=True)]
+    waits = []
+    assert RetryPolicy(base=0.01).run(lambda attempt: outcomes[attempt],
+                                       wait=lambda delay, outcome: waits.append(delay)) == "sent"
+    assert len(waits) == 2
+
+
+def test_zero_rate_bucket_is_unlimited():
+    bucket = TokenBucket(0, 1)
+    assert all(bucket.try_acquire() == 0.0 for _ in range(1000))
+
+
+def test_bucket_reports_the_wait_once_empty():
+    bucket = TokenBucket(10.0, 1)
+    assert bucket.try_acquire() == 0.0
+    assert 0 < bucket.try_acquire() <= 0.1
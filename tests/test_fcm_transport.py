@@ -0,0 +1,81 @@
+import pytest
+
+import fcm_transport
+import latency_metrics
+from fcm_emulator import LEGACY_PATH, FcmEmulator
+
+PROXY_VARIABLES = ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "http_proxy", "https_proxy", "all_proxy")
+
+
+@pytest.fixture(autouse=True)
+def fresh_sessions(monkeypatch):
+    for name in PROXY_VARIABLES + ("REQUESTS_CA_BUNDLE", "CURL_CA_BUNDLE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(fcm_transport, "_default_config", fcm_transport.TransportConfig())
+    fcm_transport.close_all()
+    yield
+    fcm_transport.close_all()
+
+
+def test_sessions_are_shared_per_config():
+    session = fcm_transport.get_session()
+    assert fcm_transport.get_session() is session
+    wide = fcm_transport.get_session(pool_maxsize=64)
+    assert wide is not session and fcm_transport.get_session(pool_maxsize=64) is wide
+    assert wide.get_adapter("https://fcm.googleapis.com").transport_config.pool_maxsize == 64
+
+    fcm_transport.configure(pool_maxsize=64)
+    assert fcm_transport.get_session() is wide
+    fcm_transport.close_all()
+    assert fcm_transport.get_session() is not wide
+
+
+def test_keep_alive_off_closes_connections():
+    assert fcm_transport.get_session(keep_alive=False).headers["Connection"] == "close"
+    assert fcm_transport.get_session().headers.get("Connection") != "close"
+
+
+def test_environment_is_read_once_without_a_proxy(monkeypatch):
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", "/etc/ssl/custom.pem")
+    session = fcm_transport.get_session()
+    assert session.trust_env is False
+    assert session.verify == "/etc/ssl/custom.pem"
+
+
+def test_proxy_settings_keep_per_request_environment_handling(monkeypatch):
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy.internal:3128")
+    session = fcm_transport.get_session()
+    assert session.trust_env is True
+    assert session.verify is True
+
+
+@pytest.fixture
+def fcm_url():
+    base_url, stop = FcmEmulator().run_in_thread()
+    yield base_url + LEGACY_PATH
+    stop()
+
+
+def test_post_encodes_json_and_reports_stages(fcm_url):
+    recorder = latency_metrics.LatencyRecorder()
+    with recorder.trace("fcm_legacy"):
+        response = fcm_transport.post(fcm_url, json={"to": "token-1", "data": {"type": "test"}},
+                                      headers={"Authorization": "key=local"})
+    assert response.status_code == 200
+    assert response.json()["success"] == 1
+    assert response.request.headers["Content-Type"] == "application/json"
+    stages = {stage for _, stage in recorder.histograms()}
+    assert {"serialize", "connect", "response"} <= stages
+
+    # The second request reuses the pooled connection: no new connect stage
+    recorder.reset()
+    with recorder.trace("fcm_legacy"):
+        fcm_transport.post(fcm_url, json={"to": "token-2"}, headers={"Authorization": "key=local"})
+    assert ("fcm_legacy", "connect") not in recorder.histograms()
+
+
+def test_explicit_content_type_is_kept(fcm_url):
+    response = fcm_transport.post(fcm_url, json={"to": "token-1"},
+                                  headers={"content-type": "application/json; charset=utf-8",
+                                           "Authorization": "key=local"})
+    assert response.request.headers["Content-Type"] == "application/json; charset=utf-8"
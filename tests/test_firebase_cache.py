@@ -0,0 +1,50 @@
+import json
+import sys
+import types
+
+import pytest
+
+import firebase_cache
+
+
+@pytest.fixture
+def fake_firebase_admin(monkeypatch):
+    apps = {}
+    module = types.ModuleType("firebase_admin")
+    credentials = types.ModuleType("firebase_admin.credentials")
+    credentials.Certificate = lambda info: ("certificate", info["client_email"])
+
+    def get_app(name):
+        if name not in apps:
+            raise ValueError(name)
+        return apps[name]
+
+    def initialize_app(credential, name):
+        apps[name] = types.SimpleNamespace(name=name, credential=credential)
+        return apps[name]
+
+    module.credentials, module.get_app, module.initialize_app = credentials, get_app, initialize_app
+    monkeypatch.setitem(sys.modules, "firebase_admin", module)
+    monkeypatch.setitem(sys.modules, "firebase_admin.credentials", credentials)
+    firebase_cache.clear()
+    yield apps
+    firebase_cache.clear()
+
+
+def _service_account(tmp_path, name):
+    path = tmp_path / f"{name}.json"
+    path.write_text(json.dumps({"client_email": f"{name}@example.iam.gserviceaccount.com"}))
+    return path
+
+
+def test_get_app_is_keyed_on_name_and_path(tmp_path, fake_firebase_admin):
+    first, second = _service_account(tmp_path, "first"), _service_account(tmp_path, "second")
+
+    app = firebase_cache.get_app(first)
+    assert firebase_cache.get_app(str(first)) is app
+    with pytest.raises(ValueError):
+        firebase_cache.get_app(second)
+
+    other = firebase_cache.get_app(second, name="second")
+    assert other is not app
+    assert other.credential == ("certificate", "second@example.iam.gserviceaccount.com")
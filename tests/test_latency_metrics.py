@@ -0,0 +1,105 @@
+import json
+import threading
+
+import pytest
+
+import latency_metrics
+from latency_metrics import Histogram, LatencyRecorder
+
+
+def test_small_values_are_exact_and_large_ones_within_one_percent():
+    histogram = Histogram()
+    for micros in (1, 57, 199):
+        histogram.record(micros / 1_000_000)
+    assert [histogram.percentile(p) * 1_000_000 for p in (1, 50, 100)] == [1, 57, 199]
+
+    for seconds in (0.0123456, 1.5, 93.7):
+        single = Histogram()
+        single.record(seconds)
+        assert single.percentile(50) == pytest.approx(seconds, rel=0.01)
+        assert single.percentile(50) <= seconds
+
+
+def test_percentile_is_nearest_rank():
+    histogram = Histogram()
+    for micros in range(1, 11):
+        histogram.record(micros / 1_000_000)
+    assert histogram.percentile(12) == 2 / 1_000_000
+    assert histogram.percentile(50) == 5 / 1_000_000
+    assert histogram.percentile(95) == 10 / 1_000_000
+    assert Histogram().percentile(99) == 0.0
+
+
+def test_percentiles_of_a_wide_distribution():
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.count == 1000
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.01)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.01)
+    assert histogram.mean == pytest.approx(0.5005, rel=1e-6)
+    assert histogram.max == 1_000_000 and histogram.min == 1000
+
+
+def test_merge_matches_recording_into_one_histogram():
+    combined, left, right = Histogram(), Histogram(), Histogram()
+    for i in range(1, 500):
+        value = i * 0.0007
+        combined.record(value)
+        (left if i % 3 else right).record(value)
+    left.merge(right)
+    assert left.to_dict() == combined.to_dict()
+    with pytest.raises(ValueError):
+        left.merge(Histogram(significant_digits=3))
+
+
+def test_dict_round_trip_keeps_percentiles():
+    histogram = Histogram()
+    for i in range(1, 300):
+        histogram.record(i * 0.0031)
+    restored = Histogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.to_dict() == histogram.to_dict()
+
+
+def test_prometheus_export():
+    recorder = LatencyRecorder()
+    recorder.record("fcm_legacy", "response", 0.25)
+    recorder.record("fcm_legacy", "build", 0.001)
+    recorder.record('odd"sender', "parse", 0.002)
+    text = recorder.to_prometheus()
+    lines = text.splitlines()
+    assert lines[:2] == ["# HELP laxce_stage_latency_seconds Time spent in each stage of a notification or API call",
+                         "# TYPE laxce_stage_latency_seconds summary"]
+    assert 'laxce_stage_latency_seconds{sender="fcm_legacy",stage="response",quantile="0.99"} 0.250000' in lines
+    assert 'laxce_stage_latency_seconds_count{sender="fcm_legacy",stage="response"} 1' in lines
+    assert 'laxce_stage_latency_seconds_sum{sender="odd\\"sender",stage="parse"} 0.002000' in lines
+    # Stages follow the send order: build before response
+    assert text.index('stage="build"') < text.index('stage="response"')
+
+
+def test_trace_collects_stages_and_nested_traces_join_the_outer_one():
+    recorder = LatencyRecorder()
+    latency_metrics.add_stage("connect", 1.0)  # outside a trace: ignored
+    with recorder.trace("api") as outer:
+        latency_metrics.add_stage("connect", 0.01)
+        with recorder.trace("inner") as inner:
+            assert inner is outer
+            inner.add("response", 0.02)
+        outer.add("response", 0.03)
+    assert latency_metrics.current_trace() is None
+    histograms = recorder.histograms()
+    assert set(histograms) == {("api", "connect"), ("api", "response")}
+    assert histograms[("api", "response")].percentile(50) == pytest.approx(0.05, rel=0.01)
+
+
+def test_recorder_merge_and_thread_safety():
+    recorder, other = LatencyRecorder(), LatencyRecorder()
+    threads = [threading.Thread(target=lambda: [recorder.record("s", "build", 0.001) for _ in range(1000)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    other.record("s", "build", 0.002)
+    recorder.merge(other)
+    assert recorder.histograms()[("s", "build")].count == 4001
@@ -0,0 +1,69 @@
+import types
+
+import test_admin_sdk
+from dead_tokens import DEAD_TOKEN_ERROR, DeadTokenStore
+from test_admin_sdk import send_multicast
+
+
+class UnregisteredError(Exception):
+    pass
+
+
+def _fake_messaging(calls, short_batch=None):
+    def send_each_for_multicast(multicast, dry_run=False):
+        calls.append(list(multicast.tokens))
+        tokens = multicast.tokens[:-1] if len(calls) == short_batch else multicast.tokens
+        return types.SimpleNamespace(responses=[
+            types.SimpleNamespace(success=False, message_id=None, exception=UnregisteredError(f"{token} is gone"))
+            if token.startswith("dead-") else
+            types.SimpleNamespace(success=True, message_id=f"msg-{token}", exception=None)
+            for token in tokens
+        ])
+
+    def message(**fields):
+        return types.SimpleNamespace(**fields)
+
+    return types.SimpleNamespace(
+        Notification=message, AndroidConfig=message, AndroidNotification=message, MulticastMessage=message,
+        Priority=types.SimpleNamespace(HIGH="high"), send_each_for_multicast=send_each_for_multicast,
+    )
+
+
+def test_send_multicast_splits_into_batches_of_500_and_maps_errors():
+    tokens = [f"dead-{i}" if i % 100 == 7 else f"token-{i}" for i in range(1203)]
+    calls = []
+    results = send_multicast(tokens, _fake_messaging(calls))
+
+    assert [len(batch) for batch in calls] == [test_admin_sdk.MULTICAST_BATCH_SIZE, 500, 203]
+    assert [r.index for r in results] == list(range(len(tokens)))
+    assert [r.token for r in results] == tokens
+    assert results[0].success and results[0].message_id == "msg-token-0"
+    failed = [r for r in results if not r.success]
+    assert [r.token for r in failed] == [t for t in tokens if t.startswith("dead-")]
+    assert failed[0].error == "dead-7 is gone"
+
+
+def test_send_multicast_counts_missing_responses_as_failures():
+    tokens = [f"token-{i}" for i in range(600)]
+    results = send_multicast(tokens, _fake_messaging([], short_batch=1))
+
+    assert len(results) == 600
+    missing = [r for r in results if not r.success]
+    assert [r.index for r in missing] == [499]
+    assert missing[0].error == "No response for this token"
+
+
+def test_send_multicast_reports_known_dead_tokens_at_their_input_index(tmp_path):
+    with DeadTokenStore(str(tmp_path / "dead.db")) as dead_tokens:
+        dead_tokens.add("token-1")
+        dead_tokens.add("token-3")
+        calls = []
+        tokens = [f"token-{i}" for i in range(5)] + ["dead-5"]
+        results = send_multicast(tokens, _fake_messaging(calls), dead_tokens=dead_tokens)
+
+        assert calls == [["token-0", "token-2", "token-4", "dead-5"]]
+        assert [(r.index, r.token) for r in results] == list(enumerate(tokens))
+        assert [r.error for r in results if not r.success] == [DEAD_TOKEN_ERROR, DEAD_TOKEN_ERROR, "dead-5 is gone"]
+        assert dead_tokens.skipped == 2
+        # UnregisteredError responses are recorded for the next run
+        assert "dead-5" in dead_tokens
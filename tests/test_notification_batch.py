@@ -0,0 +1,30 @@
+import pytest
+
+import fcm_transport
+from dead_tokens import DEAD_TOKEN_ERROR, DeadTokenStore
+from fcm_emulator import LEGACY_PATH, FcmEmulator
+from test_notification_android import iter_notification_batch
+
+
+@pytest.fixture
+def fcm_url():
+    base_url, stop = FcmEmulator().run_in_thread()
+    yield base_url + LEGACY_PATH
+    stop()
+    fcm_transport.close_all()
+
+
+def test_registration_ids_batch_keeps_input_order_with_dead_tokens(tmp_path, fcm_url, monkeypatch):
+    monkeypatch.setattr("test_notification_android.MAX_REGISTRATION_IDS", 4)
+    tokens = [f"token-{i}" for i in range(10)]
+    tokens[2], tokens[7] = "dead-2", "known-dead-7"
+    with DeadTokenStore(str(tmp_path / "dead.db")) as dead_tokens:
+        dead_tokens.add("known-dead-7")
+        results = list(iter_notification_batch(tokens, "local-key", fcm_url=fcm_url, dead_tokens=dead_tokens))
+
+        assert [(r.index, r.token) for r in results] == list(enumerate(tokens))
+        assert [r.index for r in results if r.success] == [0, 1, 3, 4, 5, 6, 8, 9]
+        assert results[2].error == "NotRegistered"
+        assert results[7].error == DEAD_TOKEN_ERROR
+        assert dead_tokens.skipped == 1
+        assert "dead-2" in dead_tokens
@@ -0,0 +1,33 @@
+from notification_coalescing import FCM_MAX_PAYLOAD_BYTES, ReceiveCoalescer, ReceiveEvent
+
+import fast_json
+
+
+def _event(i: int) -> ReceiveEvent:
+    # Realistic sizes: 66-char transaction hashes and 0x addresses
+    return ReceiveEvent("fcm-token-" + "t" * 150, "c2569417-736b-4352-860f-5f063948b6b1", f"0x{i:064x}",
+                        "123.456789012345678", "USDT", f"0x{i:040x}", f"0x{i + 1:040x}")
+
+
+def test_summaries_stay_under_fcm_payload_limit():
+    coalescer = ReceiveCoalescer(window=60, max_events=1000)
+    payloads = []
+    for i in range(60):
+        payloads += [payload for _, payload in coalescer.add(_event(i), now=0.0)]
+    payloads += [payload for _, payload in coalescer.flush(now=1.0)]
+
+    assert max(len(p) for p in payloads) <= FCM_MAX_PAYLOAD_BYTES
+    counts = [int(fast_json.loads(p)["data"].get("count", 1)) for p in payloads]
+    assert sum(counts) == 60
+    # Windows are still filled close to the limit, not closed early
+    assert len(payloads) <= 60 // 8
+
+
+def test_summary_keeps_every_transaction():
+    coalescer = ReceiveCoalescer(window=5)
+    for i in range(3):
+        assert coalescer.add(_event(i), now=float(i)) == []
+    [(token, payload)] = coalescer.poll(now=5.0)
+    data = fast_json.loads(payload)["data"]
+    assert data["count"] == "3"
+    assert [tx["transaction_id"] for tx in fast_json.loads(data["transactions"])] == [f"0x{i:064x}" for i in range(3)]
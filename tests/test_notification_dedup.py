@@ -0,0 +1,101 @@
+from notification_dedup import BloomFilter, DedupIndex, RotatingBloomFilter, key_from_payload
+from notification_templates import TEMPLATES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _transaction(transaction_id):
+    return dict(token="token-1", direction="inbound", transaction_id=transaction_id, amount="1", symbol="BTC",
+                status="confirmed")
+
+
+def test_rendered_and_dict_payloads_share_a_key():
+    for transaction_id in ('tx"é1', "tx\\2", "tx\t3", "plain"):
+        fields = _transaction(transaction_id)
+        rendered = key_from_payload("token-1", TEMPLATES.render("transaction", **fields))
+        assert rendered == key_from_payload("token-1", TEMPLATES.render_dict("transaction", **fields))
+        assert rendered == (transaction_id, "token-1", "transaction")
+
+    index = DedupIndex()
+    fields = _transaction('tx"é1')
+    assert index.is_new("token-1", TEMPLATES.render("transaction", **fields))
+    assert not index.is_new("token-1", TEMPLATES.render_dict("transaction", **fields))
+
+
+def test_payloads_without_a_transaction_id_always_pass():
+    index = DedupIndex()
+    payload = TEMPLATES.render("welcome", token="t", wallet_id="w", user_id="u")
+    assert key_from_payload("t", payload) is None
+    assert index.is_new("t", payload) and index.is_new("t", payload)
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    index = DedupIndex(ttl=10, clock=clock)
+    key = ("tx1", "token-1", "receive")
+    assert index.check_and_add(key)
+    clock.now = 9.9
+    assert not index.check_and_add(key)
+    clock.now = 10.0
+    assert index.check_and_add(key)
+    assert index.duplicates == 1
+
+
+def test_discard_lets_a_retry_through():
+    index = DedupIndex()
+    payload = {"data": {"type": "receive", "transaction_id": "tx1"}}
+    assert index.is_new("t", payload)
+    index.discard("t", payload)
+    assert index.is_new("t", payload)
+
+
+def test_eviction_keeps_the_index_bounded_and_feeds_the_bloom_filter():
+    clock = FakeClock()
+    keys = [(f"tx{i}", "token", "receive") for i in range(10)]
+
+    exact = DedupIndex(max_entries=5, clock=clock)
+    for key in keys:
+        assert exact.check_and_add(key)
+    assert len(exact) == 5
+    # The oldest keys were evicted for space and are forgotten
+    assert exact.check_and_add(keys[0])
+
+    remembered = DedupIndex(max_entries=5, bloom=RotatingBloomFilter(1000, window=60, clock=clock), clock=clock)
+    for key in keys:
+        remembered.check_and_add(key)
+    assert len(remembered) == 5
+    assert not remembered.check_and_add(keys[0])
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"in-{i}".encode())
+    assert all(f"in-{i}".encode() in bloom for i in range(1000))
+    false_positives = sum(f"out-{i}".encode() in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_rotating_bloom_filter_forgets_after_two_windows():
+    clock = FakeClock()
+    bloom = RotatingBloomFilter(1000, window=10, clock=clock)
+    bloom.add(b"old")
+    clock.now = 10
+    bloom.add(b"new")
+    assert b"old" in bloom and b"new" in bloom
+    clock.now = 20
+    bloom.add(b"newer")
+    assert b"old" not in bloom and b"new" in bloom
+
+
+def test_rotating_bloom_filter_rotates_when_full():
+    bloom = RotatingBloomFilter(2, window=3600, clock=FakeClock())
+    for item in (b"a", b"b", b"c", b"d", b"e"):
+        bloom.add(item)
+    assert b"a" not in bloom and b"e" in bloom
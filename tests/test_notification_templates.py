@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from notification_templates import TEMPLATES, CompiledTemplate
+
+TRICKY = [
+    'say "hi"',
+    "back\\slash",
+    "line\nbreak\ttab\x00\x1f",
+    "ünïcødé 💰 ریال",
+    "100% {token} %s %(x)s {}",
+    "  ",
+    "",
+]
+
+
+@pytest.mark.parametrize("value", TRICKY)
+def test_render_matches_render_dict_for_tricky_values(value):
+    values = dict(token=value, amount=value, currency="BTC", from_address=value, to_address="bc1q",
+                  transaction_id=value, wallet_id=value)
+    rendered = TEMPLATES.render("receive", values)
+    assert json.loads(rendered) == TEMPLATES.render_dict("receive", values)
+    data = json.loads(rendered)
+    assert data["to"] == value and data["data"]["transaction_id"] == value
+    assert data["notification"]["title"] == f"💰 Received: {value} BTC"
+
+
+def test_non_string_values_are_stringified():
+    payload = TEMPLATES.render_dict("welcome", token="t", wallet_id=42, user_id=None)
+    assert payload["data"] == {"type": "welcome", "wallet_id": "42", "user_id": "None"}
+
+
+def test_missing_field_raises_key_error():
+    with pytest.raises(KeyError, match="currency"):
+        TEMPLATES.render("receive", token="t", amount="1", from_address="a", to_address="b",
+                         transaction_id="tx", wallet_id="w")
+
+
+def test_keyword_values_override_the_dict():
+    row = {"token": "row-token", "wallet_id": "w", "user_id": "u"}
+    assert TEMPLATES.render_dict("welcome", row, token="override")["to"] == "override"
+    assert row["token"] == "row-token"
+
+
+def test_literal_percent_and_single_or_no_slot_templates():
+    one = CompiledTemplate("one", {"to": "{token}", "note": "100% sure"})
+    assert json.loads(one.render(token="t")) == {"to": "t", "note": "100% sure"}
+    none = CompiledTemplate("none", {"note": "static"})
+    assert json.loads(none.render()) == {"note": "static"}
+    assert one.fields == ("token",) and none.fields == ()
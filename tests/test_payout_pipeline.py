@@ -0,0 +1,114 @@
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+from api_stand_in import API_PREFIX, ApiStandIn, StandInConfig
+from async_http import json_response
+from confirm_retry import ConfirmRetrier
+from fcm_ratelimit import RetryPolicy
+from payout_pipeline import Payout, PayoutPipeline
+
+FAST_RETRIES = ConfirmRetrier(RetryPolicy(max_retries=2, base=0.0, cap=0.0))
+
+
+@pytest.fixture
+def stand_in():
+    stand_in = ApiStandIn(StandInConfig(latency={"send/prepare": 0.004, "send/confirm": 0.004}, jitter=1.0))
+    base_url, stop = stand_in.server().run_in_thread()
+    stand_in.url = base_url + API_PREFIX
+    # sender → amounts in the order their confirms reached the backend
+    stand_in.confirm_order = defaultdict(list)
+    confirm = stand_in.routes["send/confirm"]
+
+    async def recording_confirm(request):
+        prepared = stand_in.prepared.get((request.json() or {}).get("transaction_id"))
+        if prepared is not None:
+            stand_in.confirm_order[prepared["sender_address"]].append(prepared["amount"])
+        return await confirm(request)
+
+    stand_in.routes["send/confirm"] = recording_confirm
+    yield stand_in
+    stop()
+
+
+def _payouts(senders, per_sender, blockchain="polygon"):
+    # Interleaved so one sender's payouts are in flight together with the others'
+    return [Payout(f"sender-{s}", "recipient", f"{n}.0", blockchain)
+            for n in range(per_sender) for s in range(senders)]
+
+
+def test_confirms_of_one_sender_go_out_in_submission_order(stand_in):
+    payouts = _payouts(senders=3, per_sender=6)
+    results = PayoutPipeline(stand_in.url, window=16, retrier=FAST_RETRIES).submit(payouts)
+
+    assert [r.index for r in results] == list(range(len(payouts)))
+    assert all(r.success and r.tx_hash and r.prepares == 1 and r.confirms == 1 for r in results)
+    assert dict(stand_in.confirm_order) == {f"sender-{s}": [f"{n}.0" for n in range(6)] for s in range(3)}
+    assert stand_in.broadcasts == len(payouts)
+
+
+def test_failed_confirm_re_prepares_the_senders_next_payout(stand_in):
+    confirm = stand_in.routes["send/confirm"]
+
+    async def reject_first_of_sender_0(request):
+        prepared = stand_in.prepared.get((request.json() or {}).get("transaction_id")) or {}
+        if (prepared.get("sender_address"), prepared.get("amount")) == ("sender-0", "0.0"):
+            return json_response(400, {"success": False, "message": "Insufficient funds"})
+        return await confirm(request)
+
+    stand_in.routes["send/confirm"] = reject_first_of_sender_0
+    results = PayoutPipeline(stand_in.url, window=8, retrier=FAST_RETRIES).submit(_payouts(senders=2, per_sender=2))
+
+    by_key = {(r.payout.sender, r.payout.amount): r for r in results}
+    failed = by_key["sender-0", "0.0"]
+    assert not failed.success and failed.error == "Insufficient funds" and failed.confirms == 1
+    # Built on the nonce that never landed, so prepared again before broadcasting
+    assert by_key["sender-0", "1.0"].success and by_key["sender-0", "1.0"].prepares == 2
+    # Another sender's sequence is not touched
+    assert [by_key["sender-1", a].prepares for a in ("0.0", "1.0")] == [1, 1]
+
+
+def test_transient_broadcast_failures_are_retried_then_reported(stand_in):
+    stand_in.config.broadcast_failure_rate = 1.0
+    results = PayoutPipeline(stand_in.url, window=8, retrier=FAST_RETRIES).submit(_payouts(senders=1, per_sender=2))
+
+    assert [r.confirms for r in results] == [3, 3]
+    assert [r.prepares for r in results] == [1, 2]
+    assert not any(r.success for r in results)
+    assert "Tatum" in results[0].error
+    assert stand_in.broadcasts == 0 and stand_in.duplicate_confirms == 0
+
+
+def test_prepare_failure_is_reported_without_confirming(stand_in):
+    results = PayoutPipeline(stand_in.url, retrier=FAST_RETRIES).submit([Payout("sender-0", "", "1.0")])
+
+    assert not results[0].success and results[0].confirms == 0
+    assert "Missing fields: recipient_address" in results[0].error
+    assert stand_in.calls["send/confirm"] == 0
+
+
+def test_chain_limit_bounds_calls_in_flight(stand_in):
+    in_flight = defaultdict(int)
+    peak = defaultdict(int)
+    for route in ("send/prepare", "send/confirm"):
+        handler = stand_in.routes[route]
+
+        async def tracked(request, handler=handler):
+            chain = (request.json() or {}).get("blockchain")
+            in_flight[chain] += 1
+            peak[chain] = max(peak[chain], in_flight[chain])
+            try:
+                await asyncio.sleep(0.002)
+                return await handler(request)
+            finally:
+                in_flight[chain] -= 1
+
+        stand_in.routes[route] = tracked
+
+    payouts = _payouts(senders=6, per_sender=2, blockchain="Polygon") + _payouts(senders=6, per_sender=2, blockchain="tron")
+    results = PayoutPipeline(stand_in.url, window=24, chain_limits={"polygon": 2}, default_chain_limit=5,
+                             retrier=FAST_RETRIES).submit(payouts)
+
+    assert all(r.success for r in results)
+    assert peak["Polygon"] <= 2 and 2 < peak["tron"] <= 5
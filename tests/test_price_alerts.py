@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+import fast_json
+from price_alerts import PriceAlertEngine
+
+
+def _brute_force(alerts, cancelled, symbol, price):
+    fired = []
+    for alert_id, alert in list(alerts.items()):
+        if alert["symbol"] != symbol:
+            continue
+        if (alert["target"] <= price) if alert["above"] else (alert["target"] >= price):
+            del alerts[alert_id]
+            if alert_id not in cancelled:
+                fired.append((alert["token"], alert["target"]))
+    return sorted(fired)
+
+
+def test_matches_agree_with_a_full_scan():
+    rng = random.Random(5)
+    engine = PriceAlertEngine()
+    alerts, cancelled = {}, set()
+    prices = {"BTC": 45000.0, "ETH": 2500.0}
+
+    def add(count):
+        for _ in range(count):
+            symbol = rng.choice(list(prices))
+            target = round(prices[symbol] * rng.uniform(0.9, 1.1), 2)
+            above = rng.random() < 0.5
+            token = f"token-{len(alerts) + len(cancelled)}-{rng.random()}"
+            alerts[engine.add(token, symbol, target, above=above)] = dict(
+                symbol=symbol, token=token, target=target, above=above)
+
+    add(2000)
+    for tick in range(400):
+        if tick % 10 == 0:
+            add(rng.randint(0, 40))
+        if alerts and rng.random() < 0.3:
+            alert_id = rng.choice(list(alerts))
+            engine.cancel(alert_id)
+            cancelled.add(alert_id)
+        symbol = rng.choice(list(prices))
+        prices[symbol] *= 1 + rng.gauss(0, 0.01)
+        assert sorted(engine.matches(symbol, prices[symbol])) == _brute_force(alerts, cancelled, symbol,
+                                                                           prices[symbol])
+        assert len(engine) == sum(1 for alert_id in alerts if alert_id not in cancelled)
+
+
+def test_len_after_cancel_and_fire():
+    engine = PriceAlertEngine()
+    first = engine.add("a", "BTC", 100, above=True)
+    engine.add("b", "BTC", 200, above=True)
+    engine.add("c", "BTC", 50, above=False)
+    assert len(engine) == 3
+    engine.cancel(first)
+    engine.cancel(first)
+    assert len(engine) == 2
+    assert engine.matches("BTC", 150) == []
+    assert len(engine) == 2
+    assert engine.matches("BTC", 40) == [("c", 50.0)]
+    assert len(engine) == 1
+    # Cancelling an alert that already fired changes nothing
+    engine.cancel(first)
+    assert len(engine) == 1
+    assert engine.matches("BTC", 250) == [("b", 200.0)]
+    assert len(engine) == 0
+
+
+def test_above_is_inferred_from_the_last_price():
+    engine = PriceAlertEngine()
+    with pytest.raises(ValueError):
+        engine.add("a", "ETH", 3000)
+    engine.matches("ETH", 2500)
+    engine.add("up", "ETH", 3000)
+    engine.add("down", "ETH", 2000)
+    assert engine.matches("ETH", 2100) == []
+    assert engine.matches("ETH", 1990) == [("down", 2000.0)]
+    assert engine.matches("ETH", 3000) == [("up", 3000.0)]
+
+
+def test_tick_renders_price_alert_payloads():
+    engine = PriceAlertEngine()
+    engine.add("token-1", "btc", 45000, above=True)
+    engine.matches("BTC", 44000)
+    [(token, payload)] = engine.tick("BTC", 45210.5)
+    data = fast_json.loads(payload)
+    assert token == "token-1" and data["to"] == "token-1"
+    assert data["data"]["target_price"] == "45000"
+    assert data["data"]["current_price"] == "45210.5"
+    assert data["data"]["change_percent"] == "2.8"
+    assert engine.tick("BTC", 46000) == []
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from latency_metrics import LatencyRecorder
+from priority_scheduler import MARKETING, TRANSACTIONAL, PriorityClass, PriorityScheduler, class_for
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_class_for():
+    assert class_for("receive") == TRANSACTIONAL
+    assert class_for("transaction") == TRANSACTIONAL
+    assert class_for("welcome") == MARKETING
+    assert class_for("legacy") == MARKETING
+
+
+def test_weighted_share_while_both_classes_are_backlogged():
+    running, gate, order = threading.Event(), threading.Event(), []
+
+    def hold():
+        running.set()
+        gate.wait(5)
+
+    classes = (PriorityClass(TRANSACTIONAL, weight=10), PriorityClass(MARKETING, weight=1))
+    with PriorityScheduler(lambda token, payload: order.append(payload), classes=classes, concurrency=1,
+                           metrics=LatencyRecorder(), clock=FakeClock()) as scheduler:
+        # Hold the only worker so both queues fill before anything is picked
+        scheduler.submit("welcome", hold)
+        assert running.wait(5)
+        for i in range(30):
+            scheduler.send("welcome", f"campaign-{i}", "welcome")
+        for i in range(30):
+            scheduler.send("receive", f"wallet-{i}", "receive")
+        gate.set()
+
+    # ~10 receives per welcome; the exact split at a stamp tie depends on float rounding
+    for served in (11, 22):
+        assert served * 10 // 11 - 1 <= order[:served].count("receive") <= served * 10 // 11 + 1
+    assert "welcome" in order[:11]
+    assert order.count("receive") == order.count("welcome") == 30
+
+
+def test_slo_guard_overrides_the_stamp():
+    clock = FakeClock()
+    classes = (PriorityClass(TRANSACTIONAL, weight=1, slo=1.0), PriorityClass(MARKETING, weight=100))
+    scheduler = PriorityScheduler(classes=classes, concurrency=0, slo_guard=0.5, clock=clock)
+    scheduler.submit("welcome", print)
+    scheduler.submit("receive", print)
+
+    assert scheduler._pick().cls.name == MARKETING
+    clock.now = 0.49
+    assert scheduler._pick().cls.name == MARKETING
+    clock.now = 0.5
+    assert scheduler._pick().cls.name == TRANSACTIONAL
+    scheduler.close()
+
+
+def test_join_and_close_drain_every_queued_job():
+    done = []
+    scheduler = PriorityScheduler(concurrency=3, metrics=LatencyRecorder(), clock=FakeClock())
+    futures = [scheduler.submit("receive" if i % 4 == 0 else "welcome", done.append, i) for i in range(40)]
+    scheduler.join()
+    assert sorted(done) == list(range(40)) and all(f.done() for f in futures)
+    assert scheduler.pending() == {TRANSACTIONAL: 0, MARKETING: 0}
+
+    futures = [scheduler.submit("welcome", done.append, i) for i in range(40, 60)]
+    scheduler.close()
+    assert sorted(done) == list(range(60)) and all(f.done() for f in futures)
+    report = scheduler.report()
+    assert report[TRANSACTIONAL].completed + report[MARKETING].completed == 60
+    with pytest.raises(RuntimeError):
+        scheduler.submit("welcome", done.append, 0)
+
+
+def test_failed_jobs_are_counted():
+    scheduler = PriorityScheduler(concurrency=1, metrics=LatencyRecorder(), clock=FakeClock())
+    future = scheduler.submit("receive", lambda: 1 / 0)
+    scheduler.close()
+    with pytest.raises(ZeroDivisionError):
+        future.result()
+    assert scheduler.report()[TRANSACTIONAL].failed == 1
@@ -0,0 +1,59 @@
+import threading
+
+from fcm_dispatch import iter_windowed
+from fcm_ratelimit import Attempt, RetryPolicy
+
+
+def test_retry_policy_run_retries_transient_statuses_only():
+    statuses = iter([503, 429, 200])
+    calls, waits = [], []
+
+    def attempt_once(attempt):
+        calls.append(attempt)
+        status = next(statuses)
+        return Attempt(status, status, retry_after="0", done=status == 200)
+
+    assert RetryPolicy(base=0.0).run(attempt_once, lambda delay, outcome: waits.append(outcome.status_code)) == 200
+    assert calls == [0, 1, 2]
+    assert waits == [503, 429]
+
+
+def test_retry_policy_run_stops_on_fatal_status_and_max_retries():
+    assert RetryPolicy().run(lambda attempt: Attempt("bad", 400)) == "bad"
+    attempts = []
+    RetryPolicy(max_retries=2, base=0.0).run(lambda attempt: attempts.append(attempt) or Attempt(None, 503),
+                                             lambda delay, outcome: None)
+    assert attempts == [0, 1, 2]
+
+
+def test_iter_windowed_reads_input_only_as_calls_finish():
+    pulled, started, release = [0], threading.Semaphore(0), threading.Event()
+
+    def items():
+        for i in range(20):
+            pulled[0] += 1
+            yield i
+
+    def work(index, item):
+        started.release()
+        release.wait(5)
+        return item
+
+    results = []
+    consumer = threading.Thread(target=lambda: results.extend(iter_windowed(items(), work, 4)))
+    consumer.start()
+    for _ in range(4):
+        assert started.acquire(timeout=5)
+    # Every call is blocked: nothing has completed, so nothing past the window may have been read
+    assert not started.acquire(timeout=0.1)
+    assert pulled[0] == 4
+    release.set()
+    consumer.join(5)
+    assert sorted(results) == list(range(20))
+
+
+def test_iter_windowed_applies_shortcut():
+    results = list(iter_windowed(range(50), lambda index, item: ("done", index, item), 4,
+                                 shortcut=lambda index, item: ("skipped", index, item) if item % 5 == 0 else None))
+    assert sorted(r[1] for r in results) == list(range(50))
+    assert [r for r in results if r[0] == "skipped"] == [("skipped", i, i) for i in range(0, 50, 5)]
@@ -0,0 +1,30 @@
+from send_queue import SendQueue
+
+
+def test_open_leaves_another_runs_in_flight_rows_alone(tmp_path):
+    path = str(tmp_path / "queue.db")
+    with SendQueue(path) as sender:
+        sender.enqueue([("token-a", b"{}"), ("token-b", b"{}")])
+        claimed = sender.claim()
+        # A second process opening the same queue must not hand the claimed rows out again
+        with SendQueue(path) as other:
+            assert other.claim() == []
+            assert other.stats()["in_flight"] == 2
+        for message in claimed:
+            sender.ack(message.id)
+        assert sender.stats()["acked"] == 2
+
+
+def test_requeue_in_flight_recovers_a_crashed_run(tmp_path):
+    path = str(tmp_path / "queue.db")
+    crashed = SendQueue(path)
+    crashed.enqueue([("token-a", b"{}")])
+    crashed.claim()
+    crashed.close()
+
+    with SendQueue(path, requeue_in_flight=True) as resumed:
+        assert [m.token for m in resumed.claim()] == ["token-a"]
+
+    with SendQueue(path) as queue:
+        assert queue.recover(requeue=False) == 1
+        assert queue.stats()["failed"] == 1
@@ -0,0 +1,86 @@
+import pytest
+
+from dead_tokens import DEAD_TOKEN_ERROR
+from fcm_dispatch import LATENCY_SENDER
+from fcm_emulator import LEGACY_PATH, FcmEmulator
+from notification_dedup import DUPLICATE_ERROR
+from sharded_sender import ShardedSender, shard_of
+
+FIELDS = {"wallet_id": "w", "user_id": "u"}
+TX_FIELDS = {"transaction_id": "tx-1", "hash": "0xabc", "amount": "1", "symbol": "ETH",
+             "explorer_url": "https://example.invalid/tx", "timestamp": "2024-01-01T00:00:00"}
+
+
+@pytest.fixture
+def emulator():
+    emulator = FcmEmulator()
+    base_url, stop = emulator.run_in_thread()
+    emulator.url = base_url + LEGACY_PATH
+    yield emulator
+    stop()
+
+
+def test_shard_of_is_stable_and_in_range():
+    tokens = [f"token-{i}" for i in range(200)]
+    shards = [shard_of(token, 4) for token in tokens]
+
+    assert shards == [shard_of(token, 4) for token in tokens]
+    assert set(shards) == {0, 1, 2, 3}
+    assert all(shard_of(token, 1) == 0 for token in tokens)
+
+
+def test_send_merges_shard_counts_errors_and_latency(emulator):
+    tokens = [f"token-{i}" for i in range(60)] + ["dead-1", "dead-2", "invalid-1"]
+    sender = ShardedSender("local-key", workers=2, concurrency=4, fcm_url=emulator.url, device_rate=0)
+
+    summary = sender.send(tokens, "welcome", **FIELDS)
+
+    assert [s.shard for s in summary.shards] == [0, 1]
+    # Every token went to the shard it hashes to
+    for shard in summary.shards:
+        assert shard.total == sum(1 for token in tokens if shard_of(token, 2) == shard.shard)
+    assert (summary.total, summary.success) == (63, 60)
+    assert summary.errors == {"NotRegistered": 2, "InvalidRegistration": 1}
+    assert emulator.stats.messages == 63
+    totals = [h.count for (sender_name, _), h in summary.latency.histograms().items() if sender_name == LATENCY_SENDER]
+    assert max(totals) == 63
+
+
+def test_dedup_runs_inside_each_shard(emulator):
+    # Only payloads with a transaction id are deduplicated
+    tokens = [f"token-{i}" for i in range(20)] * 2
+    sender = ShardedSender("local-key", workers=2, concurrency=4, fcm_url=emulator.url, device_rate=0,
+                           dedup_ttl=60)
+
+    summary = sender.send(tokens, "transaction_confirmed", **TX_FIELDS)
+
+    assert (summary.total, summary.success) == (40, 20)
+    assert summary.errors == {DUPLICATE_ERROR: 20}
+    assert emulator.stats.messages == 20
+
+
+def test_dead_tokens_recorded_by_one_run_are_skipped_by_the_next(emulator, tmp_path):
+    path = str(tmp_path / "dead.db")
+    sender = ShardedSender("local-key", workers=2, concurrency=4, fcm_url=emulator.url, device_rate=0,
+                           dead_tokens_path=path)
+
+    sender.send(["token-1", "dead-1", "dead-2"], "welcome", **FIELDS)
+    second = sender.send(["token-1", "dead-1", "dead-2"], "welcome", **FIELDS)
+
+    assert second.errors == {DEAD_TOKEN_ERROR: 2}
+    assert emulator.stats.messages == 4
+
+
+def test_project_quota_is_split_across_workers():
+    sender = ShardedSender("k", workers=4, project_rate=600, project_burst=100, device_rate=2, device_burst=3)
+    assert (sender.project_rate, sender.project_burst) == (150, 25)
+    # Per-device quota stays whole: one device only ever reaches one worker
+    assert (sender.device_rate, sender.device_burst) == (2, 3)
+
+    assert ShardedSender("k", workers=8, project_burst=4).project_burst == 1.0
+    assert ShardedSender("k", workers=2).project_rate is None
+
+
+def test_unknown_template_fails_before_starting_workers():
+    with pytest.raises(KeyError):
+        ShardedSender("k", workers=2).send(["token-1"], "no-such-template")
@@ -0,0 +1,22 @@
+from token_source import iter_tokens
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_jsonl_looks_up_token_field_per_record(tmp_path):
+    path = _write(tmp_path, "tokens.jsonl", '{"x": 1}\n{"token": "a"}\n"b"\n{"DeviceToken": "c"}\n{"fcm_token": "d"}\n')
+    assert list(iter_tokens(path)) == ["a", "b", "c", "d"]
+
+
+def test_jsonl_skips_records_without_a_token(tmp_path):
+    path = _write(tmp_path, "tokens.jsonl", '{"token": "a"}\n{"other": "x"}\nnot json\n[1]\n{"token": "b"}\n')
+    assert list(iter_tokens(path)) == ["a", "b"]
+
+
+def test_jsonl_explicit_field(tmp_path):
+    path = _write(tmp_path, "tokens.jsonl", '{"token": "a", "push": "p1"}\n{"push": "p2"}\n{"token": "b"}\n')
+    assert list(iter_tokens(path, field="push")) == ["p1", "p2"]
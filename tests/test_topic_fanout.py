@@ -0,0 +1,113 @@
+import pytest
+
+import fcm_transport
+from dead_tokens import DeadTokenStore
+from fcm_emulator import LEGACY_PATH, EmulatorConfig, FcmEmulator
+from fcm_ratelimit import RetryPolicy
+from topic_fanout import TopicFanout, TopicManager, parse_topic_response, segment_topic, symbol_topic
+
+FIELDS = dict(symbol_name="Bitcoin", symbol="BTC", current_price="45000", current_price_display="45,000",
+              change_percent="5.2", change_display="+5.2", target_price="45000")
+NO_RETRY = RetryPolicy(max_retries=0)
+
+
+@pytest.fixture
+def emulator():
+    emulator = FcmEmulator(EmulatorConfig(seed=1))
+    base_url, stop = emulator.run_in_thread()
+    emulator.base_url = base_url
+    yield emulator
+    stop()
+    fcm_transport.close_all()
+
+
+@pytest.fixture
+def topics(emulator):
+    with TopicManager("local-key", iid_url=emulator.base_url + "/iid/v1", batch_size=2) as topics:
+        yield topics
+
+
+def _fanout(emulator, topics, **kwargs):
+    return TopicFanout("local-key", topics, fcm_url=emulator.base_url + LEGACY_PATH, retry_policy=NO_RETRY, **kwargs)
+
+
+def test_topic_names_are_sanitized():
+    assert symbol_topic("btc") == "price_BTC"
+    assert symbol_topic("usdt/trc20") == "price_USDT_TRC20"
+    assert segment_topic("new users") == "segment_new_users"
+
+
+def test_sync_batches_iid_calls_and_mirrors_membership(emulator, topics, tmp_path):
+    with DeadTokenStore(str(tmp_path / "dead.db")) as dead_tokens:
+        topics.dead_tokens = dead_tokens
+        added, removed = topics.sync("price_BTC", ["a", "b", "c", "dead-d", "invalid-e"])
+
+        assert (added.requested, added.succeeded, added.requests) == (5, 3, 3)
+        assert added.errors == {"NOT_FOUND": 1, "INVALID_ARGUMENT": 1}
+        assert removed.requested == 0
+        assert "dead-d" in dead_tokens and "invalid-e" in dead_tokens
+
+    added, removed = topics.sync("price_BTC", ["b", "c", "f"])
+    assert (added.succeeded, removed.succeeded) == (1, 1)
+    assert sorted(topics.members("price_BTC")) == ["b", "c", "f"] and topics.count("price_BTC") == 3
+    assert emulator.topics["price_BTC"] == {"b", "c", "f"}
+
+
+def test_broadcast_goes_out_as_one_topic_message(emulator, topics):
+    topics.subscribe("price_BTC", ["a", "b", "c"])
+    before = emulator.stats.requests
+
+    result = _fanout(emulator, topics).broadcast("price_alert", "price_BTC", **FIELDS)
+
+    assert (result.via, result.success, result.error) == ("topic", True, None)
+    assert result.message_id
+    assert emulator.stats.requests - before == 1
+    assert emulator.stats.delivered == 3
+
+
+def test_topic_rate_exceeded_falls_back_to_known_members(emulator, topics):
+    topics.subscribe("price_BTC", ["a", "b", "c"])
+    emulator.config.error_rates["TopicsMessageRateExceeded"] = 1.0
+    before = emulator.stats.requests
+
+    result = _fanout(emulator, topics).broadcast("price_alert", "price_BTC", **FIELDS)
+
+    assert (result.via, result.success, result.sent, result.failed) == ("tokens", True, 3, 0)
+    assert result.error == "TopicsMessageRateExceeded"
+    assert emulator.stats.requests - before == 4
+
+
+def test_other_topic_failures_are_returned_without_fallback(emulator, topics):
+    topics.subscribe("price_BTC", ["a", "b", "c"])
+    emulator.config.server_error_rate = 1.0
+    before = emulator.stats.requests
+
+    result = _fanout(emulator, topics).broadcast("price_alert", "price_BTC", **FIELDS)
+
+    assert (result.via, result.success, result.error, result.sent) == ("topic", False, "HTTP 503", 0)
+    assert emulator.stats.requests - before == 1
+
+
+def test_unreachable_fcm_is_returned_without_fallback(topics):
+    topics._store("price_BTC", ["a"], subscribe=True)
+    fanout = TopicFanout("local-key", topics, fcm_url="http://127.0.0.1:9/fcm/send", retry_policy=NO_RETRY)
+
+    result = fanout.broadcast("price_alert", "price_BTC", **FIELDS)
+
+    assert result.via == "topic" and not result.success
+    assert result.error.startswith("ConnectionError")
+
+
+def test_only_broadcast_types_can_use_topics(emulator, topics):
+    with pytest.raises(ValueError, match="not a broadcast type"):
+        _fanout(emulator, topics).broadcast("transaction_confirmed", "price_BTC")
+
+
+@pytest.mark.parametrize("status, body, expected", [
+    (200, {"message_id": 7}, (True, "7", None)),
+    (200, {"error": "TopicsMessageRateExceeded"}, (False, None, "TopicsMessageRateExceeded")),
+    (200, None, (False, None, "Unknown error")),
+    (401, {"message_id": 7}, (False, None, "HTTP 401")),
+])
+def test_parse_topic_response(status, body, expected):
+    assert parse_topic_response(status, body) == expected
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+📂 Streaming token source
+خواندن جریانی توکن‌های FCM از فایل‌های بزرگ برای ارسال گروهی
+
+Reads device tokens from CSV, JSONL or newline-delimited files one line at a
+time (memory-mapped above MMAP_THRESHOLD), so memory stays flat for any file
+size. prefetch() moves parsing onto a background thread behind a bounded
+queue, which lets the dispatcher start sending before the file is read.
+
+    tokens = prefetch(iter_tokens("campaign_tokens.csv"))
+    messages = iter_messages(tokens, "price_alert", symbol="BTC", ...)
+    for result in dispatcher.iter_dispatch(messages):
+        ...
+
+Usage: python token_source.py TOKEN_FILE   (counts tokens and read throughput)
+"""
+
+import csv
+import json
+import mmap
+import os
+import queue
+import sys
+import threading
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from notification_templates import TEMPLATES
+
+T = TypeVar("T")
+
+# Files at least this big are memory-mapped instead of read through a buffer
+MMAP_THRESHOLD = 8 * 1024 * 1024
+
+# Already-read pages of a mapping are dropped in windows of this size to keep RSS flat
+MMAP_RELEASE_WINDOW = 16 * 1024 * 1024
+
+# Column / key names recognised as the device token (case-insensitive)
+TOKEN_FIELDS = ("devicetoken", "device_token", "token", "fcm_token", "fcmtoken",
+                "registration_id", "registration_token")
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def iter_lines(path: str, mmap_threshold: int = MMAP_THRESHOLD) -> Iterator[bytes]:
+    """Yield raw lines (with line endings) without loading the file"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        if size < mmap_threshold:
+            yield from f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            can_release = hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+            if can_release and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            released = 0
+            readline = mm.readline
+            while True:
+                line = readline()
+                if not line:
+                    return
+                yield line
+                if can_release and mm.tell() - released >= MMAP_RELEASE_WINDOW:
+                    mm.madvise(mmap.MADV_DONTNEED, released, MMAP_RELEASE_WINDOW)
+                    released += MMAP_RELEASE_WINDOW
+
+
+def _decoded(lines: Iterable[bytes]) -> Iterator[str]:
+    first = True
+    for line in lines:
+        text = line.decode("utf-8", errors="replace")
+        if first:
+            text = text.lstrip("\ufeff")
+            first = False
+        yield text
+
+
+def _token_column(header: List[str], field: Optional[str]) -> Optional[int]:
+    names = [cell.strip().lower() for cell in header]
+    for candidate in ((field.lower(),) if field else TOKEN_FIELDS):
+        if candidate in names:
+            return names.index(candidate)
+    return None
+
+
+def _csv_tokens(lines: Iterator[str], field: Optional[str]) -> Iterator[str]:
+    rows = csv.reader(lines)
+    first = next(rows, None)
+    if first is None:
+        return
+    column = _token_column(first, field)
+    if column is None:
+        if field:
+            raise ValueError(f"CSV header has no '{field}' column")
+        # Headerless: the token is the first column of every row
+        column = 0
+        rows = _prepend(first, rows)
+    for row in rows:
+        if len(row) > column:
+            token = row[column].strip()
+            if token and not token.startswith("#"):
+                yield token
+
+
+def _prepend(first: T, rest: Iterator[T]) -> Iterator[T]:
+    yield first
+    yield from rest
+
+
+def _jsonl_tokens(lines: Iterator[str], field: Optional[str]) -> Iterator[str]:
+    key = field
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, str):
+            token = record
+        elif isinstance(record, dict):
+            token = record.get(key) if key else None
+            if token is None and not field:
+                # Records can lack the field or name it differently: look it up on this one
+                lowered = {k.lower(): k for k in record}
+                found = next((lowered[name] for name in TOKEN_FIELDS if name in lowered), None)
+                if found is not None:
+                    key, token = found, record[found]
+        else:
+            token = None
+        if token:
+            yield str(token).strip()
+
+
+def _plain_tokens(lines: Iterator[str]) -> Iterator[str]:
+    for line in lines:
+        token = line.strip()
+        if token and not token.startswith("#"):
+            yield token
+
+
+def iter_tokens(path: str, fmt: Optional[str] = None, field: Optional[str] = None,
+                mmap_threshold: int = MMAP_THRESHOLD) -> Iterator[str]:
+    """
+    Stream tokens from a file. `fmt` is csv, jsonl or lines (default: from the
+    extension). `field` names the CSV column / JSON key (default: DeviceToken,
+    token, fcm_token, ... whichever appears first).
+    """
+    fmt = fmt or FORMATS.get(os.path.splitext(str(path))[1].lower(), "lines")
+    lines = _decoded(iter_lines(path, mmap_threshold))
+    if fmt == "csv":
+        return _csv_tokens(lines, field)
+    if fmt == "jsonl":
+        return _jsonl_tokens(lines, field)
+    return _plain_tokens(lines)
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield lists of up to `size` items without materializing the input"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+_DONE = object()
+
+
+def prefetch(items: Iterable[T], maxsize: int = 64, chunk_size: int = 512) -> Iterator[T]:
+    """
+    Produce `items` on a background thread into a bounded queue of
+    `maxsize` chunks; the producer blocks when the consumer falls behind.
+    Errors in the producer are re-raised in the consumer.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunked(items, chunk_size):
+                if not put(chunk):
+                    return
+        except BaseException as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            chunk = buffer.get()
+            if chunk is _DONE:
+                return
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield from chunk
+    finally:
+        # Consumer finished or was abandoned: let the producer exit
+        stopped.set()
+
+
+def iter_messages(tokens: Iterable[str], template: str, **fields: str) -> Iterator[Tuple[str, bytes]]:
+    """(token, pre-rendered payload) pairs for the dispatcher, one template for every token"""
+    for token in tokens:
+        yield token, TEMPLATES.render(template, token=token, **fields)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("❌ Usage: python token_source.py TOKEN_FILE")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    size = os.path.getsize(path)
+    started = time.perf_counter()
+    count = sum(1 for _ in prefetch(iter_tokens(path)))
+    elapsed = time.perf_counter() - started
+
+    print(f"📂 {path} ({size / 1024 / 1024:.1f} MiB, {'mmap' if size >= MMAP_THRESHOLD else 'buffered'})")
+    print(f"   {count} tokens in {elapsed:.3f}s → {count / elapsed if elapsed else 0:,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+📡 Topic fan-out for broadcast notifications
+ارسال نوتیفیکیشن‌های همگانی از طریق topic به جای ارسال تک‌به‌تک
+
+Broadcast types (welcome, price_alert) reach whole groups of devices, so
+instead of one request per token they go out as one FCM topic message.
+TopicManager keeps symbol topics (price_BTC, ...) and segment topics in
+sync through the Instance ID batchAdd / batchRemove API, up to 1000 tokens
+per call, and remembers the membership locally in SQLite. If FCM rejects
+the topic message with a topic-only error (TopicsMessageRateExceeded),
+TopicFanout falls back to per-token sending to the members it knows. Other
+failures are returned as they are. A timeout may already have delivered
+the message, and auth or payload errors would fail every per-token send too.
+
+    topics = TopicManager(SERVER_KEY, "topics.db")
+    topics.sync(symbol_topic("BTC"), btc_holder_tokens)
+    fanout = TopicFanout(SERVER_KEY, topics)
+    fanout.broadcast("price_alert", symbol_topic("BTC"), symbol="BTC", ...)
+
+Usage: python topic_fanout.py [SUBSCRIBERS]   (topic vs per-token fan-out against the FCM emulator)
+"""
+
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import fast_json
+import fcm_transport
+from dead_tokens import DeadTokenStore
+from fcm_dispatch import FCM_URL, BatchDispatcher
+from fcm_ratelimit import Attempt, RetryPolicy
+from notification_templates import TEMPLATES
+from token_source import chunked
+
+IID_URL = "https://iid.googleapis.com/iid/v1"
+
+# Instance ID accepts at most this many tokens per batchAdd / batchRemove
+IID_BATCH_SIZE = 1000
+
+TOPIC_PREFIX = "/topics/"
+
+# Notification types that go to groups of devices and can be sent per topic
+BROADCAST_TYPES = frozenset({"welcome", "price_alert"})
+
+# Topic-send errors that only affect the topic path, so per-token sends still work
+TOPIC_FALLBACK_ERRORS = frozenset({"TopicsMessageRateExceeded"})
+
+# Per-token IID errors meaning the token is gone
+IID_DEAD_ERRORS = frozenset({"NOT_FOUND", "INVALID_ARGUMENT"})
+
+_TOPIC_UNSAFE = re.compile(r"[^A-Za-z0-9\-_.~%]")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS topic_members (
+    topic  TEXT NOT NULL,
+    token  TEXT NOT NULL,
+    PRIMARY KEY (topic, token)
+) WITHOUT ROWID;
+"""
+
+
+def symbol_topic(symbol: str) -> str:
+    """Topic for holders / watchers of a symbol, e.g. price_BTC"""
+    return f"price_{_TOPIC_UNSAFE.sub('_', symbol.upper())}"
+
+
+def segment_topic(segment: str) -> str:
+    """Topic for a marketing / lifecycle segment, e.g. segment_new_users"""
+    return f"segment_{_TOPIC_UNSAFE.sub('_', segment)}"
+
+
+@dataclass
+class SubscriptionResult:
+    topic: str
+    requested: int = 0
+    succeeded: int = 0
+    requests: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class BroadcastResult:
+    topic: str
+    template: str
+    via: str                       # "topic" or "tokens"
+    success: bool
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+    sent: int = 0                  # per-token fallback only
+    failed: int = 0
+    seconds: float = 0.0
+
+
+class TopicManager:
+    """Batched IID topic (un)subscription with the membership mirrored in SQLite"""
+
+    def __init__(self, server_key: str, path: str = ":memory:", iid_url: str = IID_URL,
+                 batch_size: int = IID_BATCH_SIZE, concurrency: int = 4,
+                 retry_policy: Optional[RetryPolicy] = None, dead_tokens: Optional[DeadTokenStore] = None):
+        self.iid_url = iid_url
+        self.batch_size = min(batch_size, IID_BATCH_SIZE)
+        self.concurrency = concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.dead_tokens = dead_tokens
+        self.headers = {"Authorization": f"key={server_key}", "Content-Type": "application/json"}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def subscribe(self, topic: str, tokens: Iterable[str]) -> SubscriptionResult:
+        return self._change(topic, tokens, "batchAdd")
+
+    def unsubscribe(self, topic: str, tokens: Iterable[str]) -> SubscriptionResult:
+        return self._change(topic, tokens, "batchRemove")
+
+    def sync(self, topic: str, tokens: Iterable[str]) -> Tuple[SubscriptionResult, SubscriptionResult]:
+        """Make `tokens` the membership of `topic`: subscribe the new ones, unsubscribe the rest"""
+        wanted = set(tokens)
+        current = set(self.members(topic))
+        added = self.subscribe(topic, sorted(wanted - current))
+        removed = self.unsubscribe(topic, sorted(current - wanted))
+        return added, removed
+
+    def members(self, topic: str) -> Iterator[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT token FROM topic_members WHERE topic = ?", (topic,)).fetchall()
+        return (token for (token,) in rows)
+
+    def count(self, topic: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM topic_members WHERE topic = ?", (topic,)).fetchone()[0]
+
+    def _change(self, topic: str, tokens: Iterable[str], action: str) -> SubscriptionResult:
+        result = SubscriptionResult(topic)
+        errors: Counter = Counter()
+        url = f"{self.iid_url}:{action}"
+        batches = chunked(tokens, self.batch_size)
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            for batch, outcomes in pool.map(lambda b: (b, self._post_batch(url, topic, b)), batches):
+                result.requested += len(batch)
+                result.requests += 1
+                done = [token for token, error in zip(batch, outcomes) if error is None]
+                result.succeeded += len(done)
+                for token, error in zip(batch, outcomes):
+                    if error is not None:
+                        errors[error] += 1
+                        if error in IID_DEAD_ERRORS and self.dead_tokens is not None:
+                            self.dead_tokens.add(token, "NotRegistered")
+                self._store(topic, done, subscribe=action == "batchAdd")
+        result.errors = dict(errors)
+        return result
+
+    def _post_batch(self, url: str, topic: str, batch: List[str]) -> List[Optional[str]]:
+        """Per-token error (None for success) for one batchAdd / batchRemove call"""
+        body = {"to": TOPIC_PREFIX + topic, "registration_tokens": batch}
+
+        def attempt_once(attempt: int) -> Attempt:
+            try:
+                response = fcm_transport.post(url, json=body, headers=self.headers)
+            except Exception as e:
+                return Attempt([f"{type(e).__name__}: {e}"] * len(batch), done=True)
+            status = response.status_code
+            if status != 200:
+                return Attempt([f"HTTP {status}"] * len(batch), status, retry_after=response.headers.get("Retry-After"))
+            try:
+                results = fast_json.response_json(response).get("results") or []
+            except (ValueError, AttributeError):
+                results = []
+            results = results + [{"error": "MissingResult"}] * (len(batch) - len(results))
+            return Attempt([r.get("error") for r in results[:len(batch)]], done=True)
+
+        return self.retry_policy.run(attempt_once)
+
+    def _store(self, topic: str, tokens: List[str], subscribe: bool):
+        if not tokens:
+            return
+        sql = ("INSERT OR IGNORE INTO topic_members (topic, token) VALUES (?, ?)" if subscribe
+               else "DELETE FROM topic_members WHERE topic = ? AND token = ?")
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(sql, [(topic, token) for token in tokens])
+            self._db.execute("COMMIT")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_topic_response(status_code: int, body: Any) -> Tuple[bool, Optional[str], Optional[str]]:
+    """(success, message_id, error) for a legacy /topics/ send"""
+    if status_code != 200:
+        return False, None, f"HTTP {status_code}"
+    body = body if isinstance(body, dict) else {}
+    if body.get("message_id") is not None:
+        return True, str(body["message_id"]), None
+    return False, None, body.get("error") or "Unknown error"
+
+
+class TopicFanout:
+    """Sends broadcast types as one topic message, per token if FCM rejects the topic path"""
+
+    def __init__(self, server_key: str, topics: TopicManager, fcm_url: str = FCM_URL, concurrency: int = 64,
+                 retry_policy: Optional[RetryPolicy] = None, dead_tokens: Optional[DeadTokenStore] = None):
+        self.server_key = server_key
+        self.topics = topics
+        self.fcm_url = fcm_url
+        self.concurrency = concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.dead_tokens = dead_tokens
+        self.headers = {"Authorization": f"key={server_key}", "Content-Type": "application/json"}
+
+    def broadcast(self, template: str, topic: str, **fields: str) -> BroadcastResult:
+        if template not in BROADCAST_TYPES:
+            raise ValueError(f"'{template}' is not a broadcast type ({', '.join(sorted(BROADCAST_TYPES))})")
+        started = time.perf_counter()
+        success, message_id, error = self._send_topic(TEMPLATES.render(template, token=TOPIC_PREFIX + topic, **fields))
+        if success or error not in TOPIC_FALLBACK_ERRORS:
+            return BroadcastResult(topic, template, "topic", success, message_id=message_id, error=error,
+                                   seconds=time.perf_counter() - started)
+
+        # Topic path unavailable: reach the members we know one by one
+        messages = ((token, TEMPLATES.render(template, token=token, **fields)) for token in self.topics.members(topic))
+        sent = failed = 0
+        with BatchDispatcher(self.server_key, concurrency=self.concurrency, fcm_url=self.fcm_url,
+                             retry_policy=self.retry_policy, dead_tokens=self.dead_tokens) as dispatcher:
+            for result in dispatcher.iter_dispatch(messages):
+                sent += result.success
+                failed += not result.success
+        return BroadcastResult(topic, template, "tokens", failed == 0, error=error, sent=sent, failed=failed,
+                               seconds=time.perf_counter() - started)
+
+    def _send_topic(self, payload: bytes) -> Tuple[bool, Optional[str], Optional[str]]:
+        def attempt_once(attempt: int) -> Attempt:
+            try:
+                response = fcm_transport.post(self.fcm_url, data=payload, headers=self.headers)
+            except Exception as e:
+                return Attempt((False, None, f"{type(e).__name__}: {e}"), done=True)
+            try:
+                body = fast_json.response_json(response)
+            except ValueError:
+                body = None
+            outcome = parse_topic_response(response.status_code, body)
+            # Only 429/5xx are retried; a topic error in a 200 body goes back to broadcast()
+            return Attempt(outcome, response.status_code, retry_after=response.headers.get("Retry-After"),
+                           done=outcome[0] or response.status_code == 200)
+
+        return self.retry_policy.run(attempt_once)
+
+
+def main():
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    print("📡 Topic Fan-out Benchmark")
+    print("=" * 50)
+
+    from fcm_emulator import LEGACY_PATH, EmulatorConfig, FcmEmulator
+
+    emulator = FcmEmulator(EmulatorConfig(error_rates={}))
+    base_url, stop = emulator.run_in_thread()
+    fcm_url = base_url + LEGACY_PATH
+    fields = dict(symbol_name="Bitcoin", symbol="BTC", current_price="45000", current_price_display="45,000",
+                  change_percent="5.2", change_display="+5.2", target_price="45000")
+    topic = symbol_topic("BTC")
+    tokens = [f"bench-token-{i:07d}" for i in range(subscribers)]
+    key = "local-benchmark-key"
+    try:
+        with TopicManager(key, iid_url=base_url + "/iid/v1") as topics:
+            started = time.perf_counter()
+            added, _ = topics.sync(topic, tokens)
+            print(f"   subscribe {added.succeeded:,} tokens to {topic}: {added.requests} IID calls "
+                  f"in {time.perf_counter() - started:.2f}s")
+
+            fanout = TopicFanout(key, topics, fcm_url=fcm_url)
+            requests_before = emulator.stats.requests
+            result = fanout.broadcast("price_alert", topic, **fields)
+            print(f"\n▶️  topic message      : {emulator.stats.requests - requests_before} FCM call "
+                  f"in {result.seconds * 1000:.1f} ms → {subscribers:,} devices")
+
+            emulator.config.error_rates["TopicsMessageRateExceeded"] = 1.0
+            requests_before = emulator.stats.requests
+            result = fanout.broadcast("price_alert", topic, **fields)
+            print(f"▶️  per-token fallback : {emulator.stats.requests - requests_before:,} FCM calls "
+                  f"in {result.seconds:.2f}s → {result.sent:,} devices ({result.error})")
+
+            removed = topics.unsubscribe(topic, tokens[: subscribers // 2])
+            print(f"\n   unsubscribe {removed.succeeded:,} tokens: {removed.requests} IID calls, "
+                  f"{topics.count(topic):,} still subscribed")
+    finally:
+        stop()
+        fcm_transport.close_all()
+
+
+if __name__ == "__main__":
+    main()